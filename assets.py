@@ -0,0 +1,143 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import pygame
+from atlas import SpriteAtlas
+from constants import *
+from hud import TextWidget, life_icon_surface
+from spritecache import SpriteCache
+
+
+# A SpriteCache that can be shared with the warmup thread
+class LockedCache(SpriteCache):
+    def __init__(self, capacity=SPRITE_CACHE_SIZE):
+        super().__init__(capacity)
+        self.lock = threading.Lock()
+
+    def get(self, key, render):
+        with self.lock:
+            return super().get(key, render)
+
+
+# Everything the game loads or renders that never changes: fonts by size,
+# static text, the sprite atlas and the life icon. Each is made once per
+# process however many times the menu, game and game over screens are entered.
+# warm() makes them in a background thread while the menu is up; wait() blocks
+# until it is done, before anything that renders text outside the cache.
+class AssetManager:
+    def __init__(self):
+        self.fonts = {}
+        self.text_cache = LockedCache(ASSET_TEXT_CACHE_SIZE)
+        # Font loading and rendering share one lock, FreeType isn't thread safe
+        self.lock = self.text_cache.lock
+        self.sprite_lock = threading.Lock()
+        self.atlases = {}  # render scale -> SpriteAtlas
+        self.life_icons = {}  # render scale -> Surface
+        self.warm_thread = None
+
+        # Startup timing, see begin_startup and first_frame
+        self.started = None
+        self.init_time = None
+        self.first_frame_time = None
+
+    def init_pygame(self):
+        # Only the subsystems the game uses: a window with its events and fonts.
+        # pygame.init() would also start audio and joysticks.
+        start = time.perf_counter()
+        pygame.display.init()
+        pygame.font.init()
+        self.init_time = time.perf_counter() - start
+
+    def begin_startup(self):
+        self.started = time.perf_counter()
+
+    def first_frame(self):
+        # Call after every flip; records the time since begin_startup once and
+        # returns it on that first call, else None
+        if self.first_frame_time is not None or self.started is None:
+            return None
+        self.first_frame_time = time.perf_counter() - self.started
+        return self.first_frame_time
+
+    def font(self, size):
+        with self.lock:
+            font = self.fonts.get(size)
+            if font is None:
+                font = self.fonts[size] = pygame.font.Font(None, size)
+            return font
+
+    def text(self, size, text_format, color, **anchor):
+        # A TextWidget whose static text comes from the shared cache
+        return TextWidget(self.font(size), text_format, color, self.text_cache, **anchor)
+
+    def sprite_atlas(self, scale=1.0):
+        with self.sprite_lock:
+            atlas = self.atlases.get(scale)
+            if atlas is None:
+                atlas = self.atlases[scale] = SpriteAtlas(scale).build()
+            return atlas
+
+    def hud_icon(self, scale=1.0):
+        with self.sprite_lock:
+            icon = self.life_icons.get(scale)
+            if icon is None:
+                icon = self.life_icons[scale] = life_icon_surface(scale)
+            return icon
+
+    def preload(self, texts=(), sizes=(), atlas=False, scale=1.0):
+        for size in sizes:
+            self.font(size)
+        for text in texts:
+            if text.is_static():
+                text.set()
+        self.hud_icon(scale)
+        if atlas:
+            self.sprite_atlas(scale)
+
+    def warm(self, texts=(), sizes=(), atlas=False, scale=1.0):
+        if self.warm_thread is not None:
+            return
+        self.warm_thread = threading.Thread(target=self.preload, args=(texts, sizes, atlas, scale), daemon=True)
+        self.warm_thread.start()
+
+    def wait(self):
+        if self.warm_thread is not None:
+            self.warm_thread.join()
+
+
+assets = AssetManager()
+
+
+def main():
+    # Starts the game several times with a dummy display and reports how long
+    # each took to show its first menu frame
+    parser = argparse.ArgumentParser(description="Measure the game's time to first frame")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    env = dict(os.environ, SDL_VIDEODRIVER="dummy", SDL_AUDIODRIVER="dummy")
+    game = os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py")
+    walls, inits, firsts = [], [], []
+    for _ in range(args.runs):
+        start = time.perf_counter()
+        output = subprocess.run([sys.executable, game, "--time-startup"], env=env, check=True,
+                                capture_output=True, text=True).stdout
+        walls.append(time.perf_counter() - start)
+        # Last line: "startup <init ms> <first frame ms>"
+        _, init, first = output.strip().splitlines()[-1].split()
+        inits.append(float(init))
+        firsts.append(float(first))
+
+    print(f"{args.runs} runs, median (min)")
+    print(f"  pygame init     {statistics.median(inits):8.1f} ms ({min(inits):.1f})")
+    print(f"  first frame     {statistics.median(firsts):8.1f} ms ({min(firsts):.1f})  from main()")
+    print(f"  process total   {statistics.median(walls) * 1000:8.1f} ms ({min(walls) * 1000:.1f})  "
+          f"including imports and exit")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,7 +2,8 @@ import random
 import pygame
 from pygame.time import wait
 from circleshape import CircleShape
-from constants import ASTEROID_MIN_RADIUS
+from constants import ASTEROID_MIN_RADIUS, ASTEROID_BOUNDS_MARGIN
+from worldbounds import WorldBounds, BOUNDS_KILL
 
 # Import explosion conditionally to avoid circular import
 try:
@@ -11,32 +12,51 @@ except ImportError:
     Explosion = None
 
 class Asteroid(CircleShape):
+    bounds = WorldBounds(BOUNDS_KILL, ASTEROID_BOUNDS_MARGIN)
+    rng = random  # replaced by a seeded random.Random for reproducible runs
+
     def __init__(self, x, y, radius):
         super().__init__(x, y, radius)
 
     def draw(self, screen):
-        pygame.draw.circle(screen, "white", self.position, self.radius, 2) 
+        return pygame.draw.circle(screen, "white", self.position, self.radius, 2)
+
+    def atlas_blits(self, atlas):
+        return [atlas.asteroid(self.position, self.radius)]
+
+    @classmethod
+    def atlas_batch(cls, atlas, position, velocity, radius):
+        return atlas.asteroids(position, radius)
 
     def update(self, dt):
         self.position += self.velocity * dt
+        self.apply_bounds(dt)
+
+    def split(self, after=0.0):
+        # `after` is how much of the tick was left when the asteroid was hit:
+        # the pieces start where it was hit and fly on for the rest of the tick
+        position = self.position
+        if after:
+            position = position - self.velocity * after
 
-    def split(self):
         # Create a small explosion when any asteroid is destroyed
         if Explosion is not None:
             # Yellow-white color for normal asteroid destruction
-            Explosion(self.position.x, self.position.y, self.radius * 0.8, (230, 230, 150))
+            Explosion(position.x, position.y, self.radius * 0.8, (230, 230, 150))
             
         self.kill()
         if self.radius <= ASTEROID_MIN_RADIUS:
             return True  # Return True if asteroid was fully destroyed
         else:
-            random_angle = random.uniform(20, 50)
+            random_angle = self.rng.uniform(20, 50)
             pos_vec = pygame.math.Vector2.rotate(self.velocity, random_angle)
             neg_vec = pygame.math.Vector2.rotate(self.velocity, -random_angle)
             new_radius = self.radius - ASTEROID_MIN_RADIUS
-            pos_asteroid = Asteroid(self.position.x, self.position.y, new_radius)
+            pos_asteroid = Asteroid(position.x, position.y, new_radius)
             pos_asteroid.velocity = pos_vec * 1.2
-            neg_asteroid = Asteroid(self.position.x, self.position.y, new_radius)
+            neg_asteroid = Asteroid(position.x, position.y, new_radius)
             neg_asteroid.velocity = neg_vec * 1.2
+            if after:
+                pos_asteroid.position += pos_asteroid.velocity * after
+                neg_asteroid.position += neg_asteroid.velocity * after
             return False  # Return False if asteroid was split
-
@@ -28,6 +28,8 @@ class AsteroidField(pygame.sprite.Sprite):
         ],
     ]
 
+    rng = random  # replaced by a seeded random.Random for reproducible runs
+
     def __init__(self):
         pygame.sprite.Sprite.__init__(self, self.containers)
         self.asteroid_group = None
@@ -50,10 +52,11 @@ class AsteroidField(pygame.sprite.Sprite):
             self.spawn_timer = 0
 
             # spawn a new asteroid at a random edge
-            edge = random.choice(self.edges)
-            speed = random.randint(40, 100)
+            rng = self.rng
+            edge = rng.choice(self.edges)
+            speed = rng.randint(40, 100)
             velocity = edge[0] * speed
-            velocity = velocity.rotate(random.randint(-30, 30))
-            position = edge[1](random.uniform(0, 1))
-            kind = random.randint(1, ASTEROID_KINDS)
+            velocity = velocity.rotate(rng.randint(-30, 30))
+            position = edge[1](rng.uniform(0, 1))
+            kind = rng.randint(1, ASTEROID_KINDS)
             self.spawn(ASTEROID_MIN_RADIUS * kind, position, velocity)
@@ -0,0 +1,147 @@
+import itertools
+import math
+import numpy as np
+import pygame
+from constants import *
+
+
+def sprite_surface(half):
+    # Opaque with a black RLE colorkey rather than per-pixel alpha; the shapes
+    # are solid colors, and colorkeyed blits are much cheaper
+    surface = pygame.Surface((half * 2, half * 2))
+    surface.set_colorkey((0, 0, 0), pygame.RLEACCEL)
+    return surface
+
+
+# Pre-rendered sprites for everything drawn every frame: one outline per
+# asteroid radius, the missile at quantized headings with each number of trail
+# segments and the ship at quantized rotations. Sprites are built lazily on
+# first use, or all at once with build(). Lookups return (surface, dest) pairs
+# ready for Surface.blits, so a whole frame can be drawn with one call.
+#
+# Lookups take world positions and sizes. With a scale the sprites are drawn
+# that much smaller and destinations are scaled to match, for rendering into a
+# surface of the world size times scale (see viewport.py).
+class SpriteAtlas:
+    def __init__(self, scale=1.0):
+        self.scale = scale
+        self.line_width = max(1, round(2 * scale))
+        self.asteroid_sprites = {}
+        self.shot_sprites = {}
+        self.missile_sprites = {}
+        self.ship_sprites = {}
+        self.missile_step = 360 / ATLAS_MISSILE_HEADINGS
+        self.ship_step = 360 / ATLAS_SHIP_ROTATIONS
+
+    def build(self):
+        for kind in range(1, ASTEROID_KINDS + 1):
+            self.asteroid_sprite(ASTEROID_MIN_RADIUS * kind)
+        self.shot_sprite(SHOT_RADIUS)
+        for index in range(ATLAS_MISSILE_HEADINGS):
+            for segments in range(3):
+                self.missile_sprite(index, segments)
+        for index in range(ATLAS_SHIP_ROTATIONS):
+            self.ship_sprite(index)
+        return self
+
+    def outline_sprite(self, cache, radius):
+        sprite = cache.get(radius)
+        if sprite is None:
+            scaled = radius * self.scale
+            half = math.ceil(scaled) + 1
+            surface = sprite_surface(half)
+            pygame.draw.circle(surface, "white", (half, half), scaled, self.line_width)
+            sprite = cache[radius] = (surface, half)
+        return sprite
+
+    def asteroid_sprite(self, radius):
+        return self.outline_sprite(self.asteroid_sprites, radius)
+
+    def shot_sprite(self, radius):
+        return self.outline_sprite(self.shot_sprites, radius)
+
+    def missile_sprite(self, index, segments=2):
+        sprite = self.missile_sprites.get((index, segments))
+        if sprite is None:
+            # Same circles as Missile.draw, with `segments` of the trail behind
+            # the heading
+            radius = MISSILE_RADIUS * self.scale
+            half = math.ceil(radius * 4) + 1
+            surface = sprite_surface(half)
+            center = pygame.Vector2(half, half)
+            direction = pygame.Vector2(1, 0).rotate(index * self.missile_step)
+            trail_pos = center - direction * radius * 2
+            trail_pos2 = trail_pos - direction * radius * 1.5
+            if segments > 1:
+                pygame.draw.circle(surface, (255, 200, 200), trail_pos2, radius * 0.4)
+            if segments > 0:
+                pygame.draw.circle(surface, (255, 200, 100), trail_pos, radius * 0.7)
+            pygame.draw.circle(surface, (255, 100, 100), center, radius)
+            sprite = self.missile_sprites[index, segments] = (surface, half)
+        return sprite
+
+    def ship_sprite(self, index):
+        sprite = self.ship_sprites.get(index)
+        if sprite is None:
+            # Same triangle as Player.triangle
+            radius = PLAYER_RADUIUS * self.scale
+            half = math.ceil(radius) + 2
+            surface = sprite_surface(half)
+            center = pygame.Vector2(half, half)
+            rotation = index * self.ship_step
+            forward = pygame.Vector2(0, 1).rotate(rotation)
+            right = pygame.Vector2(0, 1).rotate(rotation + 90) * radius / 1.5
+            a = center + forward * radius
+            b = center - forward * radius - right
+            c = center - forward * radius + right
+            pygame.draw.polygon(surface, "white", [a, b, c], self.line_width)
+            sprite = self.ship_sprites[index] = (surface, half)
+        return sprite
+
+    def dest(self, position, half):
+        return position.x * self.scale - half, position.y * self.scale - half
+
+    def asteroid(self, position, radius):
+        surface, half = self.asteroid_sprite(radius)
+        return surface, self.dest(position, half)
+
+    def shot(self, position, radius):
+        surface, half = self.shot_sprite(radius)
+        return surface, self.dest(position, half)
+
+    def missile(self, position, velocity, segments=2):
+        heading = math.degrees(math.atan2(velocity.y, velocity.x))
+        index = round(heading / self.missile_step) % ATLAS_MISSILE_HEADINGS
+        surface, half = self.missile_sprite(index, segments)
+        return surface, self.dest(position, half)
+
+    # Batch versions of the lookups above for NumPy arrays of positions, as
+    # kept by an EntityStore. They return lists of (surface, dest) pairs.
+    def outline_blits(self, cache, position, radius):
+        position = position * self.scale
+        blits = []
+        for value in np.unique(radius).tolist():
+            surface, half = self.outline_sprite(cache, value)
+            blits += zip(itertools.repeat(surface), (position[radius == value] - half).tolist())
+        return blits
+
+    def asteroids(self, position, radius):
+        return self.outline_blits(self.asteroid_sprites, position, radius)
+
+    def shots(self, position, radius):
+        return self.outline_blits(self.shot_sprites, position, radius)
+
+    def missiles(self, position, velocity, segments=2):
+        heading = np.degrees(np.arctan2(velocity[:, 1], velocity[:, 0]))
+        indices = np.rint(heading / self.missile_step).astype(int) % ATLAS_MISSILE_HEADINGS
+        position = position * self.scale
+        blits = []
+        for index in np.unique(indices).tolist():
+            surface, half = self.missile_sprite(index, segments)
+            blits += zip(itertools.repeat(surface), (position[indices == index] - half).tolist())
+        return blits
+
+    def ship(self, position, rotation):
+        index = round(rotation / self.ship_step) % ATLAS_SHIP_ROTATIONS
+        surface, half = self.ship_sprite(index)
+        return surface, self.dest(position, half)
@@ -0,0 +1,192 @@
+import os
+
+# Workers run headless, so make sure SDL never looks for a real display
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import argparse
+import itertools
+import json
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import constants
+from pilots import PILOTS
+import savestate
+from simulation import Simulation
+
+# Plays many headless games in parallel for tuning constants.py. Every
+# parameter set is played with the same seeds, so differences between sets come
+# from the parameters rather than from luck. One JSON line is written per game
+# as soon as its chunk finishes:
+#
+#   python batch.py --games 1000 --sweep ASTEROID_SPAWN_RATE=0.5,0.8,1.2 \
+#       --set PLAYER_LIVES=5 --pilot sniper --output spawn.jsonl
+#
+# Overrides replace the module-level constants every game module imported with
+# `from constants import *`, so they reach values read while the game runs
+# (spawn rate, cooldowns, speeds, missile count, lives, scoring). Values baked
+# in at import time, such as default arguments and class-level WorldBounds, are
+# not affected.
+#
+# --state forks every game from a savestate.py save, each with its own seed,
+# to see how a given situation tends to play out.
+
+MISSING = object()
+
+
+def parse_value(text):
+    # Numbers and other JSON literals as such, anything else as a string
+    try:
+        return json.loads(text)
+    except ValueError:
+        return text
+
+
+def override_constants(overrides):
+    # Patches constants.py and every module that copied its values, returning
+    # what to pass to restore_constants afterwards
+    saved = []
+    for name, value in overrides.items():
+        original = getattr(constants, name, MISSING)
+        if original is MISSING or not name.isupper():
+            raise ValueError(f"unknown constant {name}")
+        for module in list(sys.modules.values()):
+            namespace = getattr(module, "__dict__", None)
+            if namespace is not None and namespace.get(name, MISSING) is original:
+                saved.append((namespace, name, original))
+                namespace[name] = value
+    return saved
+
+
+def restore_constants(saved):
+    for namespace, name, original in reversed(saved):
+        namespace[name] = original
+
+
+def play_game(seed, params, pilot_name, max_ticks, rate, entity_store=False, state=None):
+    pilot = PILOTS[pilot_name]
+    dt = 1.0 / rate
+    saved = override_constants(params)
+    try:
+        start = time.perf_counter()
+        if state is None:
+            simulation = Simulation(seed, pooling=True, entity_store=entity_store)
+        else:
+            # A fork of the saved game; reseeding makes every fork play on differently
+            simulation = savestate.loads(state)
+            simulation.seed = seed
+            simulation.rng.seed(seed)
+        stop = simulation.ticks + max_ticks
+        while not simulation.game_over and simulation.ticks < stop:
+            simulation.step(dt, pilot(simulation))
+        elapsed = time.perf_counter() - start
+    finally:
+        restore_constants(saved)
+
+    return {
+        "seed": seed,
+        "params": params,
+        "pilot": pilot_name,
+        "score": simulation.score,
+        "survival_time": simulation.time,
+        "asteroids_destroyed": simulation.asteroids_destroyed,
+        "frames": simulation.ticks,
+        "game_over": simulation.game_over,
+        "wall_time": elapsed,
+    }
+
+
+def play_chunk(jobs, pilot_name, max_ticks, rate, entity_store, state=None):
+    # Runs in a worker process; several games per task keeps IPC overhead low
+    return [play_game(seed, params, pilot_name, max_ticks, rate, entity_store, state) for seed, params in jobs]
+
+
+def parameter_sets(fixed, sweeps):
+    # The cross product of every --sweep, each combined with the --set values
+    names = list(sweeps)
+    for values in itertools.product(*(sweeps[name] for name in names)):
+        params = dict(fixed)
+        params.update(zip(names, values))
+        yield params
+
+
+def parse_assignment(text):
+    name, separator, value = text.partition("=")
+    if not separator:
+        raise argparse.ArgumentTypeError(f"expected NAME=VALUE, got {text!r}")
+    return name.strip(), value
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Play many headless games in parallel")
+    parser.add_argument("--games", type=int, default=100, help="games per parameter set")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the first game, the rest count up")
+    parser.add_argument("--set", type=parse_assignment, action="append", default=[], metavar="NAME=VALUE",
+                        help="override a constant for every game, may be repeated")
+    parser.add_argument("--sweep", type=parse_assignment, action="append", default=[], metavar="NAME=V1,V2,...",
+                        help="play every game once per value, may be repeated for a grid")
+    parser.add_argument("--pilot", choices=sorted(PILOTS), default="spin-and-shoot")
+    parser.add_argument("--max-ticks", type=int, default=60 * 60 * 10, help="end games still running after this many ticks")
+    parser.add_argument("--rate", type=float, default=constants.SIMULATION_TICK_RATE, help="simulation ticks per game second")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="worker processes")
+    parser.add_argument("--chunk", type=int, default=4, help="games per worker task")
+    parser.add_argument("--entity-store", action="store_true", help="use the NumPy entity store")
+    parser.add_argument("--state", metavar="PATH",
+                        help="fork every game from a savestate.py save instead of starting fresh")
+    parser.add_argument("--output", default="batch.jsonl", help="JSONL file for per-game results")
+    args = parser.parse_args()
+
+    fixed = {name: parse_value(value) for name, value in args.set}
+    sweeps = {name: [parse_value(value) for value in values.split(",")] for name, values in args.sweep}
+    sets = list(parameter_sets(fixed, sweeps))
+    # Fail on typos before starting any workers
+    try:
+        restore_constants(override_constants(dict(fixed, **{name: values[0] for name, values in sweeps.items()})))
+    except ValueError as error:
+        parser.error(str(error))
+
+    state = None
+    if args.state:
+        with open(args.state, "rb") as file:
+            state = file.read()
+
+    jobs = [(args.seed + game, params) for params in sets for game in range(args.games)]
+    chunks = [jobs[i:i + args.chunk] for i in range(0, len(jobs), args.chunk)]
+    totals = {}
+    done = 0
+    frames = 0
+
+    start = time.perf_counter()
+    with open(args.output, "w") as output, ProcessPoolExecutor(args.workers) as executor:
+        futures = [
+            executor.submit(play_chunk, chunk, args.pilot, args.max_ticks, args.rate, args.entity_store, state)
+            for chunk in chunks
+        ]
+        for future in as_completed(futures):
+            for result in future.result():
+                output.write(json.dumps(result) + "\n")
+                key = json.dumps(result["params"], sort_keys=True)
+                total = totals.setdefault(key, {"games": 0, "score": 0, "survival_time": 0.0, "asteroids_destroyed": 0})
+                total["games"] += 1
+                total["score"] += result["score"]
+                total["survival_time"] += result["survival_time"]
+                total["asteroids_destroyed"] += result["asteroids_destroyed"]
+                frames += result["frames"]
+            output.flush()
+            done += len(future.result())
+            print(f"\r{done}/{len(jobs)} games", end="", file=sys.stderr, flush=True)
+    elapsed = time.perf_counter() - start
+    print(file=sys.stderr)
+
+    print(f"{len(jobs)} games, {frames} frames in {elapsed:.1f}s on {args.workers} workers: "
+          f"{len(jobs) / elapsed:.1f} games/sec, {frames / elapsed:.0f} frames/sec")
+    for key, total in totals.items():
+        games = total["games"]
+        print(f"{key}: score {total['score'] / games:.0f}  survival {total['survival_time'] / games:.1f}s  "
+              f"destroyed {total['asteroids_destroyed'] / games:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,341 @@
+import os
+
+# Benchmarks run headless, so make sure SDL never looks for a real display
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import argparse
+import functools
+import json
+import math
+import sys
+import time
+import numpy as np
+import pygame
+from asteroid import Asteroid
+from atlas import SpriteAtlas
+from constants import *
+from controls import *
+from explosion import Explosion
+from hud import HUD
+from missile import Missile
+import savestate
+from shot import Shot
+from simulation import Simulation
+from viewport import Viewport
+from worldbounds import WorldBounds, BOUNDS_WRAP
+
+# Scripted stress scenarios built on the real game classes. Each scenario sets
+# up a Simulation and returns a function giving the player input for a tick.
+# Results are written as JSON so runs can be diffed and checked for regressions:
+#
+#   python benchmark.py --output base.json
+#   python benchmark.py --baseline base.json --threshold 0.2
+#
+# --state starts every scenario from a savestate.py save; the idle scenario
+# times the saved world as it is. --draw-sweep compares draw time of the
+# primitive and sprite atlas paths against entity count instead, and
+# --render-scales compares whole rendered frames at several render scales.
+
+PHASES = ["update", "collision", "draw"]
+DRAW_SWEEP_COUNTS = [100, 1000, 5000, 10000]
+RENDER_SCALE_SCENARIOS = ["asteroids-1000", "explosions-20", "missile-barrage"]
+
+
+def make_invulnerable(player):
+    player.is_invulnerable = True
+    player.invulnerable_timer = math.inf
+
+
+def spawn_asteroid_grid(simulation, count, speed=60):
+    # Evenly spread asteroids with fixed, varied headings so runs are repeatable
+    columns = max(1, int(math.sqrt(count * SCREEN_WIDTH / SCREEN_HEIGHT)))
+    rows = math.ceil(count / columns)
+    for i in range(count):
+        x = (i % columns + 0.5) * SCREEN_WIDTH / columns
+        y = (i // columns + 0.5) * SCREEN_HEIGHT / rows
+        kind = i % ASTEROID_KINDS + 1
+        asteroid = Asteroid(x, y, ASTEROID_MIN_RADIUS * kind)
+        asteroid.velocity = pygame.Vector2(0, speed).rotate(i * 137.5)
+
+
+def idle(simulation):
+    # Nothing added, for timing a --state save as it is
+    make_invulnerable(simulation.player)
+    return lambda simulation: 0
+
+
+def asteroid_field(simulation, count):
+    # N asteroids drifting at fixed velocities; nothing gets shot
+    spawn_asteroid_grid(simulation, count)
+    make_invulnerable(simulation.player)
+    return lambda simulation: 0
+
+
+def shot_spam(simulation, asteroids):
+    # A shot every tick while spinning, ignoring the normal cooldown
+    spawn_asteroid_grid(simulation, asteroids)
+    player = simulation.player
+    make_invulnerable(player)
+
+    def inputs(simulation):
+        player.timer = 0
+        return INPUT_SHOOT | INPUT_RIGHT
+    return inputs
+
+
+def explosions(simulation, count):
+    # K maximum-size explosions, re-triggered as soon as the previous wave ends
+    make_invulnerable(simulation.player)
+    wave_ticks = max(1, int(EXPLOSION_DURATION * SIMULATION_TICK_RATE))
+
+    def inputs(simulation):
+        if simulation.ticks % wave_ticks == 0:
+            for i in range(count):
+                x = (i + 0.5) * SCREEN_WIDTH / count
+                Explosion(x, SCREEN_HEIGHT / 2, ASTEROID_MAX_RADIUS * 1.5, (255, 100, 50))
+        return 0
+    return inputs
+
+
+def missile_barrage(simulation, asteroids):
+    # A missile every tick, sweeping through a dense field
+    spawn_asteroid_grid(simulation, asteroids)
+    player = simulation.player
+    make_invulnerable(player)
+
+    def inputs(simulation):
+        player.missile_timer = 0
+        player.missiles_remaining = PLAYER_MISSILE_COUNT
+        return INPUT_MISSILE | INPUT_RIGHT
+    return inputs
+
+
+SCENARIOS = {
+    "idle": idle,
+    "asteroids-200": functools.partial(asteroid_field, count=200),
+    "asteroids-1000": functools.partial(asteroid_field, count=1000),
+    "asteroids-10000": functools.partial(asteroid_field, count=10000),
+    "shot-spam": functools.partial(shot_spam, asteroids=100),
+    "explosions-20": functools.partial(explosions, count=20),
+    "missile-barrage": functools.partial(missile_barrage, asteroids=500),
+}
+
+
+def summarize(samples):
+    samples = np.asarray(samples) * 1000
+    return {
+        "mean_ms": float(samples.mean()),
+        "p95_ms": float(np.percentile(samples, 95)),
+        "p99_ms": float(np.percentile(samples, 99)),
+    }
+
+
+def run_scenario(name, ticks, seed, entity_store=False, atlas=None, state=None):
+    timings = {phase: [] for phase in PHASES}
+    screen = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
+    dt = 1.0 / SIMULATION_TICK_RATE
+
+    # Scenarios keep their asteroids on screen and stop the field spawning
+    # more, so the load stays constant over the run
+    original_bounds = Asteroid.bounds
+    Asteroid.bounds = WorldBounds(BOUNDS_WRAP)
+    try:
+        if state is None:
+            simulation = Simulation(seed, entity_store=entity_store)
+        else:
+            simulation = savestate.loads(state)
+        simulation.asteroid_field.kill()
+        simulation.activate()
+        inputs = SCENARIOS[name](simulation)
+        clock = time.perf_counter
+
+        for _ in range(ticks):
+            simulation.activate()
+            tick_inputs = inputs(simulation)
+
+            start = clock()
+            simulation.begin_tick(tick_inputs)
+            simulation.update(dt)
+            updated = clock()
+            simulation.collide(dt)
+            collided = clock()
+            screen.fill("black")
+            simulation.draw(screen, atlas=atlas)
+            drawn = clock()
+
+            simulation.end_tick(dt)
+            simulation.population.sample(dt)
+
+            timings["update"].append(updated - start)
+            timings["collision"].append(collided - updated)
+            timings["draw"].append(drawn - collided)
+    finally:
+        Asteroid.bounds = original_bounds
+
+    return {
+        "ticks": ticks,
+        "phases": {phase: summarize(samples) for phase, samples in timings.items()},
+        "peak_sprites": dict(simulation.population.peak),
+        "pools": simulation.pool_stats(),
+    }
+
+
+def draw_sweep(counts, frames, seed):
+    # Mostly asteroids with some shots and missiles, drawn both ways
+    screen = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
+    atlas = SpriteAtlas().build()
+    results = []
+    for count in counts:
+        simulation = Simulation(seed)
+        simulation.activate()
+        spawn_asteroid_grid(simulation, count * 8 // 10)
+        for i in range(count // 10):
+            x = (i * 97) % SCREEN_WIDTH
+            y = (i * 61) % SCREEN_HEIGHT
+            shot = Shot(x, y, SHOT_RADIUS)
+            shot.velocity = pygame.Vector2(0, PLAYER_SHOT_SPEED).rotate(i * 37)
+            missile = Missile(y, x % SCREEN_HEIGHT, MISSILE_RADIUS)
+            missile.velocity = pygame.Vector2(0, MISSILE_SPEED).rotate(i * 53)
+
+        for path, path_atlas in (("primitives", None), ("atlas", atlas)):
+            samples = []
+            for _ in range(frames):
+                start = time.perf_counter()
+                screen.fill("black")
+                simulation.draw(screen, atlas=path_atlas)
+                samples.append(time.perf_counter() - start)
+            results.append(dict(entities=count, path=path, **summarize(samples)))
+    return results
+
+
+def render_scale_sweep(scales, frames, seed, smooth=False):
+    # Time to draw the world and HUD at each render scale and stretch it over
+    # a world-sized window, as game_loop does; 1x primitives is drawn straight
+    # to the window like the default game
+    pygame.font.init()
+    window = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
+    dt = 1.0 / SIMULATION_TICK_RATE
+    paths = [("primitives", 1.0)] + [("atlas", scale) for scale in scales]
+    results = []
+    original_bounds = Asteroid.bounds
+    Asteroid.bounds = WorldBounds(BOUNDS_WRAP)
+    try:
+        for name in RENDER_SCALE_SCENARIOS:
+            for path, scale in paths:
+                view = Viewport(window, scale, smooth)
+                atlas = SpriteAtlas(scale).build() if path == "atlas" else None
+                hud = HUD(pygame.font.Font(None, round(SCORE_FONT_SIZE * scale)), scale=scale)
+                simulation = Simulation(seed)
+                simulation.activate()
+                inputs = SCENARIOS[name](simulation)
+                samples = []
+                for _ in range(frames):
+                    simulation.activate()
+                    simulation.step(dt, inputs(simulation))
+                    start = time.perf_counter()
+                    view.surface.fill("black")
+                    simulation.draw(view.surface, atlas=atlas)
+                    hud.update(simulation.score, simulation.lives, simulation.player.missiles_remaining)
+                    hud.draw(view.surface)
+                    view.upscale()
+                    samples.append(time.perf_counter() - start)
+                results.append(dict(scenario=name, path=path, scale=scale, **summarize(samples)))
+    finally:
+        Asteroid.bounds = original_bounds
+    return results
+
+
+def find_regressions(results, baseline, threshold):
+    regressions = []
+    for name, result in results["scenarios"].items():
+        old = baseline.get("scenarios", {}).get(name)
+        if old is None:
+            continue
+        for phase in PHASES:
+            for stat in ("mean_ms", "p95_ms"):
+                before = old["phases"][phase][stat]
+                after = result["phases"][phase][stat]
+                if before > 0 and after > before * (1 + threshold):
+                    regressions.append(
+                        f"{name} {phase} {stat}: {before:.3f} -> {after:.3f} "
+                        f"(+{(after / before - 1) * 100:.0f}%)"
+                    )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run headless stress scenarios")
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS),
+                        help="scenario to run, may be repeated (default: all)")
+    parser.add_argument("--ticks", type=int, default=300, help="ticks per scenario")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--baseline", help="JSON results to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="allowed slowdown against the baseline, 0.2 = 20%%")
+    parser.add_argument("--entity-store", action="store_true",
+                        help="run the scenarios with the NumPy entity store")
+    parser.add_argument("--atlas", action="store_true",
+                        help="draw the scenarios with the sprite atlas")
+    parser.add_argument("--state", metavar="PATH",
+                        help="start every scenario from a savestate.py save instead of an empty field")
+    parser.add_argument("--draw-sweep", action="store_true",
+                        help="benchmark the primitive and atlas draw paths against entity count")
+    parser.add_argument("--render-scales", metavar="SCALES",
+                        help="comma separated render scales to compare whole frames at, e.g. 0.5,0.75,1")
+    parser.add_argument("--smooth-scale", action="store_true",
+                        help="upscale with smoothscale in --render-scales")
+    args = parser.parse_args()
+
+    results = {"ticks": args.ticks, "seed": args.seed, "entity_store": args.entity_store,
+               "atlas": args.atlas, "scenarios": {}}
+    if args.draw_sweep:
+        results["draw_sweep"] = draw_sweep(DRAW_SWEEP_COUNTS, min(args.ticks, 60), args.seed)
+        print(f"{'entities':>8} {'path':<11} {'mean ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+        for row in results["draw_sweep"]:
+            print(f"{row['entities']:>8} {row['path']:<11} {row['mean_ms']:>8.2f} "
+                  f"{row['p95_ms']:>8.2f} {row['p99_ms']:>8.2f}")
+
+    if args.render_scales:
+        scales = [float(scale) for scale in args.render_scales.split(",")]
+        results["render_scales"] = render_scale_sweep(scales, args.ticks, args.seed, args.smooth_scale)
+        print(f"{'scenario':<16} {'path':<11} {'scale':>5} {'mean ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+        for row in results["render_scales"]:
+            print(f"{row['scenario']:<16} {row['path']:<11} {row['scale']:>5.2f} {row['mean_ms']:>8.2f} "
+                  f"{row['p95_ms']:>8.2f} {row['p99_ms']:>8.2f}")
+
+    atlas = SpriteAtlas().build() if args.atlas else None
+    state = None
+    if args.state:
+        with open(args.state, "rb") as file:
+            state = file.read()
+        results["state"] = args.state
+    scenarios = args.scenario or ([] if args.draw_sweep or args.render_scales else list(SCENARIOS))
+    for name in scenarios:
+        result = run_scenario(name, args.ticks, args.seed, args.entity_store, atlas, state)
+        results["scenarios"][name] = result
+        phases = "  ".join(
+            f"{phase} {stats['mean_ms']:.2f}/{stats['p95_ms']:.2f}/{stats['p99_ms']:.2f}"
+            for phase, stats in result["phases"].items()
+        )
+        print(f"{name:<16} {phases}  (mean/p95/p99 ms)")
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        regressions = find_regressions(results, baseline, args.threshold)
+        if regressions:
+            print("Regressions:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print(f"No regressions above {args.threshold * 100:.0f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,351 @@
+import argparse
+import mmap
+import os
+import queue
+import struct
+import tempfile
+import threading
+import time
+import numpy as np
+import pygame
+from asteroid import Asteroid
+from constants import *
+from hud import HUD
+from replay import Replay
+from simulation import Simulation
+from worldbounds import WorldBounds, BOUNDS_WRAP
+
+# Capture files are a preallocated, memory-mapped ring of raw frames. Pixels
+# are kept exactly as the surface stores them, so grabbing a frame is a plain
+# copy with no per-frame conversion or encoding; export converts them:
+#
+#   header  magic "ASCP", version, width, height, pitch, bytes per pixel,
+#           red/green/blue/alpha masks, slot count, frames written so far
+#   slots   frame number and tick, then pitch * height bytes of pixels
+#
+# Frame n lives in slot n % slots; the last `slots` frames written are kept.
+# A dropped frame leaves its slot holding an older frame, or EMPTY_SLOT if
+# nothing was ever written there, so readers check the stored frame number.
+CAPTURE_MAGIC = b"ASCP"
+CAPTURE_VERSION = 1
+HEADER = struct.Struct("<4sBIIIB4IIQ")
+FRAME = struct.Struct("<QQ")
+WRITTEN_OFFSET = HEADER.size - 8  # frames written, updated after every frame
+EMPTY_SLOT = 0xFFFFFFFFFFFFFFFF  # frame number of a slot never written
+
+
+# Grabs frames from a surface into a capture file. grab() copies the pixels
+# into one of queue_frames preallocated buffers and queues it; a writer thread
+# copies it into the mapped file and hands the buffer back, so the frame only
+# pays for one copy. When every buffer is waiting for the writer, new frames
+# are dropped (and counted) rather than stalling the game, unless block is
+# set, as it is for offline captures.
+#
+# Writes into a file on disk also pay for the kernel writing dirty pages back;
+# a file on a tmpfs such as /dev/shm avoids that.
+class FrameCapture:
+    def __init__(self, path, surface, slots=CAPTURE_RING_FRAMES, queue_frames=CAPTURE_QUEUE_FRAMES, block=False):
+        self.size = surface.get_size()
+        self.pitch = surface.get_pitch()
+        self.frame_bytes = self.pitch * self.size[1]
+        self.slot_bytes = FRAME.size + self.frame_bytes
+        self.slots = slots
+        self.block = block
+
+        self.file = open(path, "w+b")
+        # The whole ring is allocated, mapped and touched up front, so the first
+        # pass round it doesn't pay for disk allocation or page faults
+        self.file.truncate(HEADER.size + slots * self.slot_bytes)
+        if hasattr(os, "posix_fallocate"):
+            os.posix_fallocate(self.file.fileno(), 0, HEADER.size + slots * self.slot_bytes)
+        self.map = mmap.mmap(self.file.fileno(), 0)
+        blank = FRAME.pack(EMPTY_SLOT, 0) + bytes(self.frame_bytes)
+        for slot in range(slots):
+            offset = HEADER.size + slot * self.slot_bytes
+            self.map[offset:offset + self.slot_bytes] = blank
+        # The writer copies through NumPy, which lets go of the GIL while it
+        # copies, so the game thread isn't held up by the write
+        self.pixels = np.frombuffer(self.map, np.uint8)
+        self.map[:HEADER.size] = HEADER.pack(
+            CAPTURE_MAGIC, CAPTURE_VERSION, self.size[0], self.size[1], self.pitch,
+            surface.get_bytesize(), *surface.get_masks(), slots, 0,
+        )
+
+        self.queue = queue.Queue()
+        self.buffers = queue.Queue()  # buffers free for grab()
+        for _ in range(queue_frames):
+            self.buffers.put(bytearray(self.frame_bytes))
+        self.frames = 0  # frames grabbed, the next frame number
+        self.written = 0
+        self.dropped = 0
+        self.grab_time = 0.0  # seconds spent in grab()
+        self.writer = threading.Thread(target=self.write_frames, name="capture", daemon=True)
+        self.writer.start()
+
+    def grab(self, surface, tick=0):
+        start = time.perf_counter()
+        try:
+            pixels = self.buffers.get(block=self.block)
+        except queue.Empty:
+            self.dropped += 1
+        else:
+            memoryview(pixels)[:] = memoryview(surface.get_view("1")).cast("B")
+            self.queue.put((self.frames, tick, pixels))
+        self.frames += 1
+        self.grab_time += time.perf_counter() - start
+
+    def write_frames(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            number, tick, pixels = item
+            offset = HEADER.size + number % self.slots * self.slot_bytes
+            self.map[offset:offset + FRAME.size] = FRAME.pack(number, tick)
+            self.pixels[offset + FRAME.size:offset + self.slot_bytes] = np.frombuffer(pixels, np.uint8)
+            self.buffers.put(pixels)
+            self.written = number + 1
+            self.map[WRITTEN_OFFSET:HEADER.size] = struct.pack("<Q", self.written)
+
+    def close(self):
+        self.queue.put(None)
+        self.writer.join()
+        del self.pixels  # the map can't close while a view of it is alive
+        self.map.flush()
+        self.map.close()
+        self.file.close()
+
+    def report(self):
+        mean = self.grab_time / self.frames * 1000 if self.frames else 0.0
+        return f"captured {self.frames - self.dropped} of {self.frames} frames, {mean:.2f} ms per grab"
+
+
+# Reads frames back from a capture file
+class CaptureFile:
+    def __init__(self, path):
+        self.file = open(path, "rb")
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self.map) < HEADER.size:
+            raise ValueError(f"{path} is not a capture file")
+        (magic, version, width, height, self.pitch, self.bytesize,
+         *masks, self.slots, self.written) = HEADER.unpack_from(self.map)
+        if magic != CAPTURE_MAGIC or version != CAPTURE_VERSION:
+            raise ValueError(f"{path} is not a version {CAPTURE_VERSION} capture file")
+        self.size = (width, height)
+        self.masks = masks
+        self.slot_bytes = FRAME.size + self.pitch * height
+
+    def available(self):
+        # Numbers of the frames still held, oldest first
+        return range(max(0, self.written - self.slots), self.written)
+
+    def holds(self, number):
+        # Whether a frame is still in the ring, rather than overwritten or dropped
+        if number not in self.available():
+            return False
+        stored, _ = FRAME.unpack_from(self.map, HEADER.size + number % self.slots * self.slot_bytes)
+        return stored == number
+
+    def surface(self, number):
+        # (tick, surface) for a frame still in the ring
+        if number not in self.available():
+            raise IndexError(f"frame {number} is not in the capture, it holds {self.available()}")
+        offset = HEADER.size + number % self.slots * self.slot_bytes
+        stored, tick = FRAME.unpack_from(self.map, offset)
+        if stored != number:
+            raise IndexError(f"frame {number} was dropped while capturing")
+        surface = pygame.Surface(self.size, 0, self.bytesize * 8, self.masks)
+        surface.get_buffer().write(self.map[offset + FRAME.size:offset + self.slot_bytes])
+        return tick, surface
+
+    def close(self):
+        self.map.close()
+        self.file.close()
+
+
+def export(path, directory, start=None, end=None, extension="png"):
+    # Saves frames [start, end) of a capture as numbered images. Returns how
+    # many were saved and the numbers of frames dropped while capturing.
+    capture = CaptureFile(path)
+    try:
+        # Frames that have been overwritten or never written are left out
+        available = capture.available()
+        first = available.start if start is None else max(start, available.start)
+        last = available.stop if end is None else min(end, available.stop)
+        frames = range(first, max(first, last))
+        os.makedirs(directory, exist_ok=True)
+        dropped = []
+        for number in frames:
+            if not capture.holds(number):
+                dropped.append(number)
+                continue
+            tick, surface = capture.surface(number)
+            pygame.image.save(surface, os.path.join(directory, f"frame_{number:06d}_tick_{tick:06d}.{extension}"))
+        return len(frames) - len(dropped), dropped
+    finally:
+        capture.close()
+
+
+def render_frames(simulation, inputs, frames, atlas=None):
+    # Steps the simulation one tick per frame and draws each frame offscreen
+    # like game_loop; yields the surface and tick of every frame
+    screen = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
+    hud = HUD(pygame.font.Font(None, SCORE_FONT_SIZE))
+    dt = 1.0 / SIMULATION_TICK_RATE
+    for _ in range(frames):
+        if simulation.game_over:
+            return
+        simulation.activate()
+        simulation.step(dt, inputs(simulation))
+        screen.fill("black")
+        simulation.draw(screen, 1.0, atlas)
+        hud.update(simulation.score, simulation.lives, simulation.player.missiles_remaining)
+        hud.draw(screen)
+        yield screen, simulation.ticks
+
+
+def scenario_frames(scenario, frames, seed, atlas=None):
+    from benchmark import SCENARIOS
+
+    # Scenarios keep their asteroids on screen so the load stays constant
+    original_bounds = Asteroid.bounds
+    Asteroid.bounds = WorldBounds(BOUNDS_WRAP)
+    try:
+        simulation = Simulation(seed)
+        simulation.activate()
+        yield from render_frames(simulation, SCENARIOS[scenario](simulation), frames, atlas)
+    finally:
+        Asteroid.bounds = original_bounds
+
+
+def replay_frames(replay, atlas=None):
+    inputs = iter(replay.inputs)
+    yield from render_frames(Simulation(replay.seed), lambda simulation: next(inputs), len(replay.inputs), atlas)
+
+
+def record(frames, path, slots):
+    # Captures every frame, waiting for the writer rather than dropping any
+    capture = None
+    start = time.perf_counter()
+    for surface, tick in frames:
+        if capture is None:
+            capture = FrameCapture(path, surface, slots, block=True)
+        capture.grab(surface, tick)
+    if capture is None:
+        return "no frames rendered"
+    capture.close()
+    return f"{capture.report()} in {time.perf_counter() - start:.2f}s"
+
+
+def frame_overhead(scenario, frames, seed, path, atlas=None):
+    # Median frame time of a scenario without and with capture, in seconds, and
+    # the frames capture dropped. Frames are paced at the game's frame rate and
+    # timed without the wait, like FrameGovernor, so the writer gets the idle
+    # time it would get in game_loop. A first untimed pass warms the caches.
+    for _ in scenario_frames(scenario, frames, seed, atlas):
+        pass
+    results = []
+    for capturing in (False, True):
+        capture = None
+        clock = pygame.time.Clock()
+        times = []
+        start = time.perf_counter()
+        for surface, tick in scenario_frames(scenario, frames, seed, atlas):
+            if capturing:
+                if capture is None:
+                    capture = FrameCapture(path, surface)
+                capture.grab(surface, tick)
+            times.append(time.perf_counter() - start)
+            clock.tick(RENDER_FRAME_RATE)
+            start = time.perf_counter()
+        if capture:
+            capture.close()
+        times.sort()
+        results.append(times[len(times) // 2])
+    return results[0], results[1], capture.dropped
+
+
+def main():
+    from atlas import SpriteAtlas
+    from benchmark import SCENARIOS
+
+    parser = argparse.ArgumentParser(description="Capture rendered frames headless into a ring file and export them")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    record_parser = commands.add_parser("record", help="render a replay or scenario offscreen and capture every frame")
+    source = record_parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--replay", metavar="PATH", help="replay file written with main.py --record")
+    source.add_argument("--scenario", choices=sorted(SCENARIOS), help="benchmark.py scenario to play")
+    record_parser.add_argument("--frames", type=int, default=300, help="frames of a scenario to capture")
+    record_parser.add_argument("--seed", type=int, default=1)
+    record_parser.add_argument("--slots", type=int, default=CAPTURE_RING_FRAMES,
+                               help="frames the ring holds, the last ones rendered are kept "
+                                    f"(default: {CAPTURE_RING_FRAMES})")
+    record_parser.add_argument("--atlas", action="store_true", help="draw with the sprite atlas")
+    record_parser.add_argument("output", help="capture file to write")
+
+    export_parser = commands.add_parser("export", help="save captured frames as an image sequence")
+    export_parser.add_argument("capture", help="capture file from record or main.py --capture")
+    export_parser.add_argument("directory")
+    export_parser.add_argument("--start", type=int, default=None, help="first frame number")
+    export_parser.add_argument("--end", type=int, default=None, help="frame number to stop before")
+    export_parser.add_argument("--format", choices=["png", "bmp", "tga"], default="png")
+
+    check_parser = commands.add_parser("check", help="fail if capture adds more than a budget to frame time")
+    check_parser.add_argument("--scenario", choices=sorted(SCENARIOS), default="missile-barrage")
+    check_parser.add_argument("--frames", type=int, default=300)
+    check_parser.add_argument("--seed", type=int, default=1)
+    check_parser.add_argument("--budget", type=float, default=CAPTURE_FRAME_BUDGET * 1000, metavar="MS")
+    check_parser.add_argument("--output", default=None,
+                              help="scratch capture file, removed after (default: in /dev/shm if there is one)")
+    args = parser.parse_args()
+
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    pygame.display.init()
+    pygame.font.init()
+
+    if args.command == "record":
+        if args.slots < 1:
+            parser.error("--slots must be at least 1")
+        atlas = SpriteAtlas().build() if args.atlas else None
+        if args.replay:
+            replay = Replay.load(args.replay)
+            if replay.tick_rate != SIMULATION_TICK_RATE:
+                parser.error(f"{args.replay} was recorded at {replay.tick_rate:g} Hz, "
+                             f"captures run at {SIMULATION_TICK_RATE}")
+            frames = replay_frames(replay, atlas)
+            count = len(replay.inputs)
+        else:
+            frames = scenario_frames(args.scenario, args.frames, args.seed, atlas)
+            count = args.frames
+        # The ring is allocated up front, so it is never made bigger than asked
+        slots = min(args.slots, count)
+        print(f"{record(frames, args.output, slots)} to {args.output}")
+        if count > slots:
+            print(f"The ring holds {slots} frames, the last ones rendered; --slots keeps more")
+
+    elif args.command == "export":
+        count, dropped = export(args.capture, args.directory, args.start, args.end, args.format)
+        print(f"Wrote {count} frames to {args.directory}")
+        if dropped:
+            shown = ", ".join(map(str, dropped[:20])) + (", ..." if len(dropped) > 20 else "")
+            print(f"Skipped {len(dropped)} frames dropped while capturing: {shown}")
+
+    else:
+        if args.output is None:
+            directory = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+            args.output = os.path.join(directory, f"capture-check-{os.getpid()}.ring")
+        try:
+            plain, captured, dropped = frame_overhead(args.scenario, args.frames, args.seed, args.output)
+        finally:
+            if os.path.exists(args.output):
+                os.remove(args.output)
+        overhead = (captured - plain) * 1000
+        print(f"{args.scenario}: median frame {plain * 1000:.2f} ms, {captured * 1000:.2f} ms capturing; "
+              f"capture adds {overhead:.2f} ms (budget {args.budget:.2f} ms), {dropped} frames dropped")
+        if overhead > args.budget or dropped:
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,15 @@
 import pygame
+from pool import Pooled
 
 # Base class for game objects
-class CircleShape(pygame.sprite.Sprite):
+class CircleShape(Pooled, pygame.sprite.Sprite):
+    # Sub-classes opt into culling or wrapping by setting a WorldBounds here
+    bounds = None
+    # Optional EntityStore. While set, new shapes keep their position and
+    # velocity in a store slot and act as thin handles onto it.
+    store = None
+    slot = None
+
     def __init__(self, x, y, radius):
         # we will be using this later
         if hasattr(self.__class__, "containers") and self.__class__.containers is not None:
@@ -9,18 +17,103 @@ class CircleShape(pygame.sprite.Sprite):
         else:
             super().__init__()
 
-        self.position = pygame.Vector2(x, y)
-        self.velocity = pygame.Vector2(0, 0)
+        if "_position" in self.__dict__:
+            # Recycled from a pool, reuse the existing vectors
+            self._position.update(x, y)
+            self._velocity.update(0, 0)
+            self._previous_position.update(x, y)
+        else:
+            self._position = pygame.Vector2(x, y)
+            self._velocity = pygame.Vector2(0, 0)
+            # Position at the start of the current tick, for render interpolation
+            self._previous_position = pygame.Vector2(x, y)
         self.radius = radius
+        self.age = 0.0
+        # Keep the store of the simulation that made the shape, so the handle
+        # still reads its own world while another simulation is active
+        store = self.__class__.store
+        if store is not None:
+            self.store = store
+            store.add(self)
+
+    # Stored shapes hand out copies of their slot, so mutate by assigning back
+    # (`shape.position += offset` works, `shape.position.x = 0` does not)
+    @property
+    def position(self):
+        if self.slot is None:
+            return self._position
+        return pygame.Vector2(self.store.position[self.slot].tolist())
+
+    @position.setter
+    def position(self, value):
+        if self.slot is None:
+            self._position = value
+        else:
+            self.store.position[self.slot] = (value[0], value[1])
+
+    @property
+    def velocity(self):
+        if self.slot is None:
+            return self._velocity
+        return pygame.Vector2(self.store.velocity[self.slot].tolist())
+
+    @velocity.setter
+    def velocity(self, value):
+        if self.slot is None:
+            self._velocity = value
+        else:
+            self.store.velocity[self.slot] = (value[0], value[1])
+
+    @property
+    def previous_position(self):
+        if self.slot is None:
+            return self._previous_position
+        return pygame.Vector2(self.store.previous[self.slot].tolist())
+
+    @previous_position.setter
+    def previous_position(self, value):
+        if self.slot is None:
+            self._previous_position = value
+        else:
+            self.store.previous[self.slot] = (value[0], value[1])
+
+    def kill(self):
+        if self.slot is not None:
+            self.store.remove(self)
+        super().kill()
 
     def is_colliding(self, circle):
-        dist = pygame.math.Vector2.distance_to(self.position, circle.position)
-        return (self.radius + circle.radius) > dist
+        # Compare squared distances to avoid a square root per pair
+        reach = self.radius + circle.radius
+        return self.position.distance_squared_to(circle.position) < reach * reach
+
+    def save_state(self):
+        if self.slot is None:
+            self._previous_position.update(self._position)
+        else:
+            self.store.previous[self.slot] = self.store.position[self.slot]
 
     def draw(self, screen):
-        # sub-classes must override
-        pass
+        # sub-classes must override, returning the rect they drew to
+        return None
+
+    def atlas_blits(self, atlas):
+        # (surface, dest) pairs from a SpriteAtlas, used in place of draw when
+        # the whole frame is drawn with one Surface.blits call
+        return []
+
+    @classmethod
+    def atlas_batch(cls, atlas, position, velocity, radius):
+        # atlas_blits for every stored shape of this class at once, given
+        # their NumPy arrays from an EntityStore
+        return []
 
     def update(self, dt):
         # sub-classes must override
         pass
+
+    def apply_bounds(self, dt):
+        # sub-classes call this at the end of update
+        self.age += dt
+        if self.bounds is not None:
+            self.bounds.apply(self)
@@ -0,0 +1,198 @@
+import asyncio
+import threading
+import time
+import numpy as np
+import pygame
+from assets import assets
+from constants import *
+from controls import *
+from hud import HUD
+from netcode import *
+
+
+def predict_ship(x, y, rotation, pending, dt):
+    # Replays inputs the server has not applied yet on top of its last ship
+    # state, with the same turning and movement as Player.update
+    position = pygame.Vector2(x, y)
+    for inputs in pending:
+        if inputs & INPUT_LEFT:
+            rotation -= PLAYER_TURN_SPEED * dt
+        if inputs & INPUT_RIGHT:
+            rotation += PLAYER_TURN_SPEED * dt
+        forward = pygame.Vector2(0, 1).rotate(rotation)
+        if inputs & INPUT_FORWARD:
+            position += forward * PLAYER_SPEED * dt
+        if inputs & INPUT_BACK:
+            position -= forward * PLAYER_SPEED * dt
+    return position, rotation
+
+
+# Client side of the protocol in netcode.py: says hello, sends one input per
+# frame along with the newest snapshot tick as the ack, and decodes snapshots
+# against the baselines it kept. Used by the thin pygame client below and by
+# loadtest.py.
+class NetClient:
+    def __init__(self):
+        self.ship_id = None
+        self.rate = None
+        self.writer = None
+        self.baselines = {}  # tick -> decoded body state
+        self.snapshot = None  # newest decoded Snapshot
+        self.received_at = 0.0
+        self.input_sequence = 0
+        self.pending = []  # (sequence, inputs) not yet applied by the server
+        self.bytes_received = 0
+        self.snapshots = 0
+        self.connected = False
+
+    async def connect(self, host, port):
+        reader, self.writer = await asyncio.open_connection(host, port)
+        self.writer.write(frame(HELLO.pack(MSG_HELLO)))
+        message = await read_frame(reader)
+        _, self.ship_id, self.rate, _ = WELCOME.unpack(message)
+        self.connected = True
+        return reader
+
+    async def receive(self, reader):
+        try:
+            while True:
+                message = await read_frame(reader)
+                self.bytes_received += len(message) + FRAME.size
+                if message[0] == MSG_SNAPSHOT:
+                    self.apply(decode_snapshot(message, self.baselines, self.rate))
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self.connected = False
+
+    def apply(self, snapshot):
+        self.snapshot = snapshot
+        self.received_at = time.perf_counter()
+        self.snapshots += 1
+        self.baselines[snapshot.tick] = snapshot.bodies
+        # The server only ever deltas against ticks we acked, which never go back
+        if snapshot.base_tick != NO_BASELINE:
+            for tick in [tick for tick in self.baselines if tick < snapshot.base_tick]:
+                del self.baselines[tick]
+        while self.pending and self.pending[0][0] <= snapshot.input_sequence:
+            self.pending.pop(0)
+
+    def send_input(self, inputs):
+        if not self.connected:
+            return
+        self.input_sequence += 1
+        self.pending.append((self.input_sequence, inputs))
+        ack = self.snapshot.tick if self.snapshot else NO_BASELINE
+        self.writer.write(frame(INPUT.pack(MSG_INPUT, self.input_sequence, ack, inputs)))
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+    def own_ship(self):
+        # This client's ship with its pending inputs applied, or None
+        if self.snapshot is None:
+            return None
+        ship = self.snapshot.ship(self.ship_id)
+        if ship is None:
+            return None
+        pending = [inputs for _, inputs in self.pending]
+        position, rotation = predict_ship(
+            ship["x"] / NET_POSITION_SCALE, ship["y"] / NET_POSITION_SCALE,
+            ship["rotation"] * 360 / 0x10000, pending, 1.0 / self.rate,
+        )
+        return ship, position, rotation
+
+
+def snapshot_blits(atlas, client):
+    # Sprites for the newest snapshot, moved along by the time since it arrived
+    snapshot = client.snapshot
+    bodies = snapshot.bodies
+    elapsed = min(time.perf_counter() - client.received_at, 2.0 / client.rate)
+    velocity = np.column_stack([bodies["vx"], bodies["vy"]]) / NET_VELOCITY_SCALE
+    position = np.column_stack([bodies["x"], bodies["y"]]) / NET_POSITION_SCALE + velocity * elapsed
+    radius = bodies["radius"].astype(float)
+
+    blits = []
+    kinds = bodies["kind"]
+    asteroids = kinds == KIND_ASTEROID
+    shots = kinds == KIND_SHOT
+    missiles = kinds == KIND_MISSILE
+    blits += atlas.asteroids(position[asteroids], radius[asteroids])
+    blits += atlas.shots(position[shots], radius[shots])
+    blits += atlas.missiles(position[missiles], velocity[missiles])
+
+    for ship in snapshot.ships:
+        if ship["id"] == client.ship_id or ship["lives"] == 0:
+            continue
+        if ship["flags"] & SHIP_INVULNERABLE and not ship["flags"] & SHIP_VISIBLE:
+            continue
+        position = pygame.Vector2(ship["x"] / NET_POSITION_SCALE, ship["y"] / NET_POSITION_SCALE)
+        blits.append(atlas.ship(position, ship["rotation"] * 360 / 0x10000))
+    return blits
+
+
+def play(view, host, port=NET_PORT):
+    # Thin client for main.py: the server runs the game, this only sends input,
+    # predicts its own ship and draws snapshots to a world-sized Viewport.
+    # Returns the final score once the ship is out of lives, or None when the
+    # player leaves with ESC.
+    client = NetClient()
+    ready = threading.Event()
+    state = {}
+
+    async def run():
+        state["loop"] = asyncio.get_running_loop()
+        try:
+            reader = await client.connect(host, port)
+        except OSError:
+            return
+        finally:
+            ready.set()
+        await client.receive(reader)
+
+    thread = threading.Thread(target=asyncio.run, args=(run(),), daemon=True)
+    thread.start()
+    ready.wait()
+    if not client.connected:
+        print(f"Could not connect to {host}:{port}")
+        return None
+    loop = state["loop"]
+
+    assets.wait()
+    atlas = assets.sprite_atlas()
+    hud = HUD(assets.font(SCORE_FONT_SIZE), assets.text_cache, assets.hud_icon())
+    screen = view.surface
+    clock = pygame.time.Clock()
+    pressed = 0
+    score = None
+    try:
+        while client.connected:
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT or (event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE):
+                    return None
+                if event.type == pygame.KEYDOWN and event.key == pygame.K_e:
+                    pressed |= INPUT_MISSILE
+            loop.call_soon_threadsafe(client.send_input, read_keyboard() | pressed)
+            pressed = 0
+
+            screen.fill("black")
+            if client.snapshot is not None:
+                blits = snapshot_blits(atlas, client)
+                own = client.own_ship()
+                if own is not None:
+                    ship, position, rotation = own
+                    score = int(ship["score"])
+                    if ship["lives"] == 0:
+                        return score
+                    if not ship["flags"] & SHIP_INVULNERABLE or ship["flags"] & SHIP_VISIBLE:
+                        blits.append(atlas.ship(position, rotation))
+                    hud.update(score, int(ship["lives"]), int(ship["missiles"]))
+                screen.blits(blits)
+                hud.draw(screen)
+            view.present()
+            clock.tick(client.rate)
+        print("Disconnected from the server")
+        return score
+    finally:
+        loop.call_soon_threadsafe(client.close)
@@ -0,0 +1,218 @@
+import math
+import numpy as np
+from constants import *
+
+
+# Uniform grid used as a broad phase for circle-vs-circle collision checks.
+# Shapes are bucketed by every cell their bounding box touches, so a query only
+# has to look at shapes in nearby cells instead of every shape in a group.
+class SpatialHash:
+    def __init__(self, cell_size=COLLISION_CELL_SIZE):
+        self.cell_size = cell_size
+        self.cells = {}
+        self.shapes = []
+        self.moves = []  # (start x, start y, end x, end y) per shape when swept
+
+    def clear(self):
+        self.cells.clear()
+        self.shapes = []
+        self.moves = []
+
+    def cell_range(self, position, radius):
+        size = self.cell_size
+        return (
+            int((position.x - radius) // size),
+            int((position.y - radius) // size),
+            int((position.x + radius) // size),
+            int((position.y + radius) // size),
+        )
+
+    def swept_range(self, shape):
+        # Cells covered by the shape anywhere along its move this tick
+        size = self.cell_size
+        start = shape.previous_position
+        end = shape.position
+        radius = shape.radius
+        return (
+            int((min(start.x, end.x) - radius) // size),
+            int((min(start.y, end.y) - radius) // size),
+            int((max(start.x, end.x) + radius) // size),
+            int((max(start.y, end.y) + radius) // size),
+        )
+
+    def insert(self, shape, swept=False):
+        index = len(self.shapes)
+        self.shapes.append(shape)
+
+        cells = self.cells
+        if swept:
+            start = shape.previous_position
+            end = shape.position
+            self.moves.append((start.x, start.y, end.x, end.y))
+            min_x, min_y, max_x, max_y = self.swept_range(shape)
+        else:
+            min_x, min_y, max_x, max_y = self.cell_range(shape.position, shape.radius)
+        for cx in range(min_x, max_x + 1):
+            for cy in range(min_y, max_y + 1):
+                bucket = cells.get((cx, cy))
+                if bucket is None:
+                    cells[(cx, cy)] = [index]
+                else:
+                    bucket.append(index)
+
+    def build(self, shapes, swept=False):
+        # swept=True buckets shapes by their whole move this tick, for query_swept
+        self.clear()
+        for shape in shapes:
+            self.insert(shape, swept)
+        return self
+
+    def query(self, shape):
+        # Returns every inserted shape overlapping `shape`, in insertion order,
+        # so callers see hits in the same order as iterating the original group
+        cells = self.cells
+        candidates = set()
+        min_x, min_y, max_x, max_y = self.cell_range(shape.position, shape.radius)
+        for cx in range(min_x, max_x + 1):
+            for cy in range(min_y, max_y + 1):
+                bucket = cells.get((cx, cy))
+                if bucket is not None:
+                    candidates.update(bucket)
+
+        if not candidates:
+            return []
+
+        x = shape.position.x
+        y = shape.position.y
+        radius = shape.radius
+        hits = []
+        for index in sorted(candidates):
+            other = self.shapes[index]
+            dx = other.position.x - x
+            dy = other.position.y - y
+            reach = other.radius + radius
+            if dx * dx + dy * dy < reach * reach:
+                hits.append(other)
+        return hits
+
+    def query_swept(self, shape, fraction=COLLISION_SWEEP_FRACTION):
+        # (other, time) for every inserted shape that touched `shape` during
+        # the tick, in insertion order, with time as in time_of_impact. The
+        # grid has to be built with swept=True.
+        cells = self.cells
+        candidates = set()
+        min_x, min_y, max_x, max_y = self.swept_range(shape)
+        for cx in range(min_x, max_x + 1):
+            for cy in range(min_y, max_y + 1):
+                bucket = cells.get((cx, cy))
+                if bucket is not None:
+                    candidates.update(bucket)
+
+        if not candidates:
+            return []
+
+        start = shape.previous_position
+        end = shape.position
+        start_x = start.x
+        start_y = start.y
+        move_x = end.x - start_x
+        move_y = end.y - start_y
+        radius = shape.radius
+        hits = []
+        for index in sorted(candidates):
+            other_start_x, other_start_y, other_end_x, other_end_y = self.moves[index]
+            other = self.shapes[index]
+            time = sweep(
+                other_start_x - start_x, other_start_y - start_y,
+                other_end_x - other_start_x - move_x, other_end_y - other_start_y - move_y,
+                radius + other.radius, fraction,
+            )
+            if time is not None:
+                hits.append((other, time))
+        return hits
+
+
+def time_of_impact(shape, other, fraction=COLLISION_SWEEP_FRACTION):
+    # When two shapes moving in straight lines from previous_position to
+    # position first touched during the tick, from 0 (start) to 1 (end), or
+    # None if they never did
+    start = shape.previous_position
+    end = shape.position
+    other_start = other.previous_position
+    other_end = other.position
+    return sweep(
+        other_start.x - start.x, other_start.y - start.y,
+        (other_end.x - other_start.x) - (end.x - start.x),
+        (other_end.y - other_start.y) - (end.y - start.y),
+        shape.radius + other.radius, fraction,
+    )
+
+
+def sweep(dx, dy, mx, my, reach, fraction):
+    # time_of_impact given where the other shape started relative to the
+    # first (dx, dy) and how far it moved relative to it (mx, my). Most pairs
+    # are slow, moving less than `fraction` of their combined radius relative
+    # to each other; those that end the tick further apart than that could not
+    # have touched, and are rejected without solving for the time.
+    travel = mx * mx + my * my
+    limit = fraction * reach
+    if travel < limit * limit:
+        ex = dx + mx
+        ey = dy + my
+        far = reach + limit
+        if ex * ex + ey * ey >= far * far:
+            return None
+
+    gap = dx * dx + dy * dy - reach * reach
+    if gap < 0:
+        return 0.0  # already touching at the start of the tick
+    approach = dx * mx + dy * my
+    if approach >= 0:
+        return None  # moving apart
+    discriminant = approach * approach - travel * gap
+    if discriminant < 0:
+        return None  # passing wide
+    time = (-approach - math.sqrt(discriminant)) / travel
+    return time if time <= 1.0 else None
+
+
+def times_of_impact(start, end, other_start, other_end, reach):
+    # time_of_impact for arrays of pairs: (n, 2) positions at the start and
+    # end of the tick and (n,) combined radii. Misses come back as inf. The
+    # early rejection of slow pairs in sweep() would not save anything here,
+    # and never changes a result.
+    offset = other_start - start
+    motion = (other_end - other_start) - (end - start)
+    travel = np.einsum("ij,ij->i", motion, motion)
+    gap = np.einsum("ij,ij->i", offset, offset) - reach * reach
+    approach = np.einsum("ij,ij->i", offset, motion)
+    discriminant = approach * approach - travel * gap
+
+    times = np.full(len(reach), np.inf)
+    swept = (gap >= 0) & (approach < 0) & (discriminant >= 0)
+    entry = (-approach[swept] - np.sqrt(discriminant[swept])) / travel[swept]
+    times[swept] = np.where(entry <= 1.0, entry, np.inf)
+    times[gap < 0] = 0.0
+    return times
+
+
+def colliding_pairs(shapes, others, grid=None):
+    # Every (shape, other) pair that overlaps, using a spatial hash over `others`
+    if grid is None:
+        grid = SpatialHash()
+    grid.build(others)
+    pairs = []
+    for shape in shapes:
+        for other in grid.query(shape):
+            pairs.append((shape, other))
+    return pairs
+
+
+def colliding_pairs_naive(shapes, others):
+    # Reference nested-loop version, kept for benchmarks and cross-checks
+    pairs = []
+    for shape in shapes:
+        for other in others:
+            if shape.is_colliding(other):
+                pairs.append((shape, other))
+    return pairs
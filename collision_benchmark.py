@@ -0,0 +1,60 @@
+import random
+import time
+from circleshape import CircleShape
+from collision import SpatialHash, colliding_pairs, colliding_pairs_naive
+from constants import *
+
+# Compares the spatial hash broad phase against the old nested loops.
+# Run with: python collision_benchmark.py
+
+BODY_COUNTS = [100, 1000, 10000]
+ASTEROID_SHARE = 0.9  # the rest are projectiles
+
+
+def make_bodies(count, radii):
+    bodies = []
+    for _ in range(count):
+        bodies.append(CircleShape(
+            random.uniform(0, SCREEN_WIDTH),
+            random.uniform(0, SCREEN_HEIGHT),
+            random.choice(radii),
+        ))
+    return bodies
+
+
+def best_time(func, repeats):
+    best = None
+    result = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best, result
+
+
+def main():
+    random.seed(1)
+    asteroid_radii = [ASTEROID_MIN_RADIUS * kind for kind in range(1, ASTEROID_KINDS + 1)]
+    grid = SpatialHash()
+
+    print(f"{'bodies':>8} {'pairs':>8} {'nested ms':>12} {'hash ms':>10} {'speedup':>8}")
+    for count in BODY_COUNTS:
+        asteroid_count = int(count * ASTEROID_SHARE)
+        asteroids = make_bodies(asteroid_count, asteroid_radii)
+        projectiles = make_bodies(count - asteroid_count, [SHOT_RADIUS, MISSILE_RADIUS])
+        repeats = 1 if count >= 10000 else 5
+
+        naive_time, naive_pairs = best_time(lambda: colliding_pairs_naive(asteroids, projectiles), repeats)
+        hash_time, hash_pairs = best_time(lambda: colliding_pairs(asteroids, projectiles, grid), repeats)
+
+        if naive_pairs != hash_pairs:
+            raise SystemExit(f"hit mismatch at {count} bodies: {len(naive_pairs)} vs {len(hash_pairs)}")
+
+        print(f"{count:>8} {len(hash_pairs):>8} {naive_time * 1000:>12.2f} "
+              f"{hash_time * 1000:>10.2f} {naive_time / hash_time:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -18,16 +18,106 @@ PLAYER_MISSILE_COUNT = 5
 
 SHOT_RADIUS = 5 
 
+# Timing constants
+SIMULATION_TICK_RATE = 60  # fixed simulation ticks per second
+MAX_CATCH_UP_STEPS = 5  # most ticks run in one rendered frame
+RENDER_FRAME_RATE = 60  # frame cap for the window
+
+# Object pool constants, the most killed instances kept for reuse per class
+POOL_MAX_SIZE = 256
+POOL_MAX_SIZES = {
+    "asteroids": 512,
+    "shots": 256,
+    "missiles": 64,
+    "explosions": 128,
+}
+
+# Sprite atlas constants
+ATLAS_MISSILE_HEADINGS = 64  # pre-rendered missile directions
+ATLAS_SHIP_ROTATIONS = 72  # pre-rendered ship rotations, 5 degrees apart
+
+# Dirty rectangle rendering constants
+DIRTY_RECT_THRESHOLD = 0.4  # fraction of the screen above which a full flip is used
+DIRTY_RECT_PADDING = 4  # pixels added around every drawn rect
+
+# Profiler constants
+PROFILER_HISTORY = 3600  # frames kept in the ring buffer
+PROFILER_GRAPH_FRAMES = 120  # frames shown in the overlay graph
+PROFILER_FONT_SIZE = 20
+
+# Collision constants
+COLLISION_CELL_SIZE = ASTEROID_MAX_RADIUS * 2  # spatial hash cell size in pixels
+# Projectile pairs that move less than this share of their combined radius
+# relative to each other in a tick skip the swept test when they end the tick
+# well apart
+COLLISION_SWEEP_FRACTION = 0.5
+
+# Frame governor constants
+GOVERNOR_BUDGET = 1.0 / RENDER_FRAME_RATE  # seconds of work allowed per frame
+GOVERNOR_SMOOTHING = 0.1  # weight of the newest frame in the moving average
+GOVERNOR_SHED_RATIO = 0.9  # average over this share of the budget drops a level
+GOVERNOR_RESTORE_RATIO = 0.5  # average under this share of the budget restores one
+GOVERNOR_HOLD_FRAMES = 30  # frames between level changes, so a spike can't flap them
+
+# Memory tracker constants
+MEMTRACK_TRACEBACK_DEPTH = 8  # frames kept per allocation, enough to reach the game code
+MEMTRACK_REPORT_ROWS = 20  # functions listed in a report
+MEMTRACK_TRACE_EVERY = 10  # frames between traced frames, tracing slows a frame down many times
+
+# Threaded simulation constants
+SNAPSHOT_LATENCY_HISTORY = 3600  # frames whose snapshot latency is kept for metrics
+
+# Capture constants
+CAPTURE_RING_FRAMES = 120  # frames kept by main.py --capture, about 440 MB at 1280x720
+CAPTURE_QUEUE_FRAMES = 4  # grabbed frames waiting for the writer before new ones are dropped
+CAPTURE_FRAME_BUDGET = 0.0015  # seconds capture may add to a frame, see capture.py check
+
+# Entity store constants
+ENTITY_STORE_CAPACITY = 1024  # preallocated body slots, doubles when full
+
+# Network constants
+NET_PORT = 7777
+NET_POSITION_SCALE = 16  # snapshot position units per pixel
+NET_VELOCITY_SCALE = 16  # snapshot velocity units per pixel per second
+NET_POSITION_TOLERANCE = 4  # units a predicted position may drift before it is resent
+NET_SNAPSHOT_HISTORY = 64  # ticks of sent snapshots kept as delta baselines
+NET_MAX_WRITE_BUFFER = 256 * 1024  # bytes queued for a client before snapshots are skipped
+NET_METRICS_INTERVAL = 5.0  # seconds between server metric reports
+
+# Environment constants
+ENV_NEAREST_ASTEROIDS = 8  # asteroids described in each observation
+ENV_MAX_TICKS = SIMULATION_TICK_RATE * 60 * 5  # episodes are cut off after five minutes
+
 # Missile constants
 MISSILE_RADIUS = 7
 MISSILE_SPEED = 300
 MISSILE_COOLDOWN = 0.5  # seconds
 
+# World bounds constants
+ASTEROID_BOUNDS_MARGIN = ASTEROID_MAX_RADIUS * 2  # must stay beyond the spawn edge
+SHOT_BOUNDS_MARGIN = SHOT_RADIUS
+MISSILE_BOUNDS_MARGIN = MISSILE_RADIUS * 4  # leave room for the trail
+POPULATION_LOG_INTERVAL = 60.0  # seconds between live entity reports
+
 # Explosion constants
 EXPLOSION_DURATION = 0.5  # seconds
 EXPLOSION_PARTICLES = 12
 EXPLOSION_SPEED = 120
 EXPLOSION_FADE_SPEED = 2.0  # how quickly particles fade
+EXPLOSION_DAMPING = 0.95  # particle velocity multiplier per 1/EXPLOSION_DAMPING_RATE of a second
+EXPLOSION_DAMPING_RATE = 60  # frame rate the damping factor was tuned at
+EXPLOSION_COLOR_JITTER = 20  # max per-channel color variation
+PARTICLE_MIN_RADIUS = 2
+PARTICLE_MAX_RADIUS = 5
+PARTICLE_CAPACITY = 4096  # preallocated slots, grows if a barrage needs more
+PARTICLE_RADIUS_STEP = 1.0  # sprite cache quantization in pixels
+PARTICLE_ALPHA_BUCKETS = 16
+PARTICLE_COLOR_STEP = 32  # per-channel color quantization
+PARTICLE_SPRITE_CACHE_SIZE = 2048
+
+# Sprite cache constants
+SPRITE_CACHE_SIZE = 1024  # default LRU capacity
+ASSET_TEXT_CACHE_SIZE = 256  # static text surfaces kept by the asset manager
 
 # Scoring constants
 SCORE_ASTEROID_SMALL = 100
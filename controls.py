@@ -0,0 +1,28 @@
+import pygame
+
+# Player input for one tick, packed into a bitmask so the simulation never has
+# to touch the keyboard itself
+INPUT_FORWARD = 1 << 0   # W
+INPUT_LEFT = 1 << 1      # A
+INPUT_BACK = 1 << 2      # S
+INPUT_RIGHT = 1 << 3     # D
+INPUT_SHOOT = 1 << 4     # SPACE
+INPUT_MISSILE = 1 << 5   # E
+
+KEY_BINDINGS = [
+    (pygame.K_w, INPUT_FORWARD),
+    (pygame.K_a, INPUT_LEFT),
+    (pygame.K_s, INPUT_BACK),
+    (pygame.K_d, INPUT_RIGHT),
+    (pygame.K_SPACE, INPUT_SHOOT),
+    (pygame.K_e, INPUT_MISSILE),
+]
+
+
+def read_keyboard():
+    keys = pygame.key.get_pressed()
+    inputs = 0
+    for key, flag in KEY_BINDINGS:
+        if keys[key]:
+            inputs |= flag
+    return inputs
@@ -0,0 +1,48 @@
+import pygame
+from constants import *
+
+
+# Optional renderer that only touches the parts of the screen that changed.
+# Each frame it erases the rects drawn last frame, the caller draws everything
+# and hands back the rects it drew, and only the union of old and new rects is
+# pushed to the display. When too much of the screen is dirty it falls back to
+# a plain full fill and flip, which is cheaper at that point.
+class DirtyRectRenderer:
+    def __init__(self, screen, background="black", threshold=DIRTY_RECT_THRESHOLD):
+        self.screen = screen
+        self.background = background
+        self.screen_area = screen.get_width() * screen.get_height()
+        self.threshold = threshold
+        self.previous = []
+        self.full_redraw = True  # the first frame always paints everything
+        self.full_frames = 0
+        self.partial_frames = 0
+
+    def clear(self):
+        if self.full_redraw:
+            self.screen.fill(self.background)
+            return
+        for rect in self.previous:
+            self.screen.fill(self.background, rect)
+
+    def present(self, rects):
+        # Grow each rect a little so outlines and rounding never leave trails
+        screen_rect = self.screen.get_rect()
+        current = [rect.inflate(DIRTY_RECT_PADDING, DIRTY_RECT_PADDING).clip(screen_rect) for rect in rects]
+
+        dirty = self.previous + current
+        dirty_area = sum(rect.w * rect.h for rect in dirty)
+        if self.full_redraw or dirty_area > self.threshold * self.screen_area:
+            pygame.display.flip()
+            self.full_frames += 1
+        else:
+            pygame.display.update(dirty)
+            self.partial_frames += 1
+
+        self.previous = current
+        # A mostly-dirty frame is cheaper to clear with one full fill next time
+        self.full_redraw = dirty_area > self.threshold * self.screen_area
+
+    def invalidate(self):
+        # Forces a full repaint, e.g. after another screen drew over everything
+        self.full_redraw = True
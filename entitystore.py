@@ -0,0 +1,271 @@
+import numpy as np
+from collision import times_of_impact
+from constants import *
+from worldbounds import BOUNDS_KILL, BOUNDS_WRAP, BOUNDS_LIFETIME
+
+
+# Structure-of-arrays storage for CircleShape bodies. Position, velocity,
+# radius and kind of every stored shape live in contiguous NumPy arrays, so
+# integration, bounds checks and overlap tests run as a few vectorized
+# operations instead of one Python update per body. The shapes themselves stay
+# around as thin handles: their position and velocity read and write a slot
+# here, so split(), kill() and velocity access keep working unchanged.
+#
+# Live bodies are packed into slots [0, count); removing one moves the last
+# body into the hole, so handles look up their slot instead of caching it.
+class EntityStore:
+    def __init__(self, capacity=ENTITY_STORE_CAPACITY):
+        self.capacity = 0
+        self.position = np.zeros((0, 2))
+        self.previous = np.zeros((0, 2))  # position at the start of the tick
+        self.velocity = np.zeros((0, 2))
+        self.radius = np.zeros(0)
+        self.age = np.zeros(0)
+        self.kind = np.zeros(0, dtype=np.int8)
+        # Insertion order, which is also the order of the sprite groups, so
+        # batch results can be handled in the same order as iterating a group
+        self.serial = np.zeros(0, dtype=np.int64)
+        self.handles = []
+        self.count = 0
+        self.next_serial = 0
+        self.kinds = {}  # shape class -> kind id
+        self.grow(capacity)
+
+    def grow(self, capacity):
+        old = self.capacity
+        if capacity <= old:
+            return
+
+        def resized(array):
+            grown = np.zeros((capacity,) + array.shape[1:], dtype=array.dtype)
+            grown[:old] = array
+            return grown
+
+        self.position = resized(self.position)
+        self.previous = resized(self.previous)
+        self.velocity = resized(self.velocity)
+        self.radius = resized(self.radius)
+        self.age = resized(self.age)
+        self.kind = resized(self.kind)
+        self.serial = resized(self.serial)
+        self.handles.extend([None] * (capacity - old))
+        self.capacity = capacity
+
+    def kind_of(self, cls):
+        kind = self.kinds.get(cls)
+        if kind is None:
+            kind = self.kinds[cls] = len(self.kinds)
+        return kind
+
+    def add(self, shape):
+        if self.count == self.capacity:
+            self.grow(self.capacity * 2)
+        slot = self.count
+        self.count += 1
+
+        self.position[slot] = shape._position
+        self.previous[slot] = shape._previous_position
+        self.velocity[slot] = shape._velocity
+        self.radius[slot] = shape.radius
+        self.age[slot] = shape.age
+        self.kind[slot] = self.kind_of(type(shape))
+        self.serial[slot] = self.next_serial
+        self.next_serial += 1
+        self.handles[slot] = shape
+        shape.slot = slot
+
+    def add_batch(self, cls, shapes, position, previous, velocity, radius, age):
+        # add() for many new, not yet stored shapes of one class at once, with
+        # their state given as arrays
+        n = len(shapes)
+        if self.count + n > self.capacity:
+            self.grow(max(self.capacity * 2, self.count + n))
+        first = self.count
+        slots = slice(first, first + n)
+        self.position[slots] = position
+        self.previous[slots] = previous
+        self.velocity[slots] = velocity
+        self.radius[slots] = radius
+        self.age[slots] = age
+        self.kind[slots] = self.kind_of(cls)
+        self.serial[slots] = np.arange(self.next_serial, self.next_serial + n)
+        self.next_serial += n
+        self.handles[slots] = shapes
+        for slot, shape in enumerate(shapes, first):
+            shape.store = self
+            shape.slot = slot
+        self.count += n
+
+    def remove(self, shape):
+        # Hand the latest values back to the shape so a killed body can still
+        # be read, e.g. split() spawning children where the parent was
+        slot = shape.slot
+        shape._position.update(*self.position[slot].tolist())
+        shape._previous_position.update(*self.previous[slot].tolist())
+        shape._velocity.update(*self.velocity[slot].tolist())
+        shape.age = float(self.age[slot])
+        shape.slot = None
+
+        last = self.count - 1
+        if slot != last:
+            for array in (self.position, self.previous, self.velocity, self.radius,
+                          self.age, self.kind, self.serial):
+                array[slot] = array[last]
+            moved = self.handles[slot] = self.handles[last]
+            moved.slot = slot
+        self.handles[last] = None
+        self.count = last
+
+    def slots_of(self, cls):
+        # Slots of every stored body of one class, in group order
+        kind = self.kinds.get(cls)
+        if kind is None:
+            return np.zeros(0, dtype=np.intp)
+        slots = np.flatnonzero(self.kind[:self.count] == kind)
+        return slots[np.argsort(self.serial[slots], kind="stable")]
+
+    def save_state(self):
+        n = self.count
+        self.previous[:n] = self.position[:n]
+
+    def integrate(self, dt):
+        n = self.count
+        self.position[:n] += self.velocity[:n] * dt
+        self.age[:n] += dt
+
+    def apply_bounds(self):
+        # Vectorized WorldBounds.apply for every stored class that has bounds
+        for cls in self.kinds:
+            bounds = cls.bounds
+            if bounds is not None:
+                self.apply_class_bounds(cls, bounds)
+
+    def apply_class_bounds(self, cls, bounds):
+        n = self.count
+        mask = self.kind[:n] == self.kinds[cls]
+        if not mask.any():
+            return
+        x = self.position[:n, 0]
+        y = self.position[:n, 1]
+        radius = self.radius[:n]
+
+        if bounds.policy == BOUNDS_LIFETIME:
+            self.kill_slots(np.flatnonzero(mask & (self.age[:n] >= bounds.lifetime)), bounds)
+            return
+
+        left = x + radius < bounds.left
+        right = x - radius > bounds.right
+        top = y + radius < bounds.top
+        bottom = y - radius > bounds.bottom
+
+        if bounds.policy == BOUNDS_KILL:
+            # As in WorldBounds.apply, only once the whole tick was outside
+            px = self.previous[:n, 0]
+            py = self.previous[:n, 1]
+            was_outside = ((px + radius < bounds.left) | (px - radius > bounds.right)
+                           | (py + radius < bounds.top) | (py - radius > bounds.bottom))
+            self.kill_slots(np.flatnonzero(mask & (left | right | top | bottom) & was_outside), bounds)
+        elif bounds.policy == BOUNDS_WRAP:
+            width = bounds.right - bounds.left + 2 * radius
+            height = bounds.bottom - bounds.top + 2 * radius
+            x += np.where(mask & left, width, 0) - np.where(mask & right, width, 0)
+            y += np.where(mask & top, height, 0) - np.where(mask & bottom, height, 0)
+            wrapped = mask & (left | right | top | bottom)
+            self.previous[:n][wrapped] = self.position[:n][wrapped]
+            bounds.wrapped += int(wrapped.sum())
+
+    def kill_slots(self, slots, bounds):
+        # Killing reshuffles slots, so collect the handles first
+        handles = [self.handles[slot] for slot in slots[np.argsort(self.serial[slots])].tolist()]
+        for shape in handles:
+            shape.kill()
+        bounds.removed += len(handles)
+
+    def overlapping(self, cls, position, radius):
+        # Stored bodies of one class overlapping a circle, in group order
+        slots = self.slots_of(cls)
+        dx = self.position[slots, 0] - position.x
+        dy = self.position[slots, 1] - position.y
+        reach = self.radius[slots] + radius
+        hits = slots[dx * dx + dy * dy < reach * reach]
+        return [self.handles[slot] for slot in hits.tolist()]
+
+    def candidate_pairs(self, slots, others, center, extent):
+        # Broad phase for swept_pairs: every (i, j) index pair into
+        # slots and others whose x intervals center +- extent overlap. Bodies
+        # of slots are sorted by center so each other only looks at the ones
+        # within reach along that axis.
+        xs = center[slots]
+        order = np.argsort(xs, kind="stable")
+        sorted_xs = xs[order]
+        other_xs = center[others]
+        reach = extent[slots].max() + extent[others]
+        low = np.searchsorted(sorted_xs, other_xs - reach, "left")
+        high = np.searchsorted(sorted_xs, other_xs + reach, "right")
+        counts = high - low
+        total = int(counts.sum())
+
+        # Expand every (other, candidate range) into flat index arrays
+        other_index = np.repeat(np.arange(len(others)), counts)
+        starts = np.repeat(low - (np.cumsum(counts) - counts), counts)
+        shape_index = order[starts + np.arange(total)]
+        return shape_index, other_index
+
+    def swept_pairs(self, cls, other_cls):
+        # Every (shape, other, time) pair between two classes that touched
+        # during the tick, moving in straight lines from their previous
+        # positions, with time as in collision.time_of_impact. Grouped by
+        # shape, with both sides in group order.
+        slots = self.slots_of(cls)
+        others = self.slots_of(other_cls)
+        if len(slots) == 0 or len(others) == 0:
+            return []
+
+        # Broad phase on the x interval each body swept this tick
+        n = self.count
+        start = self.previous[:n, 0]
+        end = self.position[:n, 0]
+        center = (start + end) * 0.5
+        extent = np.abs(end - start) * 0.5 + self.radius[:n]
+        shape_index, other_index = self.candidate_pairs(slots, others, center, extent)
+        if len(shape_index) == 0:
+            return []
+
+        a = slots[shape_index]
+        b = others[other_index]
+        times = times_of_impact(self.previous[a], self.position[a], self.previous[b], self.position[b],
+                                self.radius[a] + self.radius[b])
+        hit = np.isfinite(times)
+
+        # slots and others are already in group order, so sorting by their
+        # positions in those arrays restores group order on both sides
+        pairs = sorted(zip(shape_index[hit].tolist(), other_index[hit].tolist(), times[hit].tolist()))
+        handles = self.handles
+        slots = slots.tolist()
+        others = others.tolist()
+        return [(handles[slots[i]], handles[others[j]], time) for i, j, time in pairs]
+
+    def draw(self, screen):
+        return [shape.draw(screen) for shape in self.handles[:self.count]]
+
+    def atlas_blits(self, atlas):
+        # Sprites for every stored body, looked up a whole class at a time
+        blits = []
+        n = self.count
+        for cls, kind in self.kinds.items():
+            slots = np.flatnonzero(self.kind[:n] == kind)
+            if len(slots):
+                blits += cls.atlas_batch(atlas, self.position[slots], self.velocity[slots], self.radius[slots])
+        return blits
+
+    def lerp_positions(self, alpha):
+        # Blends every stored position towards the previous tick in place and
+        # returns the exact positions for restore_positions
+        n = self.count
+        exact = self.position[:n].copy()
+        previous = self.previous[:n]
+        self.position[:n] = previous + (exact - previous) * alpha
+        return exact
+
+    def restore_positions(self, exact):
+        self.position[:len(exact)] = exact
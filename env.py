@@ -0,0 +1,217 @@
+import os
+
+# Environments run headless, so make sure SDL never looks for a real display
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import argparse
+import random
+import time
+import numpy as np
+import pygame
+from asteroid import Asteroid
+from atlas import SpriteAtlas
+from constants import *
+from simulation import Simulation
+
+# Gym-style reset()/step() API over Simulation for training and evaluating
+# bots. Actions are the input bitmasks from controls.py (0 to ENV_ACTIONS - 1)
+# and the reward is the score gained during the step, so the rules are exactly
+# the game's: lives, respawn invulnerability, shot and missile scoring, splits.
+#
+# Observations are float32 vectors of OBSERVATION_SIZE values:
+#
+#   player     x / width, y / height, sin and cos of the rotation,
+#              invulnerable, lives left, missiles left, shot ready
+#   asteroids  ENV_NEAREST_ASTEROIDS rows of dx / width, dy / height,
+#              vx / PLAYER_SPEED, vy / PLAYER_SPEED, radius / max radius,
+#              nearest first, rows past the last asteroid left at zero
+#
+# Observation, pixel and result arrays are allocated once and refilled in place
+# every step, so copy them if they need to outlive the next step.
+ENV_ACTIONS = 64
+PLAYER_FEATURES = 8
+ASTEROID_FEATURES = 5
+OBSERVATION_SIZE = PLAYER_FEATURES + ENV_NEAREST_ASTEROIDS * ASTEROID_FEATURES
+
+
+class AsteroidsEnv:
+    # observation and pixels may be views into a VectorEnv's batched arrays;
+    # standalone environments allocate their own
+    def __init__(self, seed=None, max_ticks=ENV_MAX_TICKS, render_pixels=False,
+                 observation=None, pixels=None, atlas=None):
+        self.seed_source = random.Random(seed)
+        self.max_ticks = max_ticks
+        self.dt = 1.0 / SIMULATION_TICK_RATE
+        self.simulation = None
+
+        if observation is None:
+            observation = np.zeros(OBSERVATION_SIZE, dtype=np.float32)
+        self.observation = observation
+        self.asteroid_rows = observation[PLAYER_FEATURES:].reshape(ENV_NEAREST_ASTEROIDS, ASTEROID_FEATURES)
+
+        # Optional headless rendering into a surface that shares memory with a
+        # (height, width, 4) RGBX array, so frames never need copying out
+        self.render_pixels = render_pixels or pixels is not None
+        self.surface = None
+        self.pixels = pixels
+        self.atlas = atlas
+        if self.render_pixels:
+            if self.pixels is None:
+                self.pixels = np.zeros((SCREEN_HEIGHT, SCREEN_WIDTH, 4), dtype=np.uint8)
+            self.surface = pygame.image.frombuffer(self.pixels, (SCREEN_WIDTH, SCREEN_HEIGHT), "RGBX")
+            if self.atlas is None:
+                self.atlas = SpriteAtlas().build()
+
+    def reset(self, seed=None):
+        if seed is not None:
+            self.seed_source.seed(seed)
+        # The entity store keeps asteroid state in arrays the observation reads
+        self.simulation = Simulation(self.seed_source.getrandbits(63), entity_store=True)
+        self.observe()
+        if self.render_pixels:
+            self.render()
+        return self.observation, self.info()
+
+    def step(self, action):
+        simulation = self.simulation
+        score = simulation.score
+        simulation.step(self.dt, int(action))
+        reward = simulation.score - score
+        terminated = simulation.game_over
+        truncated = not terminated and simulation.ticks >= self.max_ticks
+
+        self.observe()
+        if self.render_pixels:
+            self.render()
+        return self.observation, reward, terminated, truncated, self.info()
+
+    def info(self):
+        simulation = self.simulation
+        return {
+            "lives": simulation.lives,
+            "score": simulation.score,
+            "ticks": simulation.ticks,
+            "asteroids_destroyed": simulation.asteroids_destroyed,
+        }
+
+    def observe(self):
+        simulation = self.simulation
+        player = simulation.player
+        position = player.position
+        radians = np.radians(player.rotation)
+
+        observation = self.observation
+        observation[0] = position.x / SCREEN_WIDTH
+        observation[1] = position.y / SCREEN_HEIGHT
+        observation[2] = np.sin(radians)
+        observation[3] = np.cos(radians)
+        observation[4] = player.is_invulnerable
+        observation[5] = simulation.lives / PLAYER_LIVES
+        observation[6] = player.missiles_remaining / PLAYER_MISSILE_COUNT
+        observation[7] = player.timer <= 0
+
+        store = simulation.store
+        slots = store.slots_of(Asteroid)
+        rows = self.asteroid_rows
+        rows[:] = 0
+        if len(slots) == 0:
+            return
+
+        offset = store.position[slots] - (position.x, position.y)
+        distance = np.einsum("ij,ij->i", offset, offset)
+        count = min(len(slots), ENV_NEAREST_ASTEROIDS)
+        nearest = np.argpartition(distance, count - 1)[:count]
+        nearest = nearest[np.argsort(distance[nearest])]
+
+        rows[:count, 0] = offset[nearest, 0] / SCREEN_WIDTH
+        rows[:count, 1] = offset[nearest, 1] / SCREEN_HEIGHT
+        rows[:count, 2:4] = store.velocity[slots[nearest]] / PLAYER_SPEED
+        rows[:count, 4] = store.radius[slots[nearest]] / ASTEROID_MAX_RADIUS
+
+    def render(self):
+        # Draws the current tick and returns the (height, width, 4) RGBX pixels
+        if self.surface is None:
+            raise RuntimeError("create the environment with render_pixels=True to render")
+        self.surface.fill("black")
+        self.simulation.draw(self.surface, atlas=self.atlas)
+        return self.pixels
+
+
+# N independent worlds stepped in one call. Observations, rewards and flags
+# come back as (N, ...) arrays that are refilled in place every step. Worlds
+# that finish are reset straight away, with the final observation of the old
+# game left in final_observation.
+class VectorEnv:
+    def __init__(self, count, seed=None, max_ticks=ENV_MAX_TICKS, render_pixels=False):
+        seeds = random.Random(seed)
+        self.count = count
+        self.observations = np.zeros((count, OBSERVATION_SIZE), dtype=np.float32)
+        self.final_observations = np.zeros((count, OBSERVATION_SIZE), dtype=np.float32)
+        self.rewards = np.zeros(count, dtype=np.float32)
+        self.terminated = np.zeros(count, dtype=bool)
+        self.truncated = np.zeros(count, dtype=bool)
+        self.pixels = None
+        atlas = None
+        if render_pixels:
+            self.pixels = np.zeros((count, SCREEN_HEIGHT, SCREEN_WIDTH, 4), dtype=np.uint8)
+            atlas = SpriteAtlas().build()
+
+        self.envs = [
+            AsteroidsEnv(
+                seeds.getrandbits(63), max_ticks,
+                observation=self.observations[i],
+                pixels=None if self.pixels is None else self.pixels[i],
+                atlas=atlas,
+            )
+            for i in range(count)
+        ]
+
+    def reset(self, seed=None):
+        seeds = random.Random(seed)
+        for env in self.envs:
+            env.reset(None if seed is None else seeds.getrandbits(63))
+        return self.observations
+
+    def step(self, actions):
+        for i, env in enumerate(self.envs):
+            _, reward, terminated, truncated, _ = env.step(actions[i])
+            self.rewards[i] = reward
+            self.terminated[i] = terminated
+            self.truncated[i] = truncated
+            if terminated or truncated:
+                self.final_observations[i] = self.observations[i]
+                env.reset()
+        return self.observations, self.rewards, self.terminated, self.truncated
+
+    def render(self):
+        for env in self.envs:
+            env.render()
+        return self.pixels
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Step random actions through the environment and report steps/sec")
+    parser.add_argument("--envs", type=int, default=8, help="worlds stepped together")
+    parser.add_argument("--steps", type=int, default=2000, help="steps per world")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--pixels", action="store_true", help="also render every world headless")
+    args = parser.parse_args()
+
+    env = VectorEnv(args.envs, args.seed, render_pixels=args.pixels)
+    env.reset()
+    rng = np.random.default_rng(args.seed)
+    episodes = 0
+    start = time.perf_counter()
+    for _ in range(args.steps):
+        env.step(rng.integers(0, ENV_ACTIONS, args.envs))
+        episodes += int(env.terminated.sum() + env.truncated.sum())
+    elapsed = time.perf_counter() - start
+
+    steps = args.steps * args.envs
+    print(f"{steps} steps over {args.envs} worlds in {elapsed:.2f}s: {steps / elapsed:.0f} steps/sec, "
+          f"{episodes} episodes finished")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,77 +1,55 @@
 import pygame
-import random
-import math
 from constants import *
+from particles import ParticleSystem
+from pool import Pooled
 
-class ExplosionParticle:
-    def __init__(self, x, y, color=(255, 255, 255)):
-        self.position = pygame.Vector2(x, y)
-        self.velocity = pygame.Vector2(
-            random.uniform(-1, 1),
-            random.uniform(-1, 1)
-        ).normalize() * random.uniform(EXPLOSION_SPEED * 0.5, EXPLOSION_SPEED)
-        self.radius = random.uniform(2, 5)
-        self.lifetime = EXPLOSION_DURATION
-        self.color = color
-        self.base_color = color
-        self.alpha = 255
+class Explosion(Pooled, pygame.sprite.Sprite):
+    # Shared particle engine, set by the game loop. Explosions created without
+    # one fall back to a private system that they update and draw themselves.
+    particle_system = None
+    # Share of the particles actually emitted, lowered by the frame governor
+    particle_scale = 1.0
 
-    def update(self, dt):
-        self.position += self.velocity * dt
-        self.lifetime -= dt
-        self.alpha = max(0, int(255 * (self.lifetime / EXPLOSION_DURATION)))
-        # Slow down over time
-        self.velocity *= 0.95
-        
-    def draw(self, screen):
-        if self.alpha <= 0:
-            return
-            
-        color = list(self.base_color)
-        # Create a new color with the current alpha
-        surface = pygame.Surface((self.radius * 2, self.radius * 2), pygame.SRCALPHA)
-        pygame.draw.circle(
-            surface, 
-            (*color, self.alpha), 
-            (self.radius, self.radius), 
-            self.radius
-        )
-        screen.blit(surface, (self.position.x - self.radius, self.position.y - self.radius))
-
-class Explosion(pygame.sprite.Sprite):
     def __init__(self, x, y, size, color=(255, 200, 100)):
         if hasattr(self.__class__, "containers") and self.__class__.containers is not None:
             pygame.sprite.Sprite.__init__(self, self.containers)
         else:
             pygame.sprite.Sprite.__init__(self)
-            
-        self.position = pygame.Vector2(x, y)
-        self.particles = []
-        
+
+        if "position" in self.__dict__:
+            self.position.update(x, y)  # recycled from a pool
+        else:
+            self.position = pygame.Vector2(x, y)
+
         # Create particles based on size
-        num_particles = int(EXPLOSION_PARTICLES * (size / ASTEROID_MIN_RADIUS))
-        
-        for _ in range(num_particles):
-            # Add some color variation
-            particle_color = (
-                min(255, color[0] + random.randint(-20, 20)),
-                min(255, color[1] + random.randint(-20, 20)),
-                min(255, color[2] + random.randint(-20, 20))
-            )
-            self.particles.append(ExplosionParticle(x, y, particle_color))
-        
+        num_particles = int(EXPLOSION_PARTICLES * (size / ASTEROID_MIN_RADIUS) * self.particle_scale)
+
+        self.owns_particles = self.particle_system is None
+        if self.owns_particles:
+            self.particles = ParticleSystem(capacity=max(num_particles, 1))
+        else:
+            self.particles = self.particle_system
+        self.particles.emit(x, y, num_particles, color)
+
         self.lifetime = EXPLOSION_DURATION
 
     def update(self, dt):
         self.lifetime -= dt
-        
-        for particle in self.particles:
-            particle.update(dt)
-            
+
+        if self.owns_particles:
+            self.particles.update(dt)
+
         # Remove explosion when all particles are done
         if self.lifetime <= 0:
             self.kill()
 
     def draw(self, screen):
-        for particle in self.particles:
-            particle.draw(screen) 
\ No newline at end of file
+        # Shared particles are drawn once per frame by the particle system itself
+        if self.owns_particles:
+            return self.particles.draw(screen)
+        return None
+
+    def atlas_blits(self, atlas):
+        if self.owns_particles:
+            return self.particles.atlas_blits(atlas)
+        return []
@@ -0,0 +1,94 @@
+import time
+from constants import *
+from explosion import Explosion
+from missile import Missile
+from player import Player
+
+
+# How much optional work a frame does. Everything a level turns down is
+# cosmetic, so gameplay, digests and replays are the same at every level.
+class QualityLevel:
+    def __init__(self, name, particle_scale, trail_segments, hud_interval, blink):
+        self.name = name
+        self.particle_scale = particle_scale  # share of EXPLOSION_PARTICLES emitted
+        self.trail_segments = trail_segments  # missile trail circles drawn, at most 2
+        self.hud_interval = hud_interval  # frames between HUD value refreshes
+        self.blink = blink  # whether invulnerable ships blink or are drawn steadily
+
+
+QUALITY_LEVELS = [
+    QualityLevel("full", 1.0, 2, 1, True),
+    QualityLevel("reduced", 0.5, 1, 2, True),
+    QualityLevel("low", 0.25, 0, 4, False),
+    QualityLevel("minimal", 0.1, 0, 8, False),
+]
+QUALITY_NAMES = [level.name for level in QUALITY_LEVELS]
+
+
+# Measures how long each frame's work takes (everything but the wait for the
+# frame cap) and sheds optional work when the smoothed time runs over budget,
+# one level at a time, then restores it once there is headroom again. Call
+# begin_frame() at the top of a frame and end_frame() just before the clock
+# waits; hud_due() says whether the HUD should refresh its values this frame.
+class FrameGovernor:
+    def __init__(self, budget=GOVERNOR_BUDGET, pinned=None):
+        self.budget = budget
+        self.pinned = pinned  # a fixed level index, or None to adapt
+        self.level = 0 if pinned is None else pinned
+        self.average = 0.0  # smoothed frame work in seconds
+        self.frames = 0
+        self.frame_start = 0.0
+        self.last_change = 0  # frame of the last level change
+        self.changes = 0
+        self.frames_at_level = [0] * len(QUALITY_LEVELS)
+        self.apply()
+
+    @property
+    def quality(self):
+        return QUALITY_LEVELS[self.level]
+
+    def apply(self):
+        quality = self.quality
+        Explosion.particle_scale = quality.particle_scale
+        Missile.trail_segments = quality.trail_segments
+        Player.blink = quality.blink
+
+    def begin_frame(self):
+        self.frame_start = time.perf_counter()
+
+    def end_frame(self):
+        # Returns the new level when this frame changed it, else None
+        work = time.perf_counter() - self.frame_start
+        if self.frames == 0:
+            self.average = work
+        else:
+            self.average += (work - self.average) * GOVERNOR_SMOOTHING
+        self.frames += 1
+        self.frames_at_level[self.level] += 1
+
+        if self.pinned is not None or self.frames - self.last_change < GOVERNOR_HOLD_FRAMES:
+            return None
+        if self.average > self.budget * GOVERNOR_SHED_RATIO and self.level < len(QUALITY_LEVELS) - 1:
+            return self.set_level(self.level + 1)
+        if self.average < self.budget * GOVERNOR_RESTORE_RATIO and self.level > 0:
+            return self.set_level(self.level - 1)
+        return None
+
+    def set_level(self, level):
+        self.level = level
+        self.last_change = self.frames
+        self.changes += 1
+        self.apply()
+        return level
+
+    def hud_due(self):
+        return self.frames % self.quality.hud_interval == 0
+
+    def stats(self):
+        return {
+            "level": self.quality.name,
+            "average_ms": round(self.average * 1000, 3),
+            "changes": self.changes,
+            "frames": dict(zip(QUALITY_NAMES, self.frames_at_level)),
+        }
+
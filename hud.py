@@ -0,0 +1,114 @@
+import pygame
+from constants import *
+
+
+# A piece of text that only goes through font.render when its value changes.
+# The position is given as a rect anchor, e.g. TextWidget(font, "Score: {}",
+# color, topright=(x, y)). Static text (no value) is looked up in `cache` when
+# one is given, so it is rendered once however many widgets show it.
+class TextWidget:
+    renders = 0  # font.render calls across every widget, for HUD statistics
+
+    def __init__(self, font, text_format, color, cache=None, **anchor):
+        self.font = font
+        self.text_format = text_format
+        self.color = color
+        self.cache = cache
+        self.anchor = anchor
+        self.value = None
+        self.surface = None
+        self.rect = None
+
+    def set(self, value=None, color=None):
+        if color is None:
+            color = self.color
+        if self.surface is not None and value == self.value and color == self.color:
+            return
+        self.value = value
+        self.color = color
+        if value is not None:
+            self.surface = self.render(self.text_format.format(value), color)
+        elif self.cache is not None:
+            key = (self.font, self.text_format, color)
+            self.surface = self.cache.get(key, lambda key: self.render(self.text_format, color))
+        else:
+            self.surface = self.render(self.text_format, color)
+        self.rect = self.surface.get_rect(**self.anchor)
+
+    def render(self, text, color):
+        TextWidget.renders += 1
+        return self.font.render(text, True, color)
+
+    def is_static(self):
+        return "{}" not in self.text_format
+
+    def draw(self, screen):
+        if self.surface is None:
+            self.set()
+        return screen.blit(self.surface, self.rect)
+
+
+def life_icon_surface(scale=1.0):
+    # A small upward-pointing ship, drawn once and reused for every life
+    radius = PLAYER_RADUIUS * 0.7 * scale
+    half_width = radius / 1.5
+    width = int(half_width * 2) + 2
+    height = int(radius * 2) + 2
+    surface = pygame.Surface((width, height), pygame.SRCALPHA)
+    center = pygame.Vector2(width / 2, height / 2)
+    a = center + pygame.Vector2(0, -radius)
+    b = center + pygame.Vector2(-half_width, radius)
+    c = center + pygame.Vector2(half_width, radius)
+    pygame.draw.polygon(surface, "white", [a, b, c], 1)
+    return surface
+
+
+# In-game heads-up display: score, lives, missiles and the controls line.
+# Static pieces are rendered once; the rest only when their values change.
+# With a scale the layout is for a surface that much smaller than the world;
+# the font should be scaled to match.
+class HUD:
+    def __init__(self, font, cache=None, life_icon=None, scale=1.0):
+        def at(x, y):
+            return round(x * scale), round(y * scale)
+
+        self.score = TextWidget(font, "Score: {}", (255, 255, 255), topright=at(SCREEN_WIDTH - 20, 20))
+        self.lives_label = TextWidget(font, "Lives: ", (255, 255, 255), cache, topleft=at(20, 20))
+        self.missiles = TextWidget(font, "Missiles: {}", (255, 100, 100), topleft=at(20, 60))
+        self.controls = TextWidget(
+            font,
+            "Controls: W/A/S/D to move, SPACE to shoot, E for missiles, ESC for menu",
+            (150, 150, 150),
+            cache,
+            midbottom=at(SCREEN_WIDTH // 2, SCREEN_HEIGHT - 10),
+        )
+        self.texts = [self.score, self.lives_label, self.missiles, self.controls]
+        self.life_icon = life_icon if life_icon is not None else life_icon_surface(scale)
+        self.icon_spacing = 30 * scale
+        self.lives = 0
+
+        # Text renders by these widgets in the last update() and draw(), so
+        # the profiler can show it staying at zero between value changes
+        self.frame_renders = 0
+        self.pending_renders = 0
+
+    def update(self, score, lives, missiles):
+        before = TextWidget.renders
+        self.score.set(score)
+        self.missiles.set(missiles)
+        self.lives = lives
+        self.pending_renders += TextWidget.renders - before
+
+    def draw(self, screen):
+        before = TextWidget.renders
+        rects = [text.draw(screen) for text in self.texts]
+        self.frame_renders = self.pending_renders + TextWidget.renders - before
+        self.pending_renders = 0
+
+        # Draw life icons
+        label = self.lives_label.rect
+        for i in range(self.lives):
+            x = label.right + (i + 1) * self.icon_spacing
+            icon_rect = self.life_icon.get_rect(center=(x, label.centery))
+            rects.append(screen.blit(self.life_icon, icon_rect))
+        return rects
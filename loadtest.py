@@ -0,0 +1,86 @@
+import os
+
+# Simulated clients never open a window
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import argparse
+import asyncio
+import random
+import time
+import numpy as np
+from client import NetClient
+from constants import *
+from controls import *
+from server import GameServer
+
+# Connects many simulated clients to a game server over localhost. Each one
+# plays random held inputs at the tick rate and decodes every snapshot, like
+# the real client would. By default the server runs in this process too:
+#
+#   python loadtest.py --clients 32 --seconds 20
+#   python loadtest.py --clients 100 --port 7777 --external   # against server.py
+
+
+async def bot(client, host, port, seconds, seed):
+    rng = random.Random(seed)
+    reader = await client.connect(host, port)
+    receiving = asyncio.ensure_future(client.receive(reader))
+    loop = asyncio.get_running_loop()
+    dt = 1.0 / client.rate
+    stop = loop.time() + seconds
+    inputs = 0
+    next_input = loop.time()
+    while client.connected and loop.time() < stop:
+        # Change what is held every second or so, like a person would
+        if rng.random() < dt:
+            inputs = rng.choice([INPUT_SHOOT | INPUT_RIGHT, INPUT_SHOOT | INPUT_FORWARD, INPUT_LEFT, INPUT_SHOOT])
+        client.send_input(inputs)
+        next_input += dt
+        await asyncio.sleep(max(0.0, next_input - loop.time()))
+    client.close()
+    await receiving
+
+
+async def run(args):
+    server = None
+    port = args.port
+    if not args.external:
+        server = GameServer(args.seed, metrics_interval=args.report)
+        port = await server.start(args.host, args.port)
+        serving = asyncio.ensure_future(server.run())
+
+    clients = [NetClient() for _ in range(args.clients)]
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        bot(client, args.host, port, args.seconds, args.seed + i) for i, client in enumerate(clients)
+    ))
+    elapsed = time.perf_counter() - start
+
+    received = np.array([client.bytes_received for client in clients], dtype=float) / elapsed
+    snapshots = np.array([client.snapshots for client in clients], dtype=float) / elapsed
+    print(f"{args.clients} clients for {elapsed:.1f}s")
+    print(f"received per client: mean {received.mean() / 1024:.1f} KiB/s, max {received.max() / 1024:.1f} KiB/s")
+    print(f"snapshots per client: mean {snapshots.mean():.1f}/s, min {snapshots.min():.1f}/s")
+
+    if server is not None:
+        serving.cancel()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the game server with simulated clients")
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=0, help="server port, 0 picks a free one for the built-in server")
+    parser.add_argument("--external", action="store_true", help="connect to an already running server.py")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--report", type=float, default=NET_METRICS_INTERVAL, help="seconds between server reports")
+    args = parser.parse_args()
+    if args.external and not args.port:
+        args.port = NET_PORT
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,27 +1,43 @@
+import argparse
+import contextlib
+import json
+import os
 import sys
+import time
 import pygame
 from pygame.sprite import Group, spritecollide
-from asteroid import Asteroid
-from asteroidfield import AsteroidField
 from constants import *
+from controls import INPUT_MISSILE, read_keyboard
 from player import Player
-from shot import Shot
-from missile import Missile
-from explosion import Explosion
+from hud import HUD
+from simulation import Simulation
+from timestep import FixedTimestep
+from replay import InputRecorder
+from profiler import FrameProfiler, ProfilerOverlay
+from dirtyrect import DirtyRectRenderer
+from viewport import Viewport
+from assets import assets
+from governor import FrameGovernor, QUALITY_NAMES
+from memtrack import MemoryTracker, format_report
+from snapshot import SimulationThread, SnapshotMetrics
+from capture import FrameCapture
+import client
+import savestate
+
+def game_over_texts():
+    return [
+        assets.text(MENU_TITLE_SIZE, "GAME OVER", MENU_TITLE_COLOR,
+                    center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 3)),
+        assets.text(MENU_OPTION_SIZE, "Final Score: {}", MENU_OPTION_COLOR,
+                    center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2)),
+        assets.text(SCORE_FONT_SIZE, "Press Enter to return to menu", MENU_OPTION_COLOR,
+                    center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 + 100)),
+    ]
 
 def game_over_screen(score):
-    game_over_font = pygame.font.Font(None, MENU_TITLE_SIZE)
-    score_font = pygame.font.Font(None, MENU_OPTION_SIZE)
-    instruction_font = pygame.font.Font(None, SCORE_FONT_SIZE)
-    
-    game_over_text = game_over_font.render("GAME OVER", True, MENU_TITLE_COLOR)
-    game_over_rect = game_over_text.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 3))
-    
-    score_text = score_font.render(f"Final Score: {score}", True, MENU_OPTION_COLOR)
-    score_rect = score_text.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2))
-    
-    instruction_text = instruction_font.render("Press Enter to return to menu", True, MENU_OPTION_COLOR)
-    instruction_rect = instruction_text.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 + 100))
+    # Everything on this screen is static, so each text is rendered once
+    texts = game_over_texts()
+    texts[1].set(score)
     
     waiting = True
     while waiting:
@@ -35,165 +51,227 @@ def game_over_screen(score):
                     return
         
         screen.fill("black")
-        screen.blit(game_over_text, game_over_rect)
-        screen.blit(score_text, score_rect)
-        screen.blit(instruction_text, instruction_rect)
-        pygame.display.flip()
+        for text in texts:
+            text.draw(screen)
+        view.present()
         clock.tick(60)
 
-def game_loop():
-    
-    # Initialize score and lives
-    score = 0
-    lives = PLAYER_LIVES
-    font = pygame.font.Font(None, SCORE_FONT_SIZE)
+def finish_game(recorder, profiler, memory, worker=None, metrics=None, capture=None):
+    # Write out anything collected during the game before leaving it
+    if worker:
+        # The simulation thread records inputs, so it has to stop first
+        worker.stop()
+        print(f"Threaded: {metrics.report(worker.ticks, worker.tick_time)}")
+        if worker.dropped_time:
+            print(f"Threaded: skipped {worker.dropped_time:.2f}s of simulation to keep up")
+    if capture:
+        capture.close()
+        print(f"Capture: {capture.report()} to {options.capture}")
+    if recorder:
+        recorder.save(options.record)
+        print(f"Recorded {len(recorder.inputs)} ticks to {options.record}")
+    if options.profile_out and profiler.frames:
+        frames = profiler.dump(options.profile_out)
+        print(f"Wrote {frames} profiled frames to {options.profile_out}")
+    if memory:
+        memory.stop()
+        report = memory.report()
+        with open(options.memtrack, "w") as file:
+            json.dump(report, file, indent=1)
+        print(format_report(report, rows=10))
+        print(f"Wrote the memory report to {options.memtrack}")
 
-    clock = pygame.time.Clock()
-    dt = 0
+def uses_atlas():
+    return options.atlas or options.threaded or options.render_scale != 1
 
-    # Clear existing sprite groups
-    updatable = pygame.sprite.Group()
-    drawable = pygame.sprite.Group()
-    asteroids = pygame.sprite.Group()
-    shots = pygame.sprite.Group()
-    missiles = pygame.sprite.Group()
-    explosions = pygame.sprite.Group()
+def game_hud(scale):
+    return HUD(assets.font(round(SCORE_FONT_SIZE * scale)), assets.text_cache, assets.hud_icon(scale), scale)
 
-    Player.containers = (updatable, drawable)
-    Asteroid.containers = (asteroids, updatable, drawable)
-    AsteroidField.containers = (updatable,)
-    Shot.containers = (shots, updatable, drawable)
-    Missile.containers = (missiles, updatable, drawable)
-    Explosion.containers = (explosions, updatable, drawable)
+def game_loop():
+    # Fonts and sprites may still be loading in the background
+    assets.wait()
+    
+    if options.state and os.path.exists(options.state):
+        simulation = savestate.load(options.state)
+        print(f"Resumed tick {simulation.ticks} from {options.state}")
+    else:
+        simulation = Simulation(options.seed, entity_store=options.entity_store)
+    # Replays start from the seed, so a resumed game can't be recorded
+    recorder = InputRecorder(simulation) if options.record and simulation.ticks == 0 else None
+    # The world is drawn at the render scale, then stretched over the window
+    game_view = Viewport(window, options.render_scale, options.smooth_scale)
+    canvas = game_view.surface
+    hud = game_hud(options.render_scale)
+    
+    # Per-phase frame timing, F3 toggles the overlay
+    profiler = FrameProfiler(simulation.population.groups, enabled=options.profile)
+    overlay = ProfilerOverlay(profiler, assets.font(PROFILER_FONT_SIZE))
+    overlay.visible = options.profile
+    simulation.profiler = profiler
+    # Optionally attribute allocations and GC pauses to the code that caused them
+    memory = MemoryTracker() if options.memtrack else None
+    if memory:
+        memory.start()
+    
+    # Optionally only repaint and present the parts of the screen that changed
+    renderer = DirtyRectRenderer(window) if options.dirty_rects else None
+    # Optionally draw pre-rendered sprites with one batched blit per frame;
+    # below full scale the atlas is what draws everything smaller
+    atlas = assets.sprite_atlas(options.render_scale) if uses_atlas() else None
+    # Optionally keep the last frames shown in a capture.py ring file
+    capture = FrameCapture(options.capture, window) if options.capture else None
+    # Optionally step the simulation on its own thread; frames then draw the
+    # latest snapshot it published instead of the simulation itself
+    worker = metrics = None
+    if options.threaded:
+        simulation.profiler = None  # the profiler times this thread's frames only
+        worker = SimulationThread(simulation, recorder=recorder)
+        metrics = SnapshotMetrics()
+        worker.start()
+    # Sheds cosmetic work when frames run over budget, unless a level is pinned
+    pinned = None if options.quality == "adaptive" else QUALITY_NAMES.index(options.quality)
+    governor = FrameGovernor(pinned=pinned)
 
-    player = Player(SCREEN_WIDTH / 2, SCREEN_HEIGHT / 2)
-    player.respawn(reset_missiles=True)  # Reset missiles when starting new game
-    asteroid_field = AsteroidField()
-    asteroid_field.asteroid_group = asteroids
-    asteroid_field.reset()  # Call reset after setting asteroid_group
+    # The simulation runs at a fixed tick rate; rendering interpolates between ticks
+    clock = pygame.time.Clock()
+    timestep = FixedTimestep()
+    frame_time = 0
+    pressed = 0  # key presses not yet seen by a tick
     
     running = True
     while running:
+        profiler.begin_frame()
+        governor.begin_frame()
+        if memory:
+            memory.begin_frame()
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
+                finish_game(recorder, profiler, memory, worker, metrics, capture)
                 return
             if event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_ESCAPE:
+                    finish_game(recorder, profiler, memory, worker, metrics, capture)
                     return  # Return to main menu
+                if event.key == pygame.K_F3:
+                    overlay.toggle()
+                if event.key == pygame.K_F5 and options.state:
+                    with worker.lock if worker else contextlib.nullcontext():
+                        savestate.save(simulation, options.state)
+                        print(f"Saved tick {simulation.ticks} to {options.state}")
                 if event.key == pygame.K_e:
-                    # Handle missile firing here (in addition to the key check in player update)
-                    player.fire_missile()
+                    # Fire on the key press too, even if E is released before the next poll
+                    pressed |= INPUT_MISSILE
+        held = read_keyboard()
+        profiler.mark("input")
 
-        screen.fill("black")
-        for object in updatable:
-            object.update(dt)
-        for object in drawable:
-            object.draw(screen)
-            
-        # Check player collisions with asteroids
-        for asteroid in asteroids:
-            if asteroid.is_colliding(player) and not player.is_invulnerable:
-                lives -= 1
-                print(f"Lives remaining: {lives}")
-                
-                # Create explosion for the asteroid that hit the player
-                Explosion(asteroid.position.x, asteroid.position.y, asteroid.radius)
-                asteroid.kill()
-                
-                if lives <= 0:
+        if worker:
+            # The simulation thread reports lives and population itself
+            worker.set_inputs(held, pressed)
+            pressed = 0
+            snapshot = worker.buffer.latest()
+            if snapshot.game_over:
+                print("Game over!")
+                finish_game(recorder, profiler, memory, worker, metrics, capture)
+                game_over_screen(snapshot.score)
+                return  # Return to main menu on game over
+        else:
+            for _ in range(timestep.advance(frame_time)):
+                lives = simulation.lives
+                simulation.step(timestep.dt, held | pressed)
+                if recorder:
+                    recorder.record(held | pressed)
+                pressed = 0
+                if simulation.lives < lives:
+                    print(f"Lives remaining: {simulation.lives}")
+                if simulation.game_over:
                     print("Game over!")
-                    game_over_screen(score)
+                    finish_game(recorder, profiler, memory, worker, metrics, capture)
+                    game_over_screen(simulation.score)
                     return  # Return to main menu on game over
-                else:
-                    # Respawn player with invulnerability
-                    player.respawn()
-            
-            # Check regular shot collisions
-            for shot in shots:
-                if asteroid.is_colliding(shot):
-                    shot.kill()
-                    
-                    # Create explosion at the asteroid's position
-                    Explosion(asteroid.position.x, asteroid.position.y, asteroid.radius)
-                    
-                    if asteroid.split():
-                        # Increase score when an asteroid is fully destroyed
-                        score += SCORE_ASTEROID_SMALL
-            
-            # Check missile collisions - missiles destroy any asteroid on contact
-            for missile in missiles:
-                if asteroid.is_colliding(missile):
-                    missile.kill()
-                    
-                    # Create a bigger explosion for missile hits
-                    # Red-orange color for missile explosions
-                    Explosion(asteroid.position.x, asteroid.position.y, asteroid.radius * 1.5, (255, 100, 50))
-                    
-                    # Calculate score based on asteroid size
-                    if asteroid.radius >= ASTEROID_MIN_RADIUS * 3:
-                        score += SCORE_ASTEROID_SMALL * 4  # Large asteroid
-                    elif asteroid.radius >= ASTEROID_MIN_RADIUS * 2:
-                        score += SCORE_ASTEROID_SMALL * 2  # Medium asteroid
-                    else:
-                        score += SCORE_ASTEROID_SMALL      # Small asteroid
-                    
-                    # Immediately destroy the asteroid without splitting
-                    asteroid.kill()
-        
-        # Display score
-        score_text = font.render(f"Score: {score}", True, (255, 255, 255))
-        score_rect = score_text.get_rect(topright=(SCREEN_WIDTH - 20, 20))
-        screen.blit(score_text, score_rect)
-        
-        # Display lives
-        lives_text = font.render(f"Lives: ", True, (255, 255, 255))
-        lives_rect = lives_text.get_rect(topleft=(20, 20))
-        screen.blit(lives_text, lives_rect)
-        
-        # Draw life icons
-        for i in range(lives):
-            # Create a mini player triangle for each life
-            mini_player_pos = pygame.Vector2(lives_rect.right + 30 + i * 30, lives_rect.centery)
-            
-            # Draw a small ship for each life
-            radius = PLAYER_RADUIUS * 0.7
-            forward = pygame.Vector2(0, -1)  # Point upward
-            right = pygame.Vector2(1, 0) * radius / 1.5
-            
-            # Calculate triangle points
-            a = mini_player_pos + forward * radius
-            b = mini_player_pos - forward * radius - right
-            c = mini_player_pos - forward * radius + right
-            
-            # Draw the triangle
-            pygame.draw.polygon(screen, "white", [a, b, c], 1)
         
-        # Display missile count
-        missile_text = font.render(f"Missiles: {player.missiles_remaining}", True, (255, 100, 100))
-        missile_rect = missile_text.get_rect(topleft=(20, 60))
-        screen.blit(missile_text, missile_rect)
+            report = simulation.population.sample(frame_time)
+            if report:
+                print(report)
+
+        if renderer:
+            renderer.clear()
+        else:
+            canvas.fill("black")
+        if worker:
+            rects = snapshot.draw(canvas, snapshot.alpha(time.perf_counter(), worker.dt), atlas)
+        else:
+            rects = simulation.draw(canvas, timestep.alpha, atlas)
+        profiler.mark("draw")
         
-        # Display controls
-        controls_text = font.render("Controls: W/A/S/D to move, SPACE to shoot, E for missiles, ESC for menu", True, (150, 150, 150))
-        controls_rect = controls_text.get_rect(midbottom=(SCREEN_WIDTH // 2, SCREEN_HEIGHT - 10))
-        screen.blit(controls_text, controls_rect)
+        # Draw the HUD, re-rendering text only when a value changed
+        if governor.hud_due():
+            if worker:
+                hud.update(snapshot.score, snapshot.lives, snapshot.missiles_remaining)
+            else:
+                hud.update(simulation.score, simulation.lives, simulation.player.missiles_remaining)
+        rects += hud.draw(canvas)
+        game_view.upscale()
+        # The profiler overlay is drawn over the window at its own resolution
+        rects += overlay.draw(window)
+        profiler.mark("hud")
+        if capture:
+            capture.grab(window, snapshot.tick if worker else simulation.ticks)
 
-        pygame.display.flip()
-        dt = clock.tick(60.0) / 1000
+        if renderer:
+            renderer.present(rects)
+        else:
+            pygame.display.flip()
+        profiler.mark("flip")
+        if worker:
+            metrics.frame(snapshot.tick, snapshot.taken, time.perf_counter())
+        if memory:
+            memory.end_frame()
+        if governor.end_frame() is not None:
+            print(f"Quality: {governor.quality.name}")
+        frame_time = clock.tick(RENDER_FRAME_RATE) / 1000
+        profiler.mark("idle")
+        profiler.end_frame(simulation.population.current, governor.level, hud.frame_renders)
+
+def network_game():
+    # Play on a server.py game instead of simulating locally
+    host, _, port = options.connect.partition(":")
+    score = client.play(view, host, int(port) if port else NET_PORT)
+    if score is not None:
+        print("Game over!")
+        game_over_screen(score)
+
+def start_game():
+    if options.connect:
+        network_game()
+    else:
+        game_loop()
+
+def report_startup(startup):
+    if options.time_startup:
+        # Machine-readable for assets.py, then leave straight away
+        print(f"startup {assets.init_time * 1000:.2f} {startup * 1000:.2f}")
+        pygame.quit()
+        sys.exit()
+    print(f"First frame after {startup * 1000:.0f} ms")
+    # Load what the game and game over screens need while the menu is up
+    hud = game_hud(options.render_scale)
+    assets.warm(game_over_texts() + hud.texts, [PROFILER_FONT_SIZE], uses_atlas(), options.render_scale)
 
 def main_menu():
     selected_option = 0
     options = ["Play", "Quit"]
     
-    title_font = pygame.font.Font(None, MENU_TITLE_SIZE)
-    option_font = pygame.font.Font(None, MENU_OPTION_SIZE)
-    instruction_font = pygame.font.Font(None, SCORE_FONT_SIZE)
-    
-    title_text = title_font.render("ASTEROIDS", True, MENU_TITLE_COLOR)
-    title_rect = title_text.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 3))
+    title_text = assets.text(MENU_TITLE_SIZE, "ASTEROIDS", MENU_TITLE_COLOR,
+                             center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 3))
+    instruction_text = assets.text(SCORE_FONT_SIZE, "Use arrow keys to navigate, Enter to select",
+                                   MENU_OPTION_COLOR, center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT - 100))
     
-    instruction_text = instruction_font.render("Use arrow keys to navigate, Enter to select", True, MENU_OPTION_COLOR)
-    instruction_rect = instruction_text.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT - 100))
+    # Options are rendered once per color and swapped as the selection moves
+    option_texts = [
+        assets.text(MENU_OPTION_SIZE, option, MENU_OPTION_COLOR,
+                    center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 + i * 70))
+        for i, option in enumerate(options)
+    ]
     
     # Create a simple player ship for visual effect (without containers)
     player_vis = Player(SCREEN_WIDTH // 2, SCREEN_HEIGHT - 200)
@@ -218,7 +296,7 @@ def main_menu():
                     selected_option = (selected_option + 1) % len(options)
                 elif event.key == pygame.K_RETURN:
                     if selected_option == 0:  # Play
-                        game_loop()
+                        start_game()
                     elif selected_option == 1:  # Quit
                         pygame.quit()
                         sys.exit()
@@ -229,31 +307,94 @@ def main_menu():
         player_vis.rotation += 30 * dt
         
         # Draw title
-        screen.blit(title_text, title_rect)
+        title_text.draw(screen)
         
         # Draw menu options
-        for i, option in enumerate(options):
+        for i, option_text in enumerate(option_texts):
             color = MENU_SELECTED_COLOR if i == selected_option else MENU_OPTION_COLOR
-            option_text = option_font.render(option, True, color)
-            option_rect = option_text.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 + i * 70))
-            screen.blit(option_text, option_rect)
+            option_text.set(color=color)
+            option_text.draw(screen)
         
         # Draw instructions
-        screen.blit(instruction_text, instruction_rect)
+        instruction_text.draw(screen)
         
         # Draw the player ship
         player_vis.draw(screen)
         
-        pygame.display.flip()
+        view.present()
+        startup = assets.first_frame()
+        if startup is not None:
+            report_startup(startup)
     
     # Restore original containers
     Player.containers = original_containers
 
+def seed(text):
+    # Replays and save states store the seed as a signed 64-bit integer
+    value = int(text)
+    if not -(1 << 63) <= value < 1 << 63:
+        raise argparse.ArgumentTypeError(f"seed must fit in a signed 64-bit integer, got {text}")
+    return value
+
+def window_size(text):
+    width, _, height = text.partition("x")
+    if not (width.isdigit() and height.isdigit()) or int(width) == 0 or int(height) == 0:
+        raise argparse.ArgumentTypeError(f"expected WIDTHxHEIGHT, got {text!r}")
+    return int(width), int(height)
+
 def main():
-    global screen, clock
+    global window, view, screen, clock, options
+    assets.begin_startup()
+    
+    parser = argparse.ArgumentParser(description="Asteroids")
+    parser.add_argument("--seed", type=seed, default=None, help="seed for reproducible games")
+    parser.add_argument("--record", metavar="PATH", default=None,
+                        help="record each game's inputs to PATH for replay.py")
+    parser.add_argument("--profile", action="store_true",
+                        help="start with the frame profiler and its overlay on; F3 toggles both")
+    parser.add_argument("--profile-out", metavar="PATH", default=None,
+                        help="dump profiled frames to PATH (.csv or .json) when a game ends")
+    parser.add_argument("--dirty-rects", action="store_true",
+                        help="only repaint and present the changed parts of the screen")
+    parser.add_argument("--window", metavar="WxH", type=window_size, default=(SCREEN_WIDTH, SCREEN_HEIGHT),
+                        help="window size; the world is scaled to fill it")
+    parser.add_argument("--render-scale", type=float, default=1.0,
+                        help="draw the game at this fraction of the world size and upscale it to the window; "
+                             "below 1 the sprite atlas is used")
+    parser.add_argument("--smooth-scale", action="store_true",
+                        help="upscale with smoothscale rather than nearest neighbour")
+    parser.add_argument("--atlas", action="store_true",
+                        help="draw from pre-rendered sprites with one batched blit per frame")
+    parser.add_argument("--entity-store", action="store_true",
+                        help="move and collide asteroids, shots and missiles in NumPy batches")
+    parser.add_argument("--state", metavar="PATH", default=None,
+                        help="F5 saves the game to PATH; new games resume from PATH when it exists")
+    parser.add_argument("--quality", choices=["adaptive"] + QUALITY_NAMES, default="adaptive",
+                        help="pin a render quality level instead of adapting it to the frame budget")
+    parser.add_argument("--memtrack", metavar="PATH", default=None,
+                        help="trace allocations and GC pauses per frame and write a memtrack.py report to PATH")
+    parser.add_argument("--threaded", action="store_true",
+                        help="step the simulation on its own thread and render the snapshots it publishes; "
+                             "uses the sprite atlas and reports snapshot latency when the game ends")
+    parser.add_argument("--capture", metavar="PATH", default=None,
+                        help=f"keep the last {CAPTURE_RING_FRAMES} frames in a ring file at PATH for capture.py export")
+    parser.add_argument("--connect", metavar="HOST[:PORT]", default=None,
+                        help="play on a server.py game instead of simulating locally")
+    parser.add_argument("--time-startup", action="store_true",
+                        help="print the time to the first menu frame and exit, see assets.py")
+    options = parser.parse_args()
+    if not 0 < options.render_scale <= 1:
+        parser.error("--render-scale must be above 0 and at most 1")
+    if options.threaded and options.memtrack:
+        parser.error("--memtrack can't trace a threaded game")
+    if options.dirty_rects and (options.render_scale != 1 or options.window != (SCREEN_WIDTH, SCREEN_HEIGHT)):
+        parser.error("--dirty-rects only works when the game is drawn straight to a world-sized window")
     
-    pygame.init()
-    screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))  
+    assets.init_pygame()
+    window = pygame.display.set_mode(options.window)
+    # Menus are drawn at the world size and stretched over the window
+    view = Viewport(window)
+    screen = view.surface  
     pygame.display.set_caption("Asteroids")
     
     clock = pygame.time.Clock()
@@ -0,0 +1,420 @@
+import argparse
+import ast
+import bisect
+import functools
+import gc
+import importlib
+import inspect
+import json
+import os
+import time
+import tracemalloc
+import numpy as np
+import pygame
+from constants import *
+
+# Opt-in memory instrumentation. Two things are attributed to the game
+# function that did them:
+#
+#   transient  bytes a call had live on top of what existed when it started,
+#              at its peak; this is where short-lived Vector2s and Surfaces show
+#   retained   bytes and blocks allocated during the frame still alive at its
+#              end: new sprites, grown arrays and garbage waiting for the GC
+#
+# Garbage collector pauses are timed with gc callbacks and kept per frame next
+# to the frame time. Reports are JSON so two builds can be compared:
+#
+#   python memtrack.py --scenario missile-barrage --output before.json
+#   python memtrack.py --scenario missile-barrage --output after.json
+#   python memtrack.py --diff before.json after.json
+#
+# main.py --memtrack PATH writes the same report for a played game.
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# Game modules whose classes get their methods measured
+TRACKED_MODULES = [
+    "asteroid", "asteroidfield", "atlas", "circleshape", "collision", "dirtyrect", "entitystore",
+    "explosion", "governor", "hud", "missile", "particles", "player", "pool", "shot", "simulation",
+    "spritecache", "worldbounds",
+]
+SORT_KEYS = ["transient", "retained", "calls"]
+
+
+def function_spans(path):
+    # (first line, last line, qualified name) for every function in a file,
+    # sorted so the innermost function containing a line is found last
+    with open(path) as file:
+        tree = ast.parse(file.read())
+    spans = []
+
+    def visit(node, prefix):
+        for child in ast.iter_child_nodes(node):
+            if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                spans.append((child.lineno, child.end_lineno, prefix + child.name))
+                visit(child, prefix + child.name + ".")
+            elif isinstance(child, ast.ClassDef):
+                visit(child, prefix + child.name + ".")
+    visit(tree, "")
+    spans.sort()
+    return spans
+
+
+class MemoryTracker:
+    def __init__(self, every=MEMTRACK_TRACE_EVERY, modules=TRACKED_MODULES, depth=MEMTRACK_TRACEBACK_DEPTH):
+        self.every = every  # frames between traced frames
+        self.modules = modules
+        self.depth = depth
+        self.functions = {}  # "module.Class.method" -> [calls, transient bytes, retained bytes, retained blocks]
+        self.wrapped = []  # (class, name, original) to undo in stop()
+        self.spans = {}  # traceback filename -> (module, function_spans) or None
+        self.stack = []  # [bytes at entry, highest bytes seen] per measured call in progress
+        self.overhead = 0  # transient bytes of the tracker's own bookkeeping per call
+        self.active = False  # only calls made during a traced frame count
+
+        # Every frame is timed; allocations only in traced frames, which run
+        # many times slower because tracemalloc hooks every allocation
+        self.frame_times = []
+        self.frame_traced = []
+        self.frame_gc = []  # seconds of GC pause per frame
+        self.frame_transient = []  # per traced frame
+        self.frame_retained = []
+        self.gc_pauses = []  # (generation, seconds, objects collected)
+        self.gc_started = 0.0
+        self.frame_start = 0.0
+        self.frame_pause = 0.0
+        self.in_frame = False
+
+    # Setup
+
+    def start(self):
+        gc.callbacks.append(self.on_gc)
+        tracemalloc.start(self.depth)
+        # Measure a call that does nothing, to take the tracker's own
+        # allocations back off every measured call
+        probe = self.measured(lambda: None, "probe")
+        self.active = True
+        samples = []
+        for _ in range(10):
+            self.enter()
+            probe()
+            samples.append(self.leave())
+        self.active = False
+        self.overhead = min(samples)
+        del self.functions["probe"]
+        tracemalloc.stop()
+        for name in self.modules:
+            module = importlib.import_module(name)
+            for cls in vars(module).values():
+                if inspect.isclass(cls) and cls.__module__ == name:
+                    self.wrap_class(cls)
+
+    def stop(self):
+        for cls, name, original in reversed(self.wrapped):
+            setattr(cls, name, original)
+        self.wrapped = []
+        gc.callbacks.remove(self.on_gc)
+        self.active = False
+        tracemalloc.stop()
+
+    def wrap_class(self, cls):
+        for name, value in list(vars(cls).items()):
+            if not inspect.isfunction(value) or (name.startswith("__") and name != "__init__"):
+                continue
+            setattr(cls, name, self.measured(value, f"{cls.__module__}.{cls.__qualname__}.{name}"))
+            self.wrapped.append((cls, name, value))
+
+    def measured(self, function, key):
+        # Every call resets the single tracemalloc peak on entry and hands the
+        # peak it saw back to the call it is nested in. Inlined, this runs for
+        # every method call of the game.
+        tracker = self
+        stats = self.function_stats(key)
+        traced_memory = tracemalloc.get_traced_memory
+        reset_peak = tracemalloc.reset_peak
+
+        @functools.wraps(function)
+        def call(*args, **kwargs):
+            if not tracker.active:
+                return function(*args, **kwargs)
+            stack = tracker.stack
+            outer = stack[-1]
+            current, peak = traced_memory()
+            if peak > outer[1]:
+                outer[1] = peak
+            reset_peak()
+            entry = [current, current]
+            stack.append(entry)
+            try:
+                return function(*args, **kwargs)
+            finally:
+                _, peak = traced_memory()
+                stack.pop()
+                highest = entry[1] if entry[1] > peak else peak
+                if highest > outer[1]:
+                    outer[1] = highest
+                stats[0] += 1
+                transient = highest - current - tracker.overhead
+                if transient > 0:
+                    stats[1] += transient
+        return call
+
+    # The frame itself is measured the same way, as the outermost call
+
+    def enter(self):
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        self.stack.append([current, current])
+
+    def leave(self):
+        _, peak = tracemalloc.get_traced_memory()
+        entry, highest = self.stack.pop()
+        return max(highest, peak) - entry
+
+    def function_stats(self, key):
+        stats = self.functions.get(key)
+        if stats is None:
+            stats = self.functions[key] = [0, 0, 0, 0]
+        return stats
+
+    # Frames
+
+    def begin_frame(self):
+        self.frame_pause = 0.0
+        self.in_frame = True
+        if len(self.frame_times) % self.every == 0:
+            # Tracing starts afresh, so whatever is still traced at end_frame
+            # was allocated during this frame
+            tracemalloc.start(self.depth)
+            self.enter()
+            self.active = True
+        self.frame_start = time.perf_counter()
+
+    def end_frame(self):
+        elapsed = time.perf_counter() - self.frame_start
+        self.in_frame = False
+        self.frame_times.append(elapsed)
+        self.frame_traced.append(self.active)
+        self.frame_gc.append(self.frame_pause)
+        if not self.active:
+            return
+        self.active = False
+        transient = self.leave()
+        snapshot = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+        retained = 0
+        for stat in snapshot.statistics("traceback"):
+            retained += stat.size
+            key = self.owner(stat.traceback)
+            if key is not None:
+                stats = self.function_stats(key)
+                stats[2] += stat.size
+                stats[3] += stat.count
+        self.frame_transient.append(transient)
+        self.frame_retained.append(retained)
+
+    def owner(self, traceback):
+        # The innermost game function in an allocation's traceback
+        for frame in reversed(traceback):
+            source = self.source(frame.filename)
+            if source is None:
+                continue
+            module, spans = source
+            index = bisect.bisect_right(spans, (frame.lineno, float("inf"), ""))
+            for first, last, name in reversed(spans[:index]):
+                if first <= frame.lineno <= last:
+                    return f"{module}.{name}"
+            return f"{module}.<module>"
+        return None
+
+    def source(self, filename):
+        # (module name, function spans) for a game source file, else None
+        if filename not in self.spans:
+            path = os.path.abspath(filename)
+            game_file = (os.path.dirname(path) == ROOT and path.endswith(".py")
+                         and path != os.path.abspath(__file__) and os.path.exists(path))
+            module = os.path.splitext(os.path.basename(path))[0]
+            self.spans[filename] = (module, function_spans(path)) if game_file else None
+        return self.spans[filename]
+
+    def on_gc(self, phase, info):
+        if phase == "start":
+            self.gc_started = time.perf_counter()
+        elif self.in_frame:
+            pause = time.perf_counter() - self.gc_started
+            self.frame_pause += pause
+            self.gc_pauses.append((info["generation"], pause, info["collected"]))
+
+    # Reports
+
+    def report(self):
+        # Frame times come from untraced frames when there are any
+        traced = np.asarray(self.frame_traced or [True])
+        timed = ~traced if (~traced).any() else traced
+        frames = max(int(traced.sum()), 1)
+        times = (np.asarray(self.frame_times or [0.0]) * 1000)[timed]
+        pauses = (np.asarray(self.frame_gc or [0.0]) * 1000)[timed]
+        paused = pauses > 0
+        generations = {}
+        for generation, pause, collected in self.gc_pauses:
+            entry = generations.setdefault(str(generation), {"collections": 0, "total_ms": 0.0, "max_ms": 0.0,
+                                                             "collected": 0})
+            entry["collections"] += 1
+            entry["total_ms"] += pause * 1000
+            entry["max_ms"] = max(entry["max_ms"], pause * 1000)
+            entry["collected"] += collected
+        return {
+            "frames": len(self.frame_times),
+            "traced_frames": int(traced.sum()),
+            "frame_ms": {"mean": float(times.mean()), "p95": float(np.percentile(times, 95)),
+                         "max": float(times.max())},
+            "frame_ms_with_gc": float(times[paused].mean()) if paused.any() else None,
+            "frame_ms_without_gc": float(times[~paused].mean()) if (~paused).any() else None,
+            "transient_kib_per_frame": float(np.mean(self.frame_transient or [0])) / 1024,
+            "retained_kib_per_frame": float(np.mean(self.frame_retained or [0])) / 1024,
+            "gc": generations,
+            "gc_ms_per_frame": float(np.mean(self.frame_gc or [0.0])) * 1000,
+            "functions": {
+                key: {
+                    "calls": calls / frames,
+                    "transient_kib": transient / frames / 1024,
+                    "retained_kib": retained / frames / 1024,
+                    "retained_blocks": blocks / frames,
+                }
+                for key, (calls, transient, retained, blocks) in self.functions.items()
+                if calls or blocks
+            },
+        }
+
+
+def ranked(functions, sort):
+    key = {"transient": "transient_kib", "retained": "retained_kib", "calls": "calls"}[sort]
+    return sorted(functions.items(), key=lambda item: item[1][key], reverse=True)
+
+
+def format_report(report, rows=MEMTRACK_REPORT_ROWS, sort="transient"):
+    frame = report["frame_ms"]
+    traced = report["traced_frames"]
+    timing = "traced, so slowed down" if traced == report["frames"] else "untraced frames"
+    lines = [
+        f"{report['frames']} frames, {traced} traced: {frame['mean']:.2f} ms mean, {frame['p95']:.2f} ms p95, "
+        f"{frame['max']:.2f} ms max ({timing})",
+        f"per traced frame: {report['transient_kib_per_frame']:.1f} KiB transient peak, "
+        f"{report['retained_kib_per_frame']:.1f} KiB retained, {report['gc_ms_per_frame']:.3f} ms in GC",
+    ]
+    if report["frame_ms_with_gc"] is not None:
+        lines.append(f"frames with a GC pause: {report['frame_ms_with_gc']:.2f} ms mean, "
+                     f"without: {report['frame_ms_without_gc'] or 0:.2f} ms")
+    for generation, gen in sorted(report["gc"].items()):
+        lines.append(f"  gen {generation}: {gen['collections']} collections, {gen['total_ms']:.2f} ms total, "
+                     f"{gen['max_ms']:.3f} ms max, {gen['collected']} objects collected")
+    lines.append(f"{'function':<44} {'calls':>8} {'transient KiB':>14} {'retained KiB':>13} {'blocks':>8}"
+                 f"   (per traced frame)")
+    for key, stats in ranked(report["functions"], sort)[:rows]:
+        lines.append(f"{key:<44} {stats['calls']:>8.1f} {stats['transient_kib']:>14.2f} "
+                     f"{stats['retained_kib']:>13.2f} {stats['retained_blocks']:>8.1f}")
+    return "\n".join(lines)
+
+
+def format_diff(old, new, rows=MEMTRACK_REPORT_ROWS, sort="transient"):
+    # Functions ranked by how much their per-frame figure changed
+    field = {"transient": "transient_kib", "retained": "retained_kib", "calls": "calls"}[sort]
+    empty = {"calls": 0.0, "transient_kib": 0.0, "retained_kib": 0.0, "retained_blocks": 0.0}
+    keys = set(old["functions"]) | set(new["functions"])
+    changes = []
+    for key in keys:
+        before = old["functions"].get(key, empty)[field]
+        after = new["functions"].get(key, empty)[field]
+        changes.append((abs(after - before), key, before, after))
+    changes.sort(reverse=True)
+
+    lines = [
+        f"transient KiB/frame {old['transient_kib_per_frame']:.1f} -> {new['transient_kib_per_frame']:.1f}, "
+        f"retained KiB/frame {old['retained_kib_per_frame']:.1f} -> {new['retained_kib_per_frame']:.1f}, "
+        f"GC ms/frame {old['gc_ms_per_frame']:.3f} -> {new['gc_ms_per_frame']:.3f}",
+        f"{'function':<44} {'before':>10} {'after':>10} {'change':>10}   ({field} per frame)",
+    ]
+    for change, key, before, after in changes[:rows]:
+        if change == 0:
+            break
+        lines.append(f"{key:<44} {before:>10.2f} {after:>10.2f} {after - before:>+10.2f}")
+    return "\n".join(lines)
+
+
+def play(tracker, scenario, frames, seed, entity_store=False, atlas=None):
+    # A benchmark.py scenario played and drawn like game_loop would, one tick
+    # per frame, with the HUD on top
+    from asteroid import Asteroid
+    from benchmark import SCENARIOS
+    from hud import HUD
+    from simulation import Simulation
+    from worldbounds import WorldBounds, BOUNDS_WRAP
+
+    pygame.font.init()
+    screen = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
+    hud = HUD(pygame.font.Font(None, SCORE_FONT_SIZE))
+    dt = 1.0 / SIMULATION_TICK_RATE
+
+    # Scenarios keep their asteroids on screen so the load stays constant
+    original_bounds = Asteroid.bounds
+    Asteroid.bounds = WorldBounds(BOUNDS_WRAP)
+    try:
+        simulation = Simulation(seed, entity_store=entity_store)
+        simulation.activate()
+        inputs = SCENARIOS[scenario](simulation)
+        for _ in range(frames):
+            tracker.begin_frame()
+            simulation.step(dt, inputs(simulation))
+            screen.fill("black")
+            simulation.draw(screen, 1.0, atlas)
+            hud.update(simulation.score, simulation.lives, simulation.player.missiles_remaining)
+            hud.draw(screen)
+            tracker.end_frame()
+    finally:
+        Asteroid.bounds = original_bounds
+
+
+def main():
+    from atlas import SpriteAtlas
+    from benchmark import SCENARIOS
+
+    parser = argparse.ArgumentParser(description="Attribute per-frame allocations and GC pauses to game code")
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS), default="missile-barrage")
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--every", type=int, default=MEMTRACK_TRACE_EVERY,
+                        help="trace allocations every N frames, 1 traces them all")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--entity-store", action="store_true", help="run with the NumPy entity store")
+    parser.add_argument("--atlas", action="store_true", help="draw with the sprite atlas")
+    parser.add_argument("--sort", choices=SORT_KEYS, default="transient", help="column to rank functions by")
+    parser.add_argument("--rows", type=int, default=MEMTRACK_REPORT_ROWS)
+    parser.add_argument("--output", metavar="PATH", help="write the report as JSON")
+    parser.add_argument("--diff", nargs=2, metavar=("OLD", "NEW"),
+                        help="compare two JSON reports instead of running")
+    args = parser.parse_args()
+
+    if args.diff:
+        reports = []
+        for path in args.diff:
+            with open(path) as file:
+                reports.append(json.load(file))
+        print(format_diff(*reports, rows=args.rows, sort=args.sort))
+        return
+
+    atlas = SpriteAtlas().build() if args.atlas else None
+    tracker = MemoryTracker(args.every)
+    tracker.start()
+    try:
+        play(tracker, args.scenario, args.frames, args.seed, args.entity_store, atlas)
+    finally:
+        tracker.stop()
+    report = tracker.report()
+    report["scenario"] = args.scenario
+    print(format_report(report, args.rows, args.sort))
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=1)
+
+
+if __name__ == "__main__":
+    main()
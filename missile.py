@@ -1,26 +1,41 @@
 import pygame
 from circleshape import CircleShape
 from constants import *
+from worldbounds import WorldBounds, BOUNDS_KILL
 
 class Missile(CircleShape):
+    bounds = WorldBounds(BOUNDS_KILL, MISSILE_BOUNDS_MARGIN)
+    trail_segments = 2  # trail circles drawn behind the missile, lowered by the frame governor
+
     def __init__(self, x, y, radius):
         super().__init__(x, y, radius)
+        self.owner = None  # the Player that fired it, if any
         self.timer = 0  # For animation effects
 
     def draw(self, screen):
         # Draw the missile as a filled circle with a trail
-        pygame.draw.circle(screen, (255, 100, 100), self.position, self.radius)
+        rect = pygame.draw.circle(screen, (255, 100, 100), self.position, self.radius)
         
         # Draw a small trail behind the missile
-        if self.velocity.length() > 0:
+        if self.trail_segments and self.velocity.length() > 0:
             direction = self.velocity.normalize()
             trail_pos = self.position - direction * self.radius * 2
-            pygame.draw.circle(screen, (255, 200, 100), trail_pos, self.radius * 0.7)
+            rect.union_ip(pygame.draw.circle(screen, (255, 200, 100), trail_pos, self.radius * 0.7))
             
             # Second trail segment
-            trail_pos2 = trail_pos - direction * self.radius * 1.5
-            pygame.draw.circle(screen, (255, 200, 200), trail_pos2, self.radius * 0.4)
+            if self.trail_segments > 1:
+                trail_pos2 = trail_pos - direction * self.radius * 1.5
+                rect.union_ip(pygame.draw.circle(screen, (255, 200, 200), trail_pos2, self.radius * 0.4))
+        return rect
+
+    def atlas_blits(self, atlas):
+        return [atlas.missile(self.position, self.velocity, self.trail_segments)]
+
+    @classmethod
+    def atlas_batch(cls, atlas, position, velocity, radius):
+        return atlas.missiles(position, velocity, cls.trail_segments)
 
     def update(self, dt):
         self.position += self.velocity * dt
-        self.timer += dt 
\ No newline at end of file
+        self.timer += dt
+        self.apply_bounds(dt)
@@ -0,0 +1,169 @@
+import struct
+import numpy as np
+from constants import *
+
+# Wire format shared by server.py and client.py. Every message is a frame of a
+# little-endian u32 length followed by the payload, whose first byte is the
+# message type:
+#
+#   HELLO     client -> server  asks for a ship
+#   WELCOME   server -> client  ship id, tick rate and current tick
+#   INPUT     client -> server  input sequence number, last snapshot tick
+#                               received (the ack) and the controls.py bitmask
+#   SNAPSHOT  server -> client  world state for one tick, see below
+#
+# Snapshots are delta-encoded against the last snapshot the client acked. The
+# receiver moves every body it already knows along its last velocity, so the
+# server only sends what that prediction gets wrong:
+#
+#   header     tick, baseline tick (NO_BASELINE for a full snapshot), last
+#              input sequence applied for this client, this client's ship id
+#   removed    ids of bodies in the baseline that are gone
+#   new        bodies not in the baseline, every field
+#   positions  bodies whose predicted position is off by more than
+#              NET_POSITION_TOLERANCE units
+#   velocities bodies whose velocity changed
+#   ships      every ship in full, they are few and change every tick
+#
+# Each section is a u32 count followed by packed NumPy records.
+MSG_HELLO = 1
+MSG_WELCOME = 2
+MSG_INPUT = 3
+MSG_SNAPSHOT = 4
+
+NO_BASELINE = 0xFFFFFFFF
+
+KIND_ASTEROID = 0
+KIND_SHOT = 1
+KIND_MISSILE = 2
+
+SHIP_INVULNERABLE = 1 << 0
+SHIP_VISIBLE = 1 << 1
+
+FRAME = struct.Struct("<I")
+HELLO = struct.Struct("<B")
+WELCOME = struct.Struct("<BIdI")
+INPUT = struct.Struct("<BIIB")
+SNAPSHOT = struct.Struct("<BIIII")
+COUNT = struct.Struct("<I")
+
+BODY = np.dtype([("id", "<u4"), ("kind", "u1"), ("radius", "u1"),
+                 ("x", "<i2"), ("y", "<i2"), ("vx", "<i2"), ("vy", "<i2")])
+POSITION = np.dtype([("id", "<u4"), ("x", "<i2"), ("y", "<i2")])
+VELOCITY = np.dtype([("id", "<u4"), ("vx", "<i2"), ("vy", "<i2")])
+SHIP = np.dtype([("id", "<u4"), ("x", "<i2"), ("y", "<i2"), ("rotation", "<u2"), ("flags", "u1"),
+                 ("lives", "u1"), ("missiles", "u1"), ("score", "<u4")])
+IDS = np.dtype("<u4")
+
+
+def frame(payload):
+    return FRAME.pack(len(payload)) + payload
+
+
+async def read_frame(reader):
+    size, = FRAME.unpack(await reader.readexactly(FRAME.size))
+    return await reader.readexactly(size)
+
+
+def quantize(values, scale):
+    return np.clip(np.rint(values * scale), -0x8000, 0x7FFF).astype(np.int16)
+
+
+def predict(bodies, ticks, rate):
+    # Where the receiver assumes each body is `ticks` ticks after the baseline
+    step = ticks * NET_POSITION_SCALE / (NET_VELOCITY_SCALE * rate)
+    x = np.clip(bodies["x"] + np.rint(bodies["vx"] * step), -0x8000, 0x7FFF).astype(np.int16)
+    y = np.clip(bodies["y"] + np.rint(bodies["vy"] * step), -0x8000, 0x7FFF).astype(np.int16)
+    return x, y
+
+
+def pack_section(records):
+    return COUNT.pack(len(records)) + records.tobytes()
+
+
+def unpack_section(data, offset, dtype):
+    count, = COUNT.unpack_from(data, offset)
+    offset += COUNT.size
+    records = np.frombuffer(data, dtype, count, offset)
+    return records, offset + count * dtype.itemsize
+
+
+def encode_bodies(bodies, base, ticks, rate):
+    # Returns the body sections against `base` (None for a full snapshot) and
+    # the body state the receiver will hold once it has decoded them
+    if base is None:
+        empty = np.zeros(0, IDS)
+        sections = (pack_section(empty) + pack_section(bodies)
+                    + pack_section(np.zeros(0, POSITION)) + pack_section(np.zeros(0, VELOCITY)))
+        return sections, bodies
+
+    _, current_index, base_index = np.intersect1d(
+        bodies["id"], base["id"], assume_unique=True, return_indices=True)
+    removed = np.setdiff1d(base["id"], bodies["id"], assume_unique=True)
+    is_new = np.ones(len(bodies), dtype=bool)
+    is_new[current_index] = False
+
+    kept = bodies[current_index]
+    predicted_x, predicted_y = predict(base[base_index], ticks, rate)
+    send_position = ((np.abs(kept["x"].astype(np.int32) - predicted_x) > NET_POSITION_TOLERANCE)
+                     | (np.abs(kept["y"].astype(np.int32) - predicted_y) > NET_POSITION_TOLERANCE))
+    send_velocity = (kept["vx"] != base["vx"][base_index]) | (kept["vy"] != base["vy"][base_index])
+
+    positions = np.zeros(int(send_position.sum()), POSITION)
+    positions["id"] = kept["id"][send_position]
+    positions["x"] = kept["x"][send_position]
+    positions["y"] = kept["y"][send_position]
+    velocities = np.zeros(int(send_velocity.sum()), VELOCITY)
+    velocities["id"] = kept["id"][send_velocity]
+    velocities["vx"] = kept["vx"][send_velocity]
+    velocities["vy"] = kept["vy"][send_velocity]
+
+    # The receiver keeps its prediction wherever no position was sent
+    state = bodies.copy()
+    state["x"][current_index] = np.where(send_position, kept["x"], predicted_x)
+    state["y"][current_index] = np.where(send_position, kept["y"], predicted_y)
+
+    sections = (pack_section(removed.astype(IDS)) + pack_section(bodies[is_new])
+                + pack_section(positions) + pack_section(velocities))
+    return sections, state
+
+
+class Snapshot:
+    def __init__(self, tick, base_tick, input_sequence, ship_id, bodies, ships):
+        self.tick = tick
+        self.base_tick = base_tick
+        self.input_sequence = input_sequence
+        self.ship_id = ship_id
+        self.bodies = bodies
+        self.ships = ships
+
+    def ship(self, ship_id):
+        rows = self.ships[self.ships["id"] == ship_id]
+        return rows[0] if len(rows) else None
+
+
+def decode_snapshot(data, baselines, rate):
+    # `baselines` maps tick -> body state of snapshots decoded earlier
+    _, tick, base_tick, input_sequence, ship_id = SNAPSHOT.unpack_from(data)
+    offset = SNAPSHOT.size
+    removed, offset = unpack_section(data, offset, IDS)
+    new, offset = unpack_section(data, offset, BODY)
+    positions, offset = unpack_section(data, offset, POSITION)
+    velocities, offset = unpack_section(data, offset, VELOCITY)
+    ships, offset = unpack_section(data, offset, SHIP)
+
+    if base_tick == NO_BASELINE:
+        bodies = new.copy()
+    else:
+        base = baselines[base_tick]
+        kept = base[~np.isin(base["id"], removed, assume_unique=True)].copy()
+        kept["x"], kept["y"] = predict(kept, tick - base_tick, rate)
+        index = np.searchsorted(kept["id"], positions["id"])
+        kept["x"][index] = positions["x"]
+        kept["y"][index] = positions["y"]
+        index = np.searchsorted(kept["id"], velocities["id"])
+        kept["vx"][index] = velocities["vx"]
+        kept["vy"][index] = velocities["vy"]
+        bodies = np.concatenate([kept, new])
+        bodies.sort(order="id", kind="stable")
+    return Snapshot(tick, base_tick, input_sequence, ship_id, bodies, ships.copy())
@@ -0,0 +1,167 @@
+import numpy as np
+import pygame
+from constants import *
+from spritecache import SpriteCache
+
+
+# Pooled particle engine shared by every explosion. All particle state lives in
+# preallocated NumPy arrays so update, damping and fade run as a handful of
+# vectorized operations instead of one Python object per particle.
+class ParticleSystem(pygame.sprite.Sprite):
+    # Pre-rendered particle sprites, shared by every system
+    sprite_cache = SpriteCache(PARTICLE_SPRITE_CACHE_SIZE)
+
+    def __init__(self, capacity=PARTICLE_CAPACITY, seed=None):
+        if hasattr(self.__class__, "containers") and self.__class__.containers is not None:
+            pygame.sprite.Sprite.__init__(self, self.containers)
+        else:
+            pygame.sprite.Sprite.__init__(self)
+
+        self.rng = np.random.default_rng(seed)
+        self.capacity = 0
+        self.position = np.zeros((0, 2), dtype=np.float32)
+        self.velocity = np.zeros((0, 2), dtype=np.float32)
+        self.radius = np.zeros(0, dtype=np.float32)
+        self.lifetime = np.zeros(0, dtype=np.float32)
+        self.alpha = np.zeros(0, dtype=np.uint8)
+        self.color = np.zeros((0, 3), dtype=np.uint8)
+        self.live = np.zeros(0, dtype=bool)
+
+        # Free slots are kept as a stack so recently freed slots are reused first
+        self.free = []
+        self.used = 0  # high-water mark, slots past this have never been used
+        self.live_count = 0
+        self.grow(capacity)
+
+    def grow(self, capacity):
+        old = self.capacity
+        if capacity <= old:
+            return
+
+        def resized(array):
+            grown = np.zeros((capacity,) + array.shape[1:], dtype=array.dtype)
+            grown[:old] = array
+            return grown
+
+        self.position = resized(self.position)
+        self.velocity = resized(self.velocity)
+        self.radius = resized(self.radius)
+        self.lifetime = resized(self.lifetime)
+        self.alpha = resized(self.alpha)
+        self.color = resized(self.color)
+        self.live = resized(self.live)
+        # New slots go underneath the existing free ones so low slots stay hot
+        self.free[:0] = range(capacity - 1, old - 1, -1)
+        self.capacity = capacity
+
+    def allocate(self, count):
+        if count > len(self.free):
+            self.grow(max(self.capacity * 2, self.capacity + count))
+        slots = np.array(self.free[-count:], dtype=np.intp)
+        del self.free[-count:]
+        self.used = max(self.used, int(slots.max()) + 1)
+        return slots
+
+    def emit(self, x, y, count, color):
+        if count <= 0:
+            return np.zeros(0, dtype=np.intp)
+
+        slots = self.allocate(count)
+        rng = self.rng
+
+        # Random direction with a random speed, like the old per-object particles
+        direction = rng.uniform(-1, 1, (count, 2))
+        length = np.hypot(direction[:, 0], direction[:, 1])
+        length[length == 0] = 1
+        speed = rng.uniform(EXPLOSION_SPEED * 0.5, EXPLOSION_SPEED, count)
+        jitter = rng.integers(-EXPLOSION_COLOR_JITTER, EXPLOSION_COLOR_JITTER + 1, (count, 3))
+
+        self.position[slots] = (x, y)
+        self.velocity[slots] = direction * (speed / length)[:, None]
+        self.radius[slots] = rng.uniform(PARTICLE_MIN_RADIUS, PARTICLE_MAX_RADIUS, count)
+        self.lifetime[slots] = EXPLOSION_DURATION
+        self.alpha[slots] = 255
+        self.color[slots] = np.clip(np.asarray(color[:3]) + jitter, 0, 255)
+        self.live[slots] = True
+        self.live_count += count
+        return slots
+
+    def update(self, dt):
+        if self.live_count == 0:
+            return
+
+        n = self.used
+        lifetime = self.lifetime[:n]
+        velocity = self.velocity[:n]
+
+        self.position[:n] += velocity * dt
+        lifetime -= dt
+        self.alpha[:n] = np.clip(255 * lifetime / EXPLOSION_DURATION, 0, 255)
+        # Slow down over time, at the same rate whatever the tick rate
+        velocity *= EXPLOSION_DAMPING ** (dt * EXPLOSION_DAMPING_RATE)
+
+        dead = self.live[:n] & (lifetime <= 0)
+        if dead.any():
+            slots = np.flatnonzero(dead)
+            self.live[slots] = False
+            self.free.extend(slots.tolist())
+            self.live_count -= len(slots)
+
+    def draw(self, screen):
+        # Returns the rects of the drawn particles
+        return screen.blits(self.atlas_blits())
+
+    def visible(self):
+        # Slots of the particles drawn this frame
+        n = self.used
+        return np.flatnonzero(self.live[:n] & (self.alpha[:n] > 0))
+
+    def atlas_blits(self, atlas=None):
+        # (sprite, dest) pairs for every visible particle; particle sprites
+        # come from sprite_cache, only the atlas scale is used
+        if self.live_count == 0:
+            return []
+        visible = self.visible()
+        scale = 1.0 if atlas is None else atlas.scale
+        return particle_blits(self.position[visible], self.radius[visible], self.alpha[visible],
+                              self.color[visible], scale)
+
+
+def particle_blits(position, radius, alpha, color, scale=1.0):
+    # (sprite, dest) pairs for particles given as arrays, drawn at scale
+    if len(position) == 0:
+        return []
+
+    # Quantize radius, alpha and color, then pack them into one integer key
+    # per particle so the sprite lookups below stay cheap
+    radius_q = np.rint(radius * scale / PARTICLE_RADIUS_STEP).astype(np.int64)
+    alpha_q = alpha.astype(np.int64) * PARTICLE_ALPHA_BUCKETS // 256
+    color_q = color.astype(np.int64) // PARTICLE_COLOR_STEP
+    keys = (
+        (radius_q << 32)
+        | (alpha_q << 24)
+        | (color_q[:, 0] << 16)
+        | (color_q[:, 1] << 8)
+        | color_q[:, 2]
+    )
+    offset = radius_q * PARTICLE_RADIUS_STEP
+    xs = (position[:, 0] * scale - offset).tolist()
+    ys = (position[:, 1] * scale - offset).tolist()
+
+    get = ParticleSystem.sprite_cache.get
+    return [(get(key, render_particle), (x, y)) for key, x, y in zip(keys.tolist(), xs, ys)]
+
+
+def render_particle(key):
+    # Builds the sprite for a packed key from ParticleSystem.draw
+    radius = (key >> 32) * PARTICLE_RADIUS_STEP
+    alpha = ((key >> 24) & 0xFF) + 1
+    alpha = alpha * 256 // PARTICLE_ALPHA_BUCKETS - 1
+    color = [
+        min(255, ((key >> shift) & 0xFF) * PARTICLE_COLOR_STEP + PARTICLE_COLOR_STEP // 2)
+        for shift in (16, 8, 0)
+    ]
+    size = max(1, int(np.ceil(radius * 2)))
+    surface = pygame.Surface((size, size), pygame.SRCALPHA)
+    pygame.draw.circle(surface, (*color, alpha), (radius, radius), radius)
+    return surface
@@ -0,0 +1,60 @@
+import pygame
+from constants import *
+from controls import *
+
+# Scripted pilots for headless runs. A pilot takes the Simulation about to be
+# stepped and returns the input bitmask for that tick (see controls.py). Pilots
+# only read the world, so they never disturb its random stream.
+
+
+def idle(simulation):
+    # Sits still, a baseline for how long the field alone takes to win
+    return 0
+
+
+def spin_and_shoot(simulation):
+    # Minimal scripted pilot for headless runs: turn, thrust now and then, fire
+    inputs = INPUT_RIGHT | INPUT_SHOOT
+    if simulation.ticks % 120 < 30:
+        inputs |= INPUT_FORWARD
+    if simulation.ticks % 600 == 0:
+        inputs |= INPUT_MISSILE
+    return inputs
+
+
+def sniper(simulation):
+    # Turns towards the nearest asteroid and fires once roughly lined up.
+    # Missiles go to anything big that gets close.
+    player = simulation.player
+    position = player.position
+    nearest = None
+    nearest_distance = None
+    for asteroid in simulation.asteroids:
+        distance = position.distance_squared_to(asteroid.position)
+        if nearest is None or distance < nearest_distance:
+            nearest = asteroid
+            nearest_distance = distance
+    if nearest is None:
+        return 0
+
+    forward = pygame.Vector2(0, 1).rotate(player.rotation)
+    angle = forward.angle_to(nearest.position - position)
+    angle = (angle + 180) % 360 - 180
+    inputs = 0
+    if angle > 2:
+        inputs |= INPUT_RIGHT
+    elif angle < -2:
+        inputs |= INPUT_LEFT
+    if abs(angle) < 10:
+        inputs |= INPUT_SHOOT
+        close = (ASTEROID_MAX_RADIUS * 3) ** 2
+        if nearest.radius >= ASTEROID_MAX_RADIUS and nearest_distance < close:
+            inputs |= INPUT_MISSILE
+    return inputs
+
+
+PILOTS = {
+    "idle": idle,
+    "spin-and-shoot": spin_and_shoot,
+    "sniper": sniper,
+}
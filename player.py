@@ -3,13 +3,20 @@ from circleshape import CircleShape
 from constants import *
 from shot import Shot
 from missile import Missile
+from controls import *
 
 
 class Player(CircleShape):
+    # Whether an invulnerable ship blinks or is drawn steadily; the frame
+    # governor turns blinking off under load. Either way `visible` still
+    # toggles, it is part of the game state.
+    blink = True
+
     def __init__(self, x, y):
         self.x = x
         self.y = y
         self.rotation = 0
+        self.previous_rotation = 0
         self.is_invulnerable = False
         self.invulnerable_timer = 0
         self.blink_timer = 0
@@ -17,6 +24,7 @@ class Player(CircleShape):
         self.start_position = pygame.Vector2(x, y)
         self.missiles_remaining = PLAYER_MISSILE_COUNT
         self.missile_timer = 0
+        self.inputs = 0  # control bitmask for the next update, see controls.py
 
         super().__init__(self.x, self.y, PLAYER_RADUIUS)
 
@@ -26,6 +34,9 @@ class Player(CircleShape):
         self.position = pygame.Vector2(self.start_position)
         self.velocity = pygame.Vector2(0, 0)
         self.rotation = 0
+        # Teleporting, so don't interpolate from where the ship was
+        self.previous_position = pygame.Vector2(self.position)
+        self.previous_rotation = 0
         self.is_invulnerable = True
         self.invulnerable_timer = PLAYER_RESPAWN_TIME
         self.blink_timer = PLAYER_BLINK_RATE
@@ -38,21 +49,36 @@ class Player(CircleShape):
     def shoot(self):
         if self.timer <= 0:
             shot = Shot(self.position.x, self.position.y, SHOT_RADIUS)
+            shot.owner = self
             shot.velocity = pygame.math.Vector2(0, 1).rotate(self.rotation) * PLAYER_SHOT_SPEED
             self.timer = PLAYER_SHOT_COOLDOWN
             
     def fire_missile(self):
         if self.missile_timer <= 0 and self.missiles_remaining > 0:
             missile = Missile(self.position.x, self.position.y, MISSILE_RADIUS)
+            missile.owner = self
             missile.velocity = pygame.math.Vector2(0, 1).rotate(self.rotation) * MISSILE_SPEED
             self.missile_timer = MISSILE_COOLDOWN
             self.missiles_remaining -= 1
             return True
         return False
 
+    def save_state(self):
+        super().save_state()
+        self.previous_rotation = self.rotation
+
+    def shown(self):
+        return not self.is_invulnerable or self.visible or not self.blink
+
     def draw(self, screen):
-        if not self.is_invulnerable or self.visible:
-            pygame.draw.polygon(screen, "white", self.triangle(), 2)
+        if self.shown():
+            return pygame.draw.polygon(screen, "white", self.triangle(), 2)
+        return None
+
+    def atlas_blits(self, atlas):
+        if self.shown():
+            return [atlas.ship(self.position, self.rotation)]
+        return []
 
     def triangle(self):
         forward = pygame.Vector2(0, 1).rotate(self.rotation)
@@ -86,17 +112,17 @@ class Player(CircleShape):
                 self.is_invulnerable = False
                 self.visible = True
 
-        keys = pygame.key.get_pressed()
+        inputs = self.inputs
 
-        if keys[pygame.K_SPACE]:
+        if inputs & INPUT_SHOOT:
             self.shoot()
-        if keys[pygame.K_e]:
+        if inputs & INPUT_MISSILE:
             self.fire_missile()
-        if keys[pygame.K_a]:
+        if inputs & INPUT_LEFT:
             self.rotate(-dt)
-        if keys[pygame.K_d]:
+        if inputs & INPUT_RIGHT:
             self.rotate(dt)
-        if keys[pygame.K_w]:
+        if inputs & INPUT_FORWARD:
             self.move(dt)
-        if keys[pygame.K_s]:
+        if inputs & INPUT_BACK:
             self.move(-dt)
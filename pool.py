@@ -0,0 +1,62 @@
+from constants import *
+
+
+# Free list of killed sprites waiting to be reused. Instances killed during a
+# tick are held back until collect() so nothing is recycled while the tick that
+# killed it may still be looking at it.
+class Pool:
+    def __init__(self, max_size=POOL_MAX_SIZE):
+        self.max_size = max_size
+        self.free = []
+        self.pending = []
+        self.hits = 0       # constructions served from the free list
+        self.misses = 0     # constructions that had to allocate
+        self.discarded = 0  # releases dropped because the pool was full
+
+    def acquire(self):
+        if self.free:
+            self.hits += 1
+            return self.free.pop()
+        self.misses += 1
+        return None
+
+    def release(self, instance):
+        self.pending.append(instance)
+
+    def collect(self):
+        if not self.pending:
+            return
+        room = self.max_size - len(self.free)
+        if room < len(self.pending):
+            self.discarded += len(self.pending) - max(room, 0)
+            self.pending = self.pending[:max(room, 0)]
+        self.free.extend(self.pending)
+        self.pending = []
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "discarded": self.discarded,
+            "free": len(self.free),
+        }
+
+
+# Mixin for sprites that can be recycled. While the class has a pool, calling
+# the class hands back a killed instance when one is free and __init__ then
+# re-initializes it in place; kill() returns the instance to the pool.
+class Pooled:
+    pool = None
+
+    def __new__(cls, *args, **kwargs):
+        pool = cls.pool
+        if pool is not None:
+            instance = pool.acquire()
+            if instance is not None:
+                return instance
+        return super().__new__(cls)
+
+    def kill(self):
+        if self.pool is not None and self.alive():
+            self.pool.release(self)
+        super().kill()
@@ -0,0 +1,170 @@
+import csv
+import json
+import time
+import numpy as np
+import pygame
+from constants import *
+from hud import TextWidget
+
+# Phases of one game_loop frame, in the order they run
+FRAME_PHASES = ["input", "update", "collision", "draw", "hud", "flip", "idle"]
+
+
+# Per-phase frame timer. Call begin_frame() at the top of a frame, mark(phase)
+# at the end of each phase and end_frame() at the bottom; the time since the
+# previous mark is charged to that phase. Frames are kept in a fixed-size ring
+# buffer. While disabled every call returns straight away. Enabling or
+# disabling takes effect at the next begin_frame(), so a frame is only ever
+# recorded whole.
+class FrameProfiler:
+    def __init__(self, groups=(), capacity=PROFILER_HISTORY, enabled=False):
+        self.phases = FRAME_PHASES
+        self.phase_index = {phase: i for i, phase in enumerate(self.phases)}
+        self.groups = list(groups)
+        self.capacity = capacity
+        self.enabled = enabled
+        self.recording = False  # whether the current frame started enabled
+
+        # One row per frame: phase times in seconds, then live count per group
+        self.times = np.zeros((capacity, len(self.phases)))
+        self.counts = np.zeros((capacity, len(self.groups)), dtype=np.int32)
+        self.quality = np.zeros(capacity, dtype=np.int8)  # frame governor level, 0 is full
+        self.text_renders = np.zeros(capacity, dtype=np.int32)  # HUD font.render calls
+        self.frames = 0  # frames recorded so far, the ring wraps at capacity
+
+        self.current = [0.0] * len(self.phases)
+        self.last_mark = 0.0
+
+    def begin_frame(self):
+        self.recording = self.enabled
+        if not self.recording:
+            return
+        self.current = [0.0] * len(self.phases)
+        self.last_mark = time.perf_counter()
+
+    def mark(self, phase):
+        if not self.recording:
+            return
+        now = time.perf_counter()
+        self.current[self.phase_index[phase]] += now - self.last_mark
+        self.last_mark = now
+
+    def end_frame(self, counts=None, quality=0, text_renders=0):
+        if not self.recording:
+            return
+        row = self.frames % self.capacity
+        self.times[row] = self.current
+        if counts is not None:
+            self.counts[row] = [counts.get(name, 0) for name in self.groups]
+        self.quality[row] = quality
+        self.text_renders[row] = text_renders
+        self.frames += 1
+
+    def order(self):
+        # Ring buffer rows, oldest first
+        if self.frames <= self.capacity:
+            return np.arange(self.frames)
+        start = self.frames % self.capacity
+        return np.r_[start:self.capacity, 0:start]
+
+    def history(self):
+        # Recorded rows, oldest first
+        order = self.order()
+        return self.times[order], self.counts[order]
+
+    def recent_means(self, frames=60):
+        times, _ = self.history()
+        if len(times) == 0:
+            return np.zeros(len(self.phases))
+        return times[-frames:].mean(axis=0)
+
+    def recent_text_renders(self, frames=60):
+        return int(self.text_renders[self.order()[-frames:]].sum())
+
+    def rows(self):
+        times, counts = self.history()
+        order = self.order()
+        quality = self.quality[order]
+        text_renders = self.text_renders[order]
+        first = self.frames - len(times)
+        for i in range(len(times)):
+            row = {"frame": first + i}
+            for phase, value in zip(self.phases, times[i]):
+                row[f"{phase}_ms"] = round(float(value) * 1000, 4)
+            row["total_ms"] = round(float(times[i].sum()) * 1000, 4)
+            row["quality"] = int(quality[i])
+            row["text_renders"] = int(text_renders[i])
+            for name, value in zip(self.groups, counts[i]):
+                row[name] = int(value)
+            yield row
+
+    def dump(self, path):
+        # Writes the ring buffer as JSON if the path ends in .json, else CSV
+        rows = list(self.rows())
+        with open(path, "w", newline="") as file:
+            if path.endswith(".json"):
+                json.dump(rows, file, indent=1)
+            elif rows:
+                writer = csv.DictWriter(file, fieldnames=list(rows[0]))
+                writer.writeheader()
+                writer.writerows(rows)
+        return len(rows)
+
+
+# On-screen view of a FrameProfiler: a frame-time graph, the per-phase
+# breakdown averaged over the last second, HUD text renders over the last
+# second and the live sprite counts
+class ProfilerOverlay:
+    def __init__(self, profiler, font):
+        self.profiler = profiler
+        self.font = font
+        self.visible = False
+        self.width = PROFILER_GRAPH_FRAMES * 2
+        self.graph_height = 60
+        self.top_left = pygame.Vector2(SCREEN_WIDTH - self.width - 20, 60)
+
+        line_height = font.get_linesize()
+        rows = len(profiler.phases) + 2 + len(profiler.groups)
+        self.background = pygame.Surface((self.width + 10, self.graph_height + rows * line_height + 15),
+                                         pygame.SRCALPHA)
+        self.background.fill((0, 0, 0, 170))
+
+        x = self.top_left.x
+        y = self.top_left.y + self.graph_height + 10
+        self.lines = []
+        for i, name in enumerate(["total"] + profiler.phases + ["text renders"] + profiler.groups):
+            self.lines.append(TextWidget(font, name + " {}", (200, 200, 200), topleft=(x, y + i * line_height)))
+
+    def toggle(self):
+        # Profiling runs while the overlay is shown
+        self.visible = not self.visible
+        self.profiler.enabled = self.visible
+
+    def draw(self, screen):
+        if not self.visible or self.profiler.frames == 0:
+            return []
+
+        rects = [screen.blit(self.background, self.top_left - pygame.Vector2(5, 5))]
+
+        # Frame-time graph, 2px per frame, with a line at the frame budget
+        times, counts = self.profiler.history()
+        totals = times[-PROFILER_GRAPH_FRAMES:].sum(axis=1)
+        budget = 1.0 / RENDER_FRAME_RATE
+        scale = self.graph_height / (budget * 2)
+        bottom = self.top_left.y + self.graph_height
+        for i, total in enumerate(totals.tolist()):
+            x = self.top_left.x + i * 2
+            height = min(self.graph_height, total * scale)
+            color = (80, 200, 80) if total <= budget else (230, 80, 60)
+            pygame.draw.line(screen, color, (x, bottom), (x, bottom - height))
+        pygame.draw.line(screen, (120, 120, 120), (self.top_left.x, bottom - budget * scale),
+                         (self.top_left.x + self.width, bottom - budget * scale))
+
+        means = self.profiler.recent_means() * 1000
+        values = [f"{means.sum():.2f} ms"] + [f"{value:.2f} ms" for value in means]
+        values.append(str(self.profiler.recent_text_renders()))
+        values += [str(int(count)) for count in counts[-1]]
+        for line, value in zip(self.lines, values):
+            line.set(value)
+            rects.append(line.draw(screen))
+        return rects
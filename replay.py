@@ -0,0 +1,118 @@
+import argparse
+import struct
+import time
+from constants import *
+from simulation import Simulation
+
+# Replay files hold the seed plus one input bitmask per tick (see controls.py),
+# run-length encoded since held keys repeat for many ticks in a row:
+#
+#   header  magic "ASRP", version, seed, tick rate, tick count, run count
+#   runs    (bitmask, repeat count) pairs
+#   footer  final score and Simulation.state_digest() at the end of the run
+REPLAY_MAGIC = b"ASRP"
+REPLAY_VERSION = 2  # 2: swept projectile collisions, version 1 games no longer replay the same
+HEADER = struct.Struct("<4sBqdII")
+RUN = struct.Struct("<BH")
+FOOTER = struct.Struct("<qQ")
+MAX_RUN = 0xFFFF
+
+
+class Replay:
+    def __init__(self, seed, tick_rate, inputs, final_score=None, final_digest=None):
+        self.seed = seed
+        self.tick_rate = tick_rate
+        self.inputs = inputs
+        self.final_score = final_score
+        self.final_digest = final_digest
+
+    def save(self, path):
+        runs = []
+        for inputs in self.inputs:
+            if runs and runs[-1][0] == inputs and runs[-1][1] < MAX_RUN:
+                runs[-1][1] += 1
+            else:
+                runs.append([inputs, 1])
+
+        # Packed before the file is opened, so a bad value can't leave a truncated file
+        data = b"".join([
+            HEADER.pack(REPLAY_MAGIC, REPLAY_VERSION, self.seed, self.tick_rate, len(self.inputs), len(runs)),
+            b"".join(RUN.pack(inputs, count) for inputs, count in runs),
+            FOOTER.pack(self.final_score or 0, self.final_digest or 0),
+        ])
+        with open(path, "wb") as file:
+            file.write(data)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as file:
+            data = file.read()
+
+        magic, version, seed, tick_rate, ticks, run_count = HEADER.unpack_from(data)
+        if magic != REPLAY_MAGIC or version != REPLAY_VERSION:
+            raise ValueError(f"{path} is not a version {REPLAY_VERSION} replay file")
+
+        inputs = bytearray()
+        offset = HEADER.size
+        for mask, count in RUN.iter_unpack(data[offset:offset + run_count * RUN.size]):
+            inputs.extend(bytes((mask,)) * count)
+        if len(inputs) != ticks:
+            raise ValueError(f"{path} is truncated: {len(inputs)} of {ticks} ticks")
+
+        final_score, final_digest = FOOTER.unpack_from(data, offset + run_count * RUN.size)
+        return cls(seed, tick_rate, inputs, final_score, final_digest)
+
+
+# Collects the inputs fed to a Simulation so the session can be replayed.
+# Call record() with the same bitmask right after every simulation.step().
+class InputRecorder:
+    def __init__(self, simulation, tick_rate=SIMULATION_TICK_RATE):
+        self.simulation = simulation
+        self.tick_rate = tick_rate
+        self.inputs = bytearray()
+
+    def record(self, inputs):
+        self.inputs.append(inputs)
+
+    def save(self, path):
+        simulation = self.simulation
+        Replay(
+            simulation.seed, self.tick_rate, self.inputs,
+            simulation.score, simulation.state_digest(),
+        ).save(path)
+
+
+def play(replay):
+    # Runs a replay headless as fast as possible and returns the final simulation
+    simulation = Simulation(replay.seed)
+    dt = 1.0 / replay.tick_rate
+    for inputs in replay.inputs:
+        simulation.step(dt, inputs)
+    return simulation
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a recorded game headless and verify the result")
+    parser.add_argument("path", help="replay file written with main.py --record")
+    args = parser.parse_args()
+
+    replay = Replay.load(args.path)
+    start = time.perf_counter()
+    simulation = play(replay)
+    elapsed = time.perf_counter() - start
+
+    ticks = len(replay.inputs)
+    print(f"seed {replay.seed}, {ticks} ticks at {replay.tick_rate:g} Hz "
+          f"replayed in {elapsed:.3f}s ({ticks / max(elapsed, 1e-9):.0f} ticks/sec)")
+    print(f"score {simulation.score}, lives {simulation.lives}, game over: {simulation.game_over}")
+
+    digest = simulation.state_digest()
+    if simulation.score != replay.final_score or digest != replay.final_digest:
+        print(f"MISMATCH: recorded score {replay.final_score} digest {replay.final_digest:016x}, "
+              f"replayed digest {digest:016x}")
+        raise SystemExit(1)
+    print(f"state digest {digest:016x} matches the recording")
+
+
+if __name__ == "__main__":
+    main()
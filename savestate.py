@@ -0,0 +1,314 @@
+import argparse
+import struct
+import time
+import numpy as np
+import pygame
+from asteroid import Asteroid
+from constants import *
+from explosion import Explosion
+from missile import Missile
+from pilots import PILOTS
+from shot import Shot
+from simulation import Simulation
+
+# Checkpoints of a whole Simulation in a fixed binary layout, so a game can be
+# resumed, forked many times over, or started straight from a stress state:
+#
+#   header     magic "ASSV", version, flags, seed, tick count, game time,
+#              score, asteroids destroyed, lives, game over, spawn timer,
+#              then the record count of every section below
+#   rng        Mersenne Twister state of the gameplay random.Random
+#   particles  PCG64 state of the particle generator, capacity, high-water mark
+#   player     position, previous position, velocity, rotation, timers,
+#              invulnerability, visibility, missiles left, held inputs
+#   asteroids, shots, missiles
+#              one BODY record each, in sprite group order
+#   explosions one EXPLOSION record each
+#   particles  the particle arrays up to the high-water mark, then the free list
+#
+# Every section is a packed NumPy or struct record, so loading a few thousand
+# bodies is a handful of frombuffer calls plus creating the sprites.
+STATE_MAGIC = b"ASSV"
+STATE_VERSION = 2  # 2: swept collisions and kill bounds changed how saved games play on
+FLAG_ENTITY_STORE = 1 << 0
+
+HEADER = struct.Struct("<4sBBqqdqqq?dIIIIII")
+RNG = struct.Struct("<625I?d")
+PARTICLE_RNG = struct.Struct("<16s16sIIII")
+PLAYER = struct.Struct("<12d??iB3d")
+
+BODY = np.dtype([("x", "<f8"), ("y", "<f8"), ("previous_x", "<f8"), ("previous_y", "<f8"),
+                 ("vx", "<f8"), ("vy", "<f8"), ("radius", "<f8"), ("age", "<f8"),
+                 ("timer", "<f8"), ("owned", "u1")])
+EXPLOSION = np.dtype([("x", "<f8"), ("y", "<f8"), ("lifetime", "<f8")])
+PARTICLE = np.dtype([("position", "<f4", 2), ("velocity", "<f4", 2), ("radius", "<f4"),
+                     ("lifetime", "<f4"), ("alpha", "u1"), ("color", "u1", 3), ("alive", "?")])
+FREE = np.dtype("<u4")
+BODY_CLASSES = (Asteroid, Shot, Missile)
+
+
+def pack_bodies(cls, group, simulation):
+    player = simulation.player
+    shapes = list(group)
+    store = simulation.store
+    if store is None:
+        bodies = np.array([
+            (*shape._position, *shape._previous_position, *shape._velocity, shape.radius, shape.age,
+             getattr(shape, "timer", 0.0), getattr(shape, "owner", None) is player)
+            for shape in shapes
+        ], BODY)
+        return bodies.reshape(len(shapes))
+
+    # Stored bodies are read straight from the store arrays, in group order
+    slots = store.slots_of(cls)
+    bodies = np.zeros(len(slots), BODY)
+    bodies["x"], bodies["y"] = store.position[slots].T
+    bodies["previous_x"], bodies["previous_y"] = store.previous[slots].T
+    bodies["vx"], bodies["vy"] = store.velocity[slots].T
+    bodies["radius"] = store.radius[slots]
+    bodies["age"] = store.age[slots]
+    if cls is not Asteroid:
+        bodies["timer"] = [getattr(shape, "timer", 0.0) for shape in shapes]
+        bodies["owned"] = [shape.owner is player for shape in shapes]
+    return bodies
+
+
+def dumps(simulation):
+    player = simulation.player
+    field = simulation.asteroid_field
+    particles = simulation.particle_system
+    bodies = [pack_bodies(cls, group, simulation)
+              for cls, group in zip(BODY_CLASSES, (simulation.asteroids, simulation.shots, simulation.missiles))]
+
+    explosions = list(simulation.explosions)
+    explosion_records = np.zeros(len(explosions), EXPLOSION)
+    for record, explosion in zip(explosion_records, explosions):
+        record["x"], record["y"] = explosion.position
+        record["lifetime"] = explosion.lifetime
+
+    n = particles.used
+    particle_records = np.zeros(n, PARTICLE)
+    particle_records["position"] = particles.position[:n]
+    particle_records["velocity"] = particles.velocity[:n]
+    particle_records["radius"] = particles.radius[:n]
+    particle_records["lifetime"] = particles.lifetime[:n]
+    particle_records["alpha"] = particles.alpha[:n]
+    particle_records["color"] = particles.color[:n]
+    particle_records["alive"] = particles.live[:n]
+    free = np.asarray(particles.free, dtype=FREE)
+
+    flags = FLAG_ENTITY_STORE if simulation.store is not None else 0
+    header = HEADER.pack(
+        STATE_MAGIC, STATE_VERSION, flags, simulation.seed, simulation.ticks, simulation.time,
+        simulation.score, simulation.asteroids_destroyed, simulation.lives, simulation.game_over,
+        field.spawn_timer, len(bodies[0]), len(bodies[1]), len(bodies[2]),
+        len(explosion_records), n, len(free),
+    )
+
+    _, mt, gauss = simulation.rng.getstate()
+    rng = RNG.pack(*mt, gauss is not None, gauss or 0.0)
+
+    bit_generator = particles.rng.bit_generator.state
+    if bit_generator["bit_generator"] != "PCG64":
+        raise ValueError(f"cannot save a {bit_generator['bit_generator']} particle generator")
+    particle_rng = PARTICLE_RNG.pack(
+        bit_generator["state"]["state"].to_bytes(16, "little"),
+        bit_generator["state"]["inc"].to_bytes(16, "little"),
+        bit_generator["has_uint32"], bit_generator["uinteger"],
+        particles.capacity, particles.used,
+    )
+
+    player_record = PLAYER.pack(
+        player.position.x, player.position.y,
+        player.previous_position.x, player.previous_position.y,
+        player.velocity.x, player.velocity.y,
+        player.rotation, player.previous_rotation, player.timer, player.missile_timer,
+        player.invulnerable_timer, player.blink_timer,
+        player.is_invulnerable, player.visible, player.missiles_remaining, player.inputs,
+        player.start_position.x, player.start_position.y, player.age,
+    )
+
+    return b"".join([
+        header, rng, particle_rng, player_record,
+        *(records.tobytes() for records in bodies),
+        explosion_records.tobytes(), particle_records.tobytes(), free.tobytes(),
+    ])
+
+
+def restore_bodies(cls, records, simulation):
+    # Sprites are created the usual way so they join the right groups and
+    # pools, then get their full state written over
+    player = simulation.player
+    store = simulation.store
+    positions = zip(records["x"].tolist(), records["y"].tolist(), records["radius"].tolist())
+    if store is None:
+        shapes = [cls(x, y, radius) for x, y, radius in positions]
+        for shape, previous_x, previous_y, vx, vy, age in zip(
+                shapes, records["previous_x"].tolist(), records["previous_y"].tolist(),
+                records["vx"].tolist(), records["vy"].tolist(), records["age"].tolist()):
+            shape._previous_position.update(previous_x, previous_y)
+            shape._velocity.update(vx, vy)
+            shape.age = age
+    else:
+        # Created unbound, then put in the store in one go
+        cls.store = None
+        try:
+            shapes = [cls(x, y, radius) for x, y, radius in positions]
+        finally:
+            cls.store = store
+        store.add_batch(
+            cls, shapes,
+            np.column_stack([records["x"], records["y"]]),
+            np.column_stack([records["previous_x"], records["previous_y"]]),
+            np.column_stack([records["vx"], records["vy"]]),
+            records["radius"], records["age"],
+        )
+
+    if cls is not Asteroid:
+        for shape, owned in zip(shapes, records["owned"].tolist()):
+            shape.owner = player if owned else None
+    if cls is Missile:
+        for shape, timer in zip(shapes, records["timer"].tolist()):
+            shape.timer = timer
+
+
+def loads(data, pooling=True):
+    (magic, version, flags, seed, ticks, game_time, score, asteroids_destroyed, lives, game_over,
+     spawn_timer, asteroid_count, shot_count, missile_count, explosion_count, particle_count,
+     free_count) = HEADER.unpack_from(data)
+    if magic != STATE_MAGIC or version != STATE_VERSION:
+        raise ValueError(f"not a version {STATE_VERSION} save state")
+    offset = HEADER.size
+
+    simulation = Simulation(seed, pooling=pooling, entity_store=bool(flags & FLAG_ENTITY_STORE))
+    simulation.activate()
+    simulation.ticks = ticks
+    simulation.time = game_time
+    simulation.score = score
+    simulation.asteroids_destroyed = asteroids_destroyed
+    simulation.lives = lives
+    simulation.game_over = game_over
+    simulation.asteroid_field.spawn_timer = spawn_timer
+
+    values = RNG.unpack_from(data, offset)
+    offset += RNG.size
+    simulation.rng.setstate((3, values[:625], values[626] if values[625] else None))
+
+    state, inc, has_uint32, uinteger, capacity, used = PARTICLE_RNG.unpack_from(data, offset)
+    offset += PARTICLE_RNG.size
+    particles = simulation.particle_system
+    particles.rng.bit_generator.state = {
+        "bit_generator": "PCG64",
+        "state": {"state": int.from_bytes(state, "little"), "inc": int.from_bytes(inc, "little")},
+        "has_uint32": has_uint32,
+        "uinteger": uinteger,
+    }
+
+    values = PLAYER.unpack_from(data, offset)
+    offset += PLAYER.size
+    player = simulation.player
+    player.position = pygame.Vector2(values[0], values[1])
+    player.previous_position = pygame.Vector2(values[2], values[3])
+    player.velocity = pygame.Vector2(values[4], values[5])
+    (player.rotation, player.previous_rotation, player.timer, player.missile_timer,
+     player.invulnerable_timer, player.blink_timer, player.is_invulnerable, player.visible,
+     player.missiles_remaining, player.inputs) = values[6:16]
+    player.start_position = pygame.Vector2(values[16], values[17])
+    player.age = values[18]
+
+    for cls, count in zip(BODY_CLASSES, (asteroid_count, shot_count, missile_count)):
+        records = np.frombuffer(data, BODY, count, offset)
+        offset += records.nbytes
+        restore_bodies(cls, records, simulation)
+
+    # Explosions only hold a lifetime, their particles are restored below
+    records = np.frombuffer(data, EXPLOSION, explosion_count, offset)
+    offset += records.nbytes
+    for x, y, lifetime in records.tolist():
+        explosion = Explosion(x, y, 0)
+        explosion.lifetime = lifetime
+
+    records = np.frombuffer(data, PARTICLE, particle_count, offset)
+    offset += records.nbytes
+    free = np.frombuffer(data, FREE, free_count, offset)
+    particles.grow(capacity)
+    n = particle_count
+    particles.position[:n] = records["position"]
+    particles.velocity[:n] = records["velocity"]
+    particles.radius[:n] = records["radius"]
+    particles.lifetime[:n] = records["lifetime"]
+    particles.alpha[:n] = records["alpha"]
+    particles.color[:n] = records["color"]
+    particles.live[:] = False
+    particles.live[:n] = records["alive"]
+    particles.free = free.tolist()
+    particles.used = used
+    particles.live_count = int(particles.live.sum())
+    return simulation
+
+
+def save(simulation, path):
+    # Packed before the file is opened, so a failed save leaves the old one alone
+    data = dumps(simulation)
+    with open(path, "wb") as file:
+        file.write(data)
+
+
+def load(path, pooling=True):
+    with open(path, "rb") as file:
+        return loads(file.read(), pooling)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Play a headless game up to a tick and save it, then check that the save resumes exactly")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--ticks", type=int, default=1200, help="ticks to play before saving")
+    parser.add_argument("--check-ticks", type=int, default=1200, help="ticks to play on from the save to compare")
+    parser.add_argument("--pilot", choices=sorted(PILOTS), default="spin-and-shoot")
+    parser.add_argument("--asteroids", type=int, default=0, help="extra asteroids to add before saving")
+    parser.add_argument("--entity-store", action="store_true", help="use the NumPy entity store")
+    parser.add_argument("--output", metavar="PATH", help="also write the save state to PATH")
+    args = parser.parse_args()
+    if not -(1 << 63) <= args.seed < 1 << 63:
+        parser.error("--seed must fit in a signed 64-bit integer")
+
+    pilot = PILOTS[args.pilot]
+    dt = 1.0 / SIMULATION_TICK_RATE
+    simulation = Simulation(args.seed, entity_store=args.entity_store)
+    while not simulation.game_over and simulation.ticks < args.ticks:
+        simulation.step(dt, pilot(simulation))
+    simulation.activate()
+    for _ in range(args.asteroids):
+        rng = simulation.rng
+        asteroid = Asteroid(rng.uniform(0, SCREEN_WIDTH), rng.uniform(0, SCREEN_HEIGHT), ASTEROID_MIN_RADIUS)
+        asteroid.velocity = pygame.Vector2(0, rng.uniform(40, 100)).rotate(rng.uniform(0, 360))
+
+    start = time.perf_counter()
+    data = dumps(simulation)
+    saved = time.perf_counter()
+    resumed = loads(data)
+    loaded = time.perf_counter()
+    if args.output:
+        with open(args.output, "wb") as file:
+            file.write(data)
+
+    bodies = len(simulation.asteroids) + len(simulation.shots) + len(simulation.missiles)
+    print(f"tick {simulation.ticks}: {bodies} bodies, {len(simulation.explosions)} explosions, "
+          f"{len(data)} bytes, save {(saved - start) * 1000:.2f} ms, load {(loaded - saved) * 1000:.2f} ms")
+
+    # Both copies must play on identically
+    for world in (simulation, resumed):
+        for _ in range(args.check_ticks):
+            if world.game_over:
+                break
+            world.step(dt, pilot(world))
+    same = simulation.state_digest() == resumed.state_digest() and simulation.ticks == resumed.ticks
+    print(f"after {args.check_ticks} more ticks: original {simulation.state_digest():#018x}, "
+          f"resumed {resumed.state_digest():#018x}, {'match' if same else 'MISMATCH'}")
+    if not same:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
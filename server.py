@@ -0,0 +1,298 @@
+import os
+
+# The server never opens a window
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import argparse
+import asyncio
+import itertools
+import time
+import numpy as np
+from asteroid import Asteroid
+from constants import *
+from explosion import Explosion
+from missile import Missile
+from netcode import *
+from player import Player
+from shot import Shot
+from simulation import Simulation
+
+WIRE_KINDS = {Asteroid: KIND_ASTEROID, Shot: KIND_SHOT, Missile: KIND_MISSILE}
+
+
+# A Simulation shared by several ships. Every ship keeps its own lives and
+# score; there is no overall game over, a ship that runs out of lives is taken
+# out of the field while the others play on. The single-player ship the base
+# class creates is removed straight away.
+class Session(Simulation):
+    def __init__(self, seed=None):
+        super().__init__(seed, entity_store=True)
+        self.player.kill()
+        self.ships = {}
+
+    def add_ship(self, ship_id):
+        self.activate()
+        ship = Player(SCREEN_WIDTH / 2, SCREEN_HEIGHT / 2)
+        ship.respawn(reset_missiles=True)
+        ship.lives = PLAYER_LIVES
+        ship.score = 0
+        self.ships[ship_id] = ship
+        return ship
+
+    def remove_ship(self, ship_id):
+        ship = self.ships.pop(ship_id, None)
+        if ship is not None:
+            ship.kill()
+
+    def begin_tick(self, inputs):
+        # inputs maps ship id -> controls.py bitmask
+        self.activate()
+        self.save_state()
+        for ship_id, ship in self.ships.items():
+            ship.inputs = inputs.get(ship_id, 0)
+
+    def moving_shapes(self):
+        for ship in self.ships.values():
+            if ship.alive():
+                yield ship
+
+    def collide(self, dt):
+        for ship in self.ships.values():
+            if not ship.alive() or ship.is_invulnerable:
+                continue
+            asteroid = self.asteroid_hitting(ship)
+            if asteroid is not None:
+                ship.lives -= 1
+                Explosion(asteroid.position.x, asteroid.position.y, asteroid.radius)
+                asteroid.kill()
+                if ship.lives <= 0:
+                    ship.kill()
+                else:
+                    ship.respawn()
+
+        self.collide_projectiles(dt)
+
+    def award(self, projectile, points):
+        if projectile.owner is not None:
+            projectile.owner.score += points
+        self.score += points
+
+    def body_state(self):
+        # Every stored body quantized for the wire, sorted by id
+        store = self.store
+        n = store.count
+        bodies = np.zeros(n, BODY)
+        bodies["id"] = store.serial[:n]
+        bodies["radius"] = store.radius[:n]
+        bodies["x"] = quantize(store.position[:n, 0], NET_POSITION_SCALE)
+        bodies["y"] = quantize(store.position[:n, 1], NET_POSITION_SCALE)
+        bodies["vx"] = quantize(store.velocity[:n, 0], NET_VELOCITY_SCALE)
+        bodies["vy"] = quantize(store.velocity[:n, 1], NET_VELOCITY_SCALE)
+        for cls, kind in store.kinds.items():
+            bodies["kind"][store.kind[:n] == kind] = WIRE_KINDS[cls]
+        bodies.sort(order="id")
+        return bodies
+
+    def ship_state(self):
+        ships = np.zeros(len(self.ships), SHIP)
+        for row, (ship_id, ship) in zip(ships, self.ships.items()):
+            row["id"] = ship_id
+            row["x"] = quantize(ship.position.x, NET_POSITION_SCALE)
+            row["y"] = quantize(ship.position.y, NET_POSITION_SCALE)
+            row["rotation"] = int(ship.rotation % 360 * 0x10000 / 360) & 0xFFFF
+            row["flags"] = (SHIP_INVULNERABLE * ship.is_invulnerable) | (SHIP_VISIBLE * ship.visible)
+            row["lives"] = max(ship.lives, 0)
+            row["missiles"] = ship.missiles_remaining
+            row["score"] = ship.score
+        return ships
+
+
+class Connection:
+    def __init__(self, ship_id, writer):
+        self.ship_id = ship_id
+        self.writer = writer
+        self.inputs = 0
+        self.input_sequence = 0
+        self.acked = None  # tick of the newest snapshot the client confirmed
+        self.history = {}  # tick -> body state the client holds after that snapshot
+        self.bytes_sent = 0
+        self.snapshots = 0
+        self.full_snapshots = 0
+        self.skipped = 0  # snapshots dropped because the client fell behind
+
+    def baseline(self, tick):
+        if self.acked not in self.history or tick - self.acked > NET_SNAPSHOT_HISTORY:
+            return None
+        return self.acked
+
+    def ack(self, tick):
+        if tick in self.history and (self.acked is None or tick > self.acked):
+            self.acked = tick
+            for old in [old for old in self.history if old < tick]:
+                del self.history[old]
+
+
+# Authoritative server: steps a Session at a fixed tick rate, applies the
+# latest input each client sent and sends every client a snapshot per tick.
+class GameServer:
+    def __init__(self, seed=None, rate=SIMULATION_TICK_RATE, metrics_interval=NET_METRICS_INTERVAL):
+        self.session = Session(seed)
+        self.rate = rate
+        self.dt = 1.0 / rate
+        self.connections = {}
+        self.ship_ids = itertools.count(1)
+        self.metrics_interval = metrics_interval
+        self.tick_times = []
+        self.server = None
+
+    async def start(self, host="127.0.0.1", port=NET_PORT):
+        self.server = await asyncio.start_server(self.handle_client, host, port)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def handle_client(self, reader, writer):
+        connection = None
+        try:
+            while True:
+                message = await read_frame(reader)
+                if message[0] == MSG_HELLO and connection is None:
+                    ship_id = next(self.ship_ids)
+                    self.session.add_ship(ship_id)
+                    connection = Connection(ship_id, writer)
+                    self.connections[ship_id] = connection
+                    writer.write(frame(WELCOME.pack(MSG_WELCOME, ship_id, self.rate, self.session.ticks)))
+                elif message[0] == MSG_INPUT and connection is not None:
+                    _, sequence, ack, inputs = INPUT.unpack(message)
+                    if sequence > connection.input_sequence:
+                        connection.input_sequence = sequence
+                        connection.inputs = inputs
+                    connection.ack(ack)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            if connection is not None:
+                del self.connections[connection.ship_id]
+                self.session.remove_ship(connection.ship_id)
+            writer.close()
+
+    def tick(self):
+        session = self.session
+        session.step(self.dt, {ship_id: c.inputs for ship_id, c in self.connections.items()})
+        self.broadcast()
+
+    def broadcast(self):
+        session = self.session
+        tick = session.ticks
+        bodies = session.body_state()
+        ships = pack_section(session.ship_state())
+        # Clients holding the very same baseline get the very same delta, so
+        # it is encoded once per baseline rather than once per client
+        encoded = {}  # id of the baseline state -> (body sections, client state)
+
+        for connection in self.connections.values():
+            transport = connection.writer.transport
+            if transport.get_write_buffer_size() > NET_MAX_WRITE_BUFFER:
+                connection.skipped += 1
+                continue
+
+            base_tick = connection.baseline(tick)
+            base = None if base_tick is None else connection.history[base_tick]
+            key = id(base)
+            if key not in encoded:
+                ticks = 0 if base_tick is None else tick - base_tick
+                encoded[key] = encode_bodies(bodies, base, ticks, self.rate)
+            sections, state = encoded[key]
+
+            header = SNAPSHOT.pack(MSG_SNAPSHOT, tick, NO_BASELINE if base_tick is None else base_tick,
+                                   connection.input_sequence, connection.ship_id)
+            data = frame(header + sections + ships)
+            connection.writer.write(data)
+            connection.history[tick] = state
+            connection.bytes_sent += len(data)
+            connection.snapshots += 1
+            if base_tick is None:
+                connection.full_snapshots += 1
+
+            # Never keep more than the window of baselines a client may ack
+            if len(connection.history) > NET_SNAPSHOT_HISTORY:
+                del connection.history[min(connection.history)]
+
+    async def run(self, duration=None):
+        loop = asyncio.get_running_loop()
+        next_tick = loop.time()
+        last_report = next_tick
+        stop = None if duration is None else next_tick + duration
+        last_bytes = self.bytes_sent()
+
+        while stop is None or loop.time() < stop:
+            start = time.perf_counter()
+            self.tick()
+            self.tick_times.append(time.perf_counter() - start)
+
+            now = loop.time()
+            if self.metrics_interval and now - last_report >= self.metrics_interval:
+                print(self.report(now - last_report, last_bytes))
+                last_bytes = self.bytes_sent()
+                self.tick_times = []
+                last_report = now
+
+            next_tick += self.dt
+            delay = next_tick - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            else:
+                # Running behind: let clients in, then carry on from now
+                next_tick = loop.time()
+                await asyncio.sleep(0)
+
+    def bytes_sent(self):
+        return {ship_id: c.bytes_sent for ship_id, c in self.connections.items()}
+
+    def metrics(self, elapsed, last_bytes=None):
+        last_bytes = last_bytes or {}
+        rates = [
+            (c.bytes_sent - last_bytes.get(ship_id, 0)) / elapsed
+            for ship_id, c in self.connections.items()
+        ]
+        times = np.asarray(self.tick_times or [0.0]) * 1000
+        return {
+            "clients": len(self.connections),
+            "bodies": self.session.store.count,
+            "tick_mean_ms": float(times.mean()),
+            "tick_p95_ms": float(np.percentile(times, 95)),
+            "tick_max_ms": float(times.max()),
+            "bytes_per_client_per_sec": float(np.mean(rates)) if rates else 0.0,
+            "full_snapshots": sum(c.full_snapshots for c in self.connections.values()),
+            "skipped_snapshots": sum(c.skipped for c in self.connections.values()),
+        }
+
+    def report(self, elapsed, last_bytes=None):
+        m = self.metrics(elapsed, last_bytes)
+        return (f"[tick {self.session.ticks}] clients {m['clients']}  bodies {m['bodies']}  "
+                f"tick {m['tick_mean_ms']:.2f}/{m['tick_p95_ms']:.2f}/{m['tick_max_ms']:.2f} ms (mean/p95/max)  "
+                f"{m['bytes_per_client_per_sec'] / 1024:.1f} KiB/s per client  "
+                f"full {m['full_snapshots']}  skipped {m['skipped_snapshots']}")
+
+
+async def serve(host, port, seed, rate):
+    server = GameServer(seed, rate)
+    port = await server.start(host, port)
+    print(f"Serving on {host}:{port} at {rate:g} ticks/sec")
+    await server.run()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run an authoritative multiplayer game server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=NET_PORT)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--rate", type=float, default=SIMULATION_TICK_RATE, help="ticks per second")
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port, args.seed, args.rate))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
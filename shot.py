@@ -1,13 +1,26 @@
 import pygame
 from circleshape import CircleShape
+from constants import SHOT_BOUNDS_MARGIN
+from worldbounds import WorldBounds, BOUNDS_KILL
 
 
 class Shot(CircleShape):
+    bounds = WorldBounds(BOUNDS_KILL, SHOT_BOUNDS_MARGIN)
+
     def __init__(self, x, y, radius):
         super().__init__(x, y, radius)
+        self.owner = None  # the Player that fired it, if any
 
     def draw(self, screen):
-        pygame.draw.circle(screen, "white", self.position, self.radius, 2) 
+        return pygame.draw.circle(screen, "white", self.position, self.radius, 2)
+
+    def atlas_blits(self, atlas):
+        return [atlas.shot(self.position, self.radius)]
+
+    @classmethod
+    def atlas_batch(cls, atlas, position, velocity, radius):
+        return atlas.shots(position, radius)
 
     def update(self, dt):
         self.position += self.velocity * dt
+        self.apply_bounds(dt)
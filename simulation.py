@@ -0,0 +1,370 @@
+import argparse
+import hashlib
+import random
+import struct
+import time
+import pygame
+from asteroid import Asteroid
+from asteroidfield import AsteroidField
+from collision import SpatialHash
+from constants import *
+from controls import *
+from entitystore import EntityStore
+from explosion import Explosion
+from missile import Missile
+from particles import ParticleSystem
+from pilots import spin_and_shoot
+from player import Player
+from pool import Pool
+from shot import Shot
+from worldbounds import PopulationCounter
+
+HIT_SHOT = 0
+HIT_MISSILE = 1
+
+
+# The game world and its rules, without any window, clock or keyboard.
+# game_loop drives it with keyboard input and renders it; headless tools call
+# step() directly as fast as they like.
+class Simulation:
+    def __init__(self, seed=None, pooling=True, pool_sizes=None, entity_store=False):
+        # Every random draw in the world comes from this one seeded source
+        if seed is None:
+            seed = random.randrange(1 << 63)
+        self.seed = seed
+        self.rng = random.Random(seed)
+
+        self.updatable = pygame.sprite.Group()
+        self.drawable = pygame.sprite.Group()
+        self.asteroids = pygame.sprite.Group()
+        self.shots = pygame.sprite.Group()
+        self.missiles = pygame.sprite.Group()
+        self.explosions = pygame.sprite.Group()
+
+        self.score = 0
+        self.asteroids_destroyed = 0  # asteroids hit by shots or missiles
+        self.lives = PLAYER_LIVES
+        self.game_over = False
+        self.ticks = 0
+        self.time = 0.0
+
+        # Killed asteroids, shots, missiles and explosions are recycled
+        self.pools = {}
+        if pooling:
+            sizes = dict(POOL_MAX_SIZES, **(pool_sizes or {}))
+            self.pools = {name: Pool(size) for name, size in sizes.items()}
+
+        # Asteroids, shots and missiles can keep their kinematics in NumPy
+        # arrays and be moved, culled and collided in batches
+        self.store = EntityStore() if entity_store else None
+
+        self.particle_system = None
+        self.profiler = None  # optional FrameProfiler, marks update and collision
+        self.activate()
+
+        self.player = Player(SCREEN_WIDTH / 2, SCREEN_HEIGHT / 2)
+        self.player.respawn(reset_missiles=True)  # Reset missiles when starting new game
+        self.asteroid_field = AsteroidField()
+        # Particles get their own stream so visual effects never shift gameplay
+        self.particle_system = ParticleSystem(seed=self.rng.getrandbits(64))
+        Explosion.particle_system = self.particle_system
+        self.asteroid_field.asteroid_group = self.asteroids
+        self.asteroid_field.reset()  # Call reset after setting asteroid_group
+
+        # Broad-phase grids, rebuilt every tick for each collision category
+        self.asteroid_grid = SpatialHash()
+        self.shot_grid = SpatialHash()
+        self.missile_grid = SpatialHash()
+
+        # Live entity counts per group, logged periodically to spot leaks
+        self.population = PopulationCounter({
+            "updatable": self.updatable,
+            "drawable": self.drawable,
+            "asteroids": self.asteroids,
+            "shots": self.shots,
+            "missiles": self.missiles,
+            "explosions": self.explosions,
+        })
+
+    def activate(self):
+        # Sprites register themselves through class-level containers, so point
+        # them at this simulation's groups before it creates anything
+        Player.containers = (self.updatable, self.drawable)
+        AsteroidField.containers = (self.updatable,)
+        if self.store is None:
+            Asteroid.containers = (self.asteroids, self.updatable, self.drawable)
+            Shot.containers = (self.shots, self.updatable, self.drawable)
+            Missile.containers = (self.missiles, self.updatable, self.drawable)
+        else:
+            # The store moves and draws these itself, in batches
+            Asteroid.containers = (self.asteroids,)
+            Shot.containers = (self.shots,)
+            Missile.containers = (self.missiles,)
+        Explosion.containers = (self.explosions, self.updatable, self.drawable)
+        ParticleSystem.containers = (self.updatable, self.drawable)
+        Explosion.particle_system = self.particle_system
+        Asteroid.rng = self.rng
+        AsteroidField.rng = self.rng
+        Asteroid.pool = self.pools.get("asteroids")
+        Shot.pool = self.pools.get("shots")
+        Missile.pool = self.pools.get("missiles")
+        Explosion.pool = self.pools.get("explosions")
+        Asteroid.store = self.store
+        Shot.store = self.store
+        Missile.store = self.store
+
+    def step(self, dt, inputs=0):
+        if self.game_over:
+            return
+
+        self.begin_tick(inputs)
+        self.update(dt)
+        if self.profiler:
+            self.profiler.mark("update")
+        self.collide(dt)
+        if self.profiler:
+            self.profiler.mark("collision")
+        self.end_tick(dt)
+
+    def begin_tick(self, inputs):
+        self.activate()
+        self.save_state()
+        self.player.inputs = inputs
+
+    def end_tick(self, dt):
+        # Sprites killed this tick become reusable only now that nothing in the
+        # tick can still be holding on to them
+        for pool in self.pools.values():
+            pool.collect()
+        self.ticks += 1
+        self.time += dt
+
+    def pool_stats(self):
+        return {name: pool.stats() for name, pool in self.pools.items()}
+
+    def moving_shapes(self):
+        # Everything whose motion is interpolated between ticks when rendering,
+        # apart from bodies in the entity store, which are handled in batches
+        yield self.player
+        if self.store is None:
+            yield from self.asteroids
+            yield from self.shots
+            yield from self.missiles
+
+    def save_state(self):
+        if self.store is not None:
+            self.store.save_state()
+        for shape in self.moving_shapes():
+            shape.save_state()
+
+    def update(self, dt):
+        if self.store is not None:
+            self.store.integrate(dt)
+            self.store.apply_bounds()
+        for object in self.updatable:
+            object.update(dt)
+
+    def collide(self, dt):
+        player = self.player
+
+        # Check player collisions with asteroids
+        if not player.is_invulnerable:
+            asteroid = self.asteroid_hitting(player)
+            if asteroid is not None:
+                self.lives -= 1
+
+                # Create explosion for the asteroid that hit the player
+                Explosion(asteroid.position.x, asteroid.position.y, asteroid.radius)
+                asteroid.kill()
+
+                if self.lives <= 0:
+                    self.game_over = True
+                    return
+                # Respawn player with invulnerability
+                player.respawn()
+
+        self.collide_projectiles(dt)
+
+    def asteroid_hitting(self, player):
+        # Respawning makes the player invulnerable, so only the first hit counts
+        if self.store is None:
+            hits = self.asteroid_grid.build(self.asteroids).query(player)
+        else:
+            hits = self.store.overlapping(Asteroid, player.position, player.radius)
+        return hits[0] if hits else None
+
+    def award(self, projectile, points):
+        # Score for an asteroid hit by `projectile`
+        self.score += points
+
+    def collide_projectiles(self, dt):
+        # Projectiles are fast enough to pass clean through an asteroid within
+        # a tick at low tick rates, so they are swept along their whole move
+        # and every hit is resolved in the order it happened during the tick
+        hits = []
+        if self.store is None:
+            shot_grid = self.shot_grid.build(self.shots, swept=True)
+            missile_grid = self.missile_grid.build(self.missiles, swept=True)
+            for rank, asteroid in enumerate(self.asteroids):
+                for kind, grid in ((HIT_SHOT, shot_grid), (HIT_MISSILE, missile_grid)):
+                    for order, (projectile, time) in enumerate(grid.query_swept(asteroid)):
+                        hits.append((time, rank, kind, order, asteroid, projectile))
+        else:
+            serial = self.store.serial
+            for kind, cls in ((HIT_SHOT, Shot), (HIT_MISSILE, Missile)):
+                pairs = self.store.swept_pairs(Asteroid, cls)
+                for order, (asteroid, projectile, time) in enumerate(pairs):
+                    hits.append((time, serial[asteroid.slot], kind, order, asteroid, projectile))
+
+        # Ties, such as every slow pair touching at the end of the tick, go by
+        # asteroid in group order, shots before missiles, then projectile order
+        hits.sort(key=lambda hit: hit[:4])
+        for time, _, kind, _, asteroid, projectile in hits:
+            if not asteroid.alive() or not projectile.alive():
+                continue  # already destroyed or spent earlier in the tick
+            projectile.kill()
+            after = (1.0 - time) * dt
+            if kind == HIT_SHOT:
+                self.shot_hit(asteroid, projectile, after)
+            else:
+                self.missile_hit(asteroid, projectile, after)
+
+    def shot_hit(self, asteroid, shot, after):
+        # `after` is how much of the tick was left when the shot hit
+        position = asteroid.position
+        if after:
+            position = position - asteroid.velocity * after
+
+        # Create explosion at the asteroid's position
+        Explosion(position.x, position.y, asteroid.radius)
+        self.asteroids_destroyed += 1
+
+        if asteroid.split(after):
+            # Increase score when an asteroid is fully destroyed
+            self.award(shot, SCORE_ASTEROID_SMALL)
+
+    def missile_hit(self, asteroid, missile, after):
+        # Missiles destroy any asteroid on contact
+        position = asteroid.position
+        if after:
+            position = position - asteroid.velocity * after
+
+        # Create a bigger explosion for missile hits
+        # Red-orange color for missile explosions
+        Explosion(position.x, position.y, asteroid.radius * 1.5, (255, 100, 50))
+
+        # Calculate score based on asteroid size
+        if asteroid.radius >= ASTEROID_MIN_RADIUS * 3:
+            self.award(missile, SCORE_ASTEROID_SMALL * 4)  # Large asteroid
+        elif asteroid.radius >= ASTEROID_MIN_RADIUS * 2:
+            self.award(missile, SCORE_ASTEROID_SMALL * 2)  # Medium asteroid
+        else:
+            self.award(missile, SCORE_ASTEROID_SMALL)      # Small asteroid
+
+        # Immediately destroy the asteroid without splitting
+        asteroid.kill()
+        self.asteroids_destroyed += 1
+
+    def state_digest(self):
+        # 64-bit fingerprint of the gameplay state, for replay verification
+        player = self.player
+        digest = hashlib.blake2b(digest_size=8)
+        digest.update(struct.pack(
+            "<qqq?ddd", self.score, self.lives, self.ticks, self.game_over,
+            player.position.x, player.position.y, player.rotation,
+        ))
+        for group in (self.asteroids, self.shots, self.missiles):
+            digest.update(struct.pack("<I", len(group)))
+            for shape in group:
+                digest.update(struct.pack(
+                    "<ddddd", shape.position.x, shape.position.y,
+                    shape.velocity.x, shape.velocity.y, shape.radius,
+                ))
+        return int.from_bytes(digest.digest(), "little")
+
+    def draw(self, screen, alpha=1.0, atlas=None):
+        # alpha is how far the rendered frame sits between the previous tick
+        # (0) and the latest one (1); shapes are drawn at the blended position.
+        # With a SpriteAtlas everything is drawn with a single blits call.
+        # Returns the rects that were drawn to.
+        if alpha >= 1.0:
+            return self.draw_sprites(screen, atlas)
+
+        player = self.player
+        rotation = player.rotation
+        player.rotation = player.previous_rotation + (rotation - player.previous_rotation) * alpha
+        moved = []
+        for shape in self.moving_shapes():
+            moved.append((shape, shape.position))
+            shape.position = shape.previous_position.lerp(shape.position, alpha)
+        if self.store is not None:
+            exact = self.store.lerp_positions(alpha)
+
+        rects = self.draw_sprites(screen, atlas)
+
+        for shape, position in moved:
+            shape.position = position
+        if self.store is not None:
+            self.store.restore_positions(exact)
+        player.rotation = rotation
+        return rects
+
+    def draw_sprites(self, screen, atlas=None):
+        # Bodies in the entity store go first, underneath everything else
+        if atlas is not None:
+            blits = []
+            if self.store is not None:
+                blits += self.store.atlas_blits(atlas)
+            for object in self.drawable:
+                blits += object.atlas_blits(atlas)
+            return screen.blits(blits)
+
+        rects = []
+        if self.store is not None:
+            rects += self.store.draw(screen)
+        for object in self.drawable:
+            drawn = object.draw(screen)
+            if isinstance(drawn, list):
+                rects.extend(drawn)
+            elif drawn:
+                rects.append(drawn)
+        return rects
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the game simulation headless and report ticks/sec")
+    parser.add_argument("--ticks", type=int, default=10000, help="number of ticks to simulate")
+    parser.add_argument("--rate", type=float, default=SIMULATION_TICK_RATE, help="simulation ticks per game second")
+    parser.add_argument("--seed", type=int, default=None, help="seed for the first game")
+    parser.add_argument("--entity-store", action="store_true",
+                        help="move and collide asteroids, shots and missiles in NumPy batches")
+    args = parser.parse_args()
+
+    dt = 1.0 / args.rate
+    simulation = Simulation(args.seed, entity_store=args.entity_store)
+    games = 1
+    scores = []
+    # One counter for the whole run, pointed at each new game's groups, so
+    # peaks cover every game rather than just the last
+    population = simulation.population
+
+    start = time.perf_counter()
+    for _ in range(args.ticks):
+        if simulation.game_over:
+            scores.append(simulation.score)
+            simulation = Simulation(simulation.rng.getrandbits(63), entity_store=args.entity_store)
+            population.groups = simulation.population.groups
+            simulation.population = population
+            games += 1
+        simulation.step(dt, spin_and_shoot(simulation))
+        population.sample(dt)
+    elapsed = time.perf_counter() - start
+    scores.append(simulation.score)
+
+    print(f"{args.ticks} ticks in {elapsed:.3f}s: {args.ticks / elapsed:.0f} ticks/sec")
+    print(f"games: {games}  scores: {scores}")
+    print(population.summary())
+    print(f"pools: {simulation.pool_stats()}")
+
+
+if __name__ == "__main__":
+    main()
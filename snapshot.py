@@ -0,0 +1,329 @@
+import argparse
+import collections
+import os
+import threading
+import time
+import numpy as np
+import pygame
+from asteroid import Asteroid
+from constants import *
+from missile import Missile
+from particles import particle_blits
+from shot import Shot
+
+BODY_CLASSES = [Asteroid, Shot, Missile]  # drawn in this order, under the ship and particles
+
+
+def frozen(array):
+    array.flags.writeable = False
+    return array
+
+
+# Everything the renderer needs from one tick, copied out of a Simulation so
+# the simulation can carry on while the copy is drawn. Snapshots are never
+# changed once taken: the arrays are read-only copies and the rest are numbers
+# and tuples.
+class FrameSnapshot:
+    def __init__(self, simulation, stamp):
+        self.tick = simulation.ticks
+        self.stamp = stamp  # perf_counter time the tick was due
+        self.score = simulation.score
+        self.lives = simulation.lives
+        self.game_over = simulation.game_over
+
+        # Per body class: (position, previous position, velocity, radius)
+        self.bodies = {cls: self.copy_bodies(simulation, cls) for cls in BODY_CLASSES}
+
+        player = simulation.player
+        self.ship = (tuple(player.previous_position), tuple(player.position),
+                     player.previous_rotation, player.rotation)
+        self.ship_shown = player.shown()
+        self.missiles_remaining = player.missiles_remaining
+
+        particles = simulation.particle_system
+        visible = particles.visible()
+        self.particles = tuple(frozen(array[visible]) for array in
+                               (particles.position, particles.radius, particles.alpha, particles.color))
+        self.taken = time.perf_counter()
+
+    @staticmethod
+    def copy_bodies(simulation, cls):
+        store = simulation.store
+        if store is not None:
+            slots = store.slots_of(cls)
+            arrays = (store.position[slots], store.previous[slots], store.velocity[slots], store.radius[slots])
+        else:
+            group = {Asteroid: simulation.asteroids, Shot: simulation.shots, Missile: simulation.missiles}[cls]
+            shapes = list(group)
+            arrays = (
+                np.array([tuple(shape.position) for shape in shapes]).reshape(-1, 2),
+                np.array([tuple(shape.previous_position) for shape in shapes]).reshape(-1, 2),
+                np.array([tuple(shape.velocity) for shape in shapes]).reshape(-1, 2),
+                np.array([shape.radius for shape in shapes], dtype=float),
+            )
+        return tuple(frozen(array) for array in arrays)
+
+    def alpha(self, now, dt):
+        # How far past this tick a frame rendered at `now` sits, see FixedTimestep.alpha
+        return min(1.0, max(0.0, (now - self.stamp) / dt))
+
+    def draw(self, screen, alpha, atlas):
+        # Drawn like Simulation.draw with an atlas, blending each position
+        # between the previous tick and this one. Returns the drawn rects.
+        blits = []
+        for cls, (position, previous, velocity, radius) in self.bodies.items():
+            if len(position):
+                blits += cls.atlas_batch(atlas, previous + (position - previous) * alpha, velocity, radius)
+
+        if self.ship_shown:
+            previous, position, previous_rotation, rotation = self.ship
+            blits.append(atlas.ship(pygame.Vector2(previous).lerp(position, alpha),
+                                    previous_rotation + (rotation - previous_rotation) * alpha))
+
+        blits += particle_blits(*self.particles, atlas.scale)
+        return screen.blits(blits)
+
+
+# Hands snapshots from the simulation thread to the render thread. The writer
+# fills the back slot and then swaps it to the front; the reader only ever
+# takes the front one, so it never sees a snapshot that is still being made.
+class SnapshotBuffer:
+    def __init__(self, snapshot):
+        self.lock = threading.Lock()
+        self.slots = [snapshot, None]
+        self.front = 0
+
+    def publish(self, snapshot):
+        back = 1 - self.front
+        self.slots[back] = snapshot
+        with self.lock:
+            self.front = back
+
+    def latest(self):
+        with self.lock:
+            return self.slots[self.front]
+
+
+# Steps a Simulation on its own thread at a fixed tick rate and publishes a
+# FrameSnapshot after every tick. The main thread hands over input with
+# set_inputs() and renders buffer.latest(); it must hold `lock` to touch the
+# simulation itself, e.g. to save it. A pilot from pilots.py, if given,
+# replaces the keyboard input.
+class SimulationThread:
+    def __init__(self, simulation, rate=SIMULATION_TICK_RATE, recorder=None, pilot=None,
+                 max_steps=MAX_CATCH_UP_STEPS):
+        self.simulation = simulation
+        self.dt = 1.0 / rate
+        self.recorder = recorder
+        self.pilot = pilot
+        self.max_steps = max_steps
+        self.buffer = SnapshotBuffer(FrameSnapshot(simulation, time.perf_counter()))
+        self.lock = threading.Lock()  # held while a tick runs
+        self.input_lock = threading.Lock()
+        self.held = 0
+        self.pressed = 0  # key presses not yet seen by a tick
+        self.stopping = threading.Event()
+        self.thread = threading.Thread(target=self.run, name="simulation", daemon=True)
+
+        self.ticks = 0
+        self.tick_time = 0.0  # seconds spent stepping and taking snapshots
+        self.dropped_time = 0.0  # simulation time skipped to stay responsive
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stopping.set()
+        self.thread.join()
+
+    def set_inputs(self, held, pressed=0):
+        with self.input_lock:
+            self.held = held
+            self.pressed |= pressed
+
+    def take_inputs(self):
+        with self.input_lock:
+            inputs = self.held | self.pressed
+            self.pressed = 0
+        return inputs
+
+    def run(self):
+        simulation = self.simulation
+        # A tick runs once the game time it covers has passed, like FixedTimestep
+        due = time.perf_counter() + self.dt
+        while not self.stopping.is_set() and not simulation.game_over:
+            delay = due - time.perf_counter()
+            if delay > 0:
+                self.stopping.wait(delay)
+                continue
+            if -delay > self.max_steps * self.dt:
+                # Too far behind: forget the backlog rather than spiral
+                skipped = int(-delay / self.dt) - self.max_steps
+                self.dropped_time += skipped * self.dt
+                due += skipped * self.dt
+
+            start = time.perf_counter()
+            with self.lock:
+                inputs = self.pilot(simulation) if self.pilot else self.take_inputs()
+                lives = simulation.lives
+                simulation.step(self.dt, inputs)
+                if self.recorder:
+                    self.recorder.record(inputs)
+                report = simulation.population.sample(self.dt)
+                snapshot = FrameSnapshot(simulation, due)
+            self.buffer.publish(snapshot)
+            self.ticks += 1
+            self.tick_time += time.perf_counter() - start
+            due += self.dt
+
+            if simulation.lives < lives:
+                print(f"Lives remaining: {simulation.lives}")
+            if report:
+                print(report)
+
+
+# Render-side counters for a SimulationThread: how old each presented snapshot
+# was, snapshots that were never presented and frames that presented the same
+# snapshot again. Also fed by the single-threaded loop in main() below, one
+# "snapshot" per frame's last tick, for comparison.
+class SnapshotMetrics:
+    def __init__(self, history=SNAPSHOT_LATENCY_HISTORY):
+        self.latencies = collections.deque(maxlen=history)  # seconds, most recent frames
+        self.frames = 0
+        self.dropped = 0
+        self.duplicated = 0
+        self.last_tick = None
+        self.started = time.perf_counter()
+
+    def frame(self, tick, taken, presented):
+        # Call once the frame showing the snapshot of `tick`, taken at `taken`,
+        # has been presented
+        self.frames += 1
+        self.latencies.append(presented - taken)
+        if self.last_tick is not None:
+            if tick == self.last_tick:
+                self.duplicated += 1
+            elif tick > self.last_tick:
+                self.dropped += tick - self.last_tick - 1
+        self.last_tick = tick
+
+    def summary(self, ticks, tick_time=0.0):
+        elapsed = time.perf_counter() - self.started
+        latency = np.asarray(self.latencies or [0.0]) * 1000
+        return {
+            "frames": self.frames,
+            "frames_per_sec": self.frames / elapsed,
+            "ticks": ticks,
+            "ticks_per_sec": ticks / elapsed,
+            "tick_mean_ms": tick_time / ticks * 1000 if ticks else 0.0,
+            "latency_mean_ms": float(latency.mean()),
+            "latency_p95_ms": float(np.percentile(latency, 95)),
+            "latency_max_ms": float(latency.max()),
+            "dropped": self.dropped,
+            "duplicated": self.duplicated,
+        }
+
+    def report(self, ticks, tick_time=0.0):
+        s = self.summary(ticks, tick_time)
+        return (f"{s['frames']} frames ({s['frames_per_sec']:.1f}/s)  {s['ticks']} ticks ({s['ticks_per_sec']:.1f}/s, "
+                f"{s['tick_mean_ms']:.2f} ms each)  snapshot latency {s['latency_mean_ms']:.1f}/"
+                f"{s['latency_p95_ms']:.1f}/{s['latency_max_ms']:.1f} ms (mean/p95/max)  "
+                f"dropped {s['dropped']}  duplicated {s['duplicated']}")
+
+
+def play(scenario, seconds, threaded, seed, flip_delay=0.0):
+    # A benchmark.py scenario played in a world-sized dummy window for
+    # `seconds`, rendering as fast as it can. Returns the metrics summary.
+    from atlas import SpriteAtlas
+    from benchmark import SCENARIOS
+    from hud import HUD
+    from simulation import Simulation
+    from timestep import FixedTimestep
+    from worldbounds import WorldBounds, BOUNDS_WRAP
+
+    window = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+    atlas = SpriteAtlas().build()
+    hud = HUD(pygame.font.Font(None, SCORE_FONT_SIZE))
+
+    original_bounds = Asteroid.bounds
+    Asteroid.bounds = WorldBounds(BOUNDS_WRAP)
+    try:
+        simulation = Simulation(seed)
+        simulation.activate()
+        pilot = SCENARIOS[scenario](simulation)
+        metrics = SnapshotMetrics()
+        worker = None
+        if threaded:
+            worker = SimulationThread(simulation, pilot=pilot)
+            worker.start()
+        timestep = FixedTimestep()
+        ticks = 0
+        tick_time = 0.0
+        taken = time.perf_counter()
+        last = time.perf_counter()
+        end = last + seconds
+
+        while time.perf_counter() < end:
+            pygame.event.pump()
+            window.fill("black")
+            if worker:
+                snapshot = worker.buffer.latest()
+                snapshot.draw(window, snapshot.alpha(time.perf_counter(), worker.dt), atlas)
+                tick, taken = snapshot.tick, snapshot.taken
+                hud.update(snapshot.score, snapshot.lives, snapshot.missiles_remaining)
+            else:
+                now = time.perf_counter()
+                for _ in range(timestep.advance(now - last)):
+                    start = time.perf_counter()
+                    simulation.step(timestep.dt, pilot(simulation))
+                    taken = time.perf_counter()
+                    tick_time += taken - start
+                    ticks += 1
+                last = now
+                simulation.draw(window, timestep.alpha, atlas)
+                tick = simulation.ticks
+                hud.update(simulation.score, simulation.lives, simulation.player.missiles_remaining)
+            hud.draw(window)
+            pygame.display.flip()
+            if flip_delay:
+                time.sleep(flip_delay)  # stands in for a vsync wait or a slow blit
+            metrics.frame(tick, taken, time.perf_counter())
+
+        if worker:
+            worker.stop()
+            ticks, tick_time = worker.ticks, worker.tick_time
+        return metrics.summary(ticks, tick_time)
+    finally:
+        Asteroid.bounds = original_bounds
+
+
+def main():
+    from benchmark import SCENARIOS
+
+    parser = argparse.ArgumentParser(
+        description="Compare the single-threaded game loop with a simulation thread feeding snapshots")
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS),
+                        help="benchmark.py scenario to play, may be repeated (default: a few)")
+    parser.add_argument("--seconds", type=float, default=5.0, help="how long to play each scenario per mode")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--flip-delay", type=float, default=0.0, metavar="MS",
+                        help="sleep this long after each flip, standing in for vsync or a slow blit")
+    args = parser.parse_args()
+
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    pygame.display.init()
+    pygame.font.init()
+    scenarios = args.scenario or ["asteroids-1000", "explosions-20", "missile-barrage"]
+    print(f"{'scenario':<16} {'mode':<9} {'frames/s':>9} {'ticks/s':>8} {'tick ms':>8} "
+          f"{'latency ms':>16} {'dropped':>8} {'dup':>6}")
+    for scenario in scenarios:
+        for threaded in (False, True):
+            s = play(scenario, args.seconds, threaded, args.seed, args.flip_delay / 1000)
+            latency = f"{s['latency_mean_ms']:.1f}/{s['latency_p95_ms']:.1f}"
+            print(f"{scenario:<16} {'threaded' if threaded else 'single':<9} {s['frames_per_sec']:>9.1f} "
+                  f"{s['ticks_per_sec']:>8.1f} {s['tick_mean_ms']:>8.2f} {latency:>16} "
+                  f"{s['dropped']:>8} {s['duplicated']:>6}")
+
+
+if __name__ == "__main__":
+    main()
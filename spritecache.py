@@ -0,0 +1,51 @@
+from collections import OrderedDict
+from constants import *
+
+
+# Small LRU cache for pre-rendered surfaces. Callers pass a hashable key and a
+# render function that builds the surface on a miss.
+class SpriteCache:
+    def __init__(self, capacity=SPRITE_CACHE_SIZE):
+        self.capacity = capacity
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, render):
+        entries = self.entries
+        surface = entries.get(key)
+        if surface is not None:
+            entries.move_to_end(key)
+            self.hits += 1
+            return surface
+
+        self.misses += 1
+        surface = render(key)
+        entries[key] = surface
+        if len(entries) > self.capacity:
+            entries.popitem(last=False)
+            self.evictions += 1
+        return surface
+
+    def clear(self):
+        self.entries.clear()
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self):
+        return {
+            "size": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hit_rate,
+        }
@@ -0,0 +1,30 @@
+from constants import *
+
+
+# Fixed-rate simulation clock. Real frame time goes into an accumulator that is
+# paid out in whole ticks, so every update sees the same dt no matter how fast
+# or unevenly frames are rendered.
+class FixedTimestep:
+    def __init__(self, rate=SIMULATION_TICK_RATE, max_steps=MAX_CATCH_UP_STEPS):
+        self.dt = 1.0 / rate
+        self.max_steps = max_steps
+        self.accumulator = 0.0
+        self.dropped_time = 0.0  # simulation time skipped to stay responsive
+
+    def advance(self, frame_time):
+        # Returns how many ticks to run for a frame that took frame_time seconds
+        self.accumulator += frame_time
+        steps = int(self.accumulator // self.dt)
+        if steps > self.max_steps:
+            # Too far behind: run what we can and forget the rest of the backlog
+            # rather than spiralling into ever longer catch-up frames
+            self.dropped_time += (steps - self.max_steps) * self.dt
+            steps = self.max_steps
+            self.accumulator = self.accumulator % self.dt + steps * self.dt
+        self.accumulator -= steps * self.dt
+        return steps
+
+    @property
+    def alpha(self):
+        # How far between the last two ticks the next rendered frame sits
+        return min(1.0, self.accumulator / self.dt)
@@ -0,0 +1,139 @@
+import argparse
+import math
+import random
+import pygame
+from asteroid import Asteroid
+from constants import *
+from missile import Missile
+from shot import Shot
+from simulation import Simulation, HIT_SHOT
+
+# Checks that projectile hits don't depend on the tick rate. The same shooting
+# gallery is played at several rates and every hit is compared with the
+# highest rate: the same projectile must destroy the same asteroid at the same
+# time. The discrete column plays it with the end-of-tick overlap test used
+# before swept collisions, which lets fast projectiles tunnel through asteroids
+# at low rates.
+#
+#   python tunneling.py --rates 10,30,60,240
+#
+# Every asteroid is the smallest size, so outcomes never depend on where split
+# pieces land. Volleys are fired on ticks every rate has in common.
+GALLERY_TIME = 4.0  # seconds, long enough for the last volley to leave the screen
+VOLLEY_INTERVAL = 0.5
+VOLLEYS = 4
+
+
+class Gallery(Simulation):
+    # A Simulation that logs every projectile hit as
+    # (projectile label, asteroid label, time of the hit)
+    def __init__(self, seed, **kwargs):
+        super().__init__(seed, **kwargs)
+        self.asteroid_field.kill()  # nothing spawns, the gallery is scripted
+        self.player.is_invulnerable = True
+        self.player.invulnerable_timer = math.inf
+        self.hits = []
+        self.dt = 0.0
+
+    def collide_projectiles(self, dt):
+        self.dt = dt
+        super().collide_projectiles(dt)
+
+    def shot_hit(self, asteroid, shot, after):
+        self.hits.append((shot.label, asteroid.label, self.time + self.dt - after))
+        super().shot_hit(asteroid, shot, after)
+
+    def missile_hit(self, asteroid, missile, after):
+        self.hits.append((missile.label, asteroid.label, self.time + self.dt - after))
+        super().missile_hit(asteroid, missile, after)
+
+
+class DiscreteGallery(Gallery):
+    def collide_projectiles(self, dt):
+        # Only projectiles overlapping an asteroid at the end of the tick hit
+        self.dt = dt
+        shot_grid = self.shot_grid.build(self.shots)
+        missile_grid = self.missile_grid.build(self.missiles)
+        for asteroid in self.asteroids:
+            for kind, grid in enumerate((shot_grid, missile_grid)):
+                for projectile in grid.query(asteroid):
+                    if asteroid.alive() and projectile.alive():
+                        projectile.kill()
+                        if kind == HIT_SHOT:
+                            self.shot_hit(asteroid, projectile, 0.0)
+                        else:
+                            self.missile_hit(asteroid, projectile, 0.0)
+
+
+def play_gallery(seed, asteroids, projectiles, rate, entity_store=False, discrete=False):
+    dt = 1.0 / rate
+    gallery = (DiscreteGallery if discrete else Gallery)(seed, entity_store=entity_store)
+    gallery.activate()
+
+    # Layout comes from its own generator so every rate sees the same gallery
+    rng = random.Random(seed)
+    for label in range(asteroids):
+        asteroid = Asteroid(rng.uniform(100, SCREEN_WIDTH - 100), rng.uniform(100, SCREEN_HEIGHT - 100),
+                            ASTEROID_MIN_RADIUS)
+        asteroid.velocity = pygame.Vector2(0, rng.uniform(10, 80)).rotate(rng.uniform(0, 360))
+        asteroid.label = label
+    volleys = [[(rng.uniform(0, 360), rng.random() < 0.2) for _ in range(projectiles)] for _ in range(VOLLEYS)]
+
+    center = pygame.Vector2(SCREEN_WIDTH / 2, SCREEN_HEIGHT / 2)
+    volley_ticks = round(VOLLEY_INTERVAL * rate)
+    for tick in range(round(GALLERY_TIME * rate)):
+        volley = tick // volley_ticks
+        if tick % volley_ticks == 0 and volley < VOLLEYS:
+            gallery.activate()
+            for number, (angle, is_missile) in enumerate(volleys[volley]):
+                if is_missile:
+                    projectile = Missile(center.x, center.y, MISSILE_RADIUS)
+                    projectile.velocity = pygame.Vector2(0, MISSILE_SPEED).rotate(angle)
+                else:
+                    projectile = Shot(center.x, center.y, SHOT_RADIUS)
+                    projectile.velocity = pygame.Vector2(0, PLAYER_SHOT_SPEED).rotate(angle)
+                projectile.label = (volley, number)
+        gallery.step(dt)
+    return sorted(gallery.hits)
+
+
+def compare(hits, reference):
+    # Whether the same projectiles hit the same asteroids, and the largest
+    # difference in hit time
+    same = [hit[:2] for hit in hits] == [hit[:2] for hit in reference]
+    drift = max((abs(a[2] - b[2]) for a, b in zip(hits, reference)), default=0.0)
+    return same, drift
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check that projectile hits are the same at every tick rate")
+    parser.add_argument("--rates", default="20,60,120,240",
+                        help="comma separated tick rates, compared with the highest")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--asteroids", type=int, default=150)
+    parser.add_argument("--projectiles", type=int, default=60, help="projectiles per volley")
+    parser.add_argument("--entity-store", action="store_true", help="use the NumPy entity store")
+    args = parser.parse_args()
+
+    rates = sorted((int(rate) for rate in args.rates.split(",")), reverse=True)
+    if any(round(VOLLEY_INTERVAL * rate) != VOLLEY_INTERVAL * rate for rate in rates):
+        parser.error(f"rates must fire a volley every {VOLLEY_INTERVAL}s on a whole tick")
+
+    reference = play_gallery(args.seed, args.asteroids, args.projectiles, rates[0], args.entity_store)
+    print(f"{rates[0]} Hz reference: {len(reference)} hits")
+    print(f"{'rate':>6} {'swept hits':>11} {'same':>5} {'drift ms':>9} {'discrete hits':>14} {'same':>5}")
+    failed = False
+    for rate in rates:
+        hits = play_gallery(args.seed, args.asteroids, args.projectiles, rate, args.entity_store)
+        discrete = play_gallery(args.seed, args.asteroids, args.projectiles, rate, args.entity_store, discrete=True)
+        same, drift = compare(hits, reference)
+        discrete_same, _ = compare(discrete, reference)
+        failed |= not same
+        print(f"{rate:>6} {len(hits):>11} {'yes' if same else 'NO':>5} {drift * 1000:>9.2f} "
+              f"{len(discrete):>14} {'yes' if discrete_same else 'no':>5}")
+    if failed:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,33 @@
+import pygame
+from constants import *
+
+
+# Decouples the world, which is always SCREEN_WIDTH x SCREEN_HEIGHT, from the
+# window it is shown in. Everything is drawn to `surface`: the window itself
+# when it is exactly the world size at full scale, otherwise an offscreen
+# surface of the world size times `scale` that upscale() stretches over the
+# whole window once per frame. A scale below 1 trades sharpness for fill rate.
+class Viewport:
+    def __init__(self, window, scale=1.0, smooth=False):
+        self.window = window
+        self.scale = scale
+        self.smooth = smooth
+        self.size = (max(1, round(SCREEN_WIDTH * scale)), max(1, round(SCREEN_HEIGHT * scale)))
+        self.direct = self.size == window.get_size()
+        if self.direct:
+            self.surface = window
+        else:
+            # Same pixel format as the window, so the upscale needs no conversion
+            self.surface = pygame.Surface(self.size, 0, window)
+
+    def upscale(self):
+        if self.direct:
+            return
+        if self.smooth:
+            pygame.transform.smoothscale(self.surface, self.window.get_size(), self.window)
+        else:
+            pygame.transform.scale(self.surface, self.window.get_size(), self.window)
+
+    def present(self):
+        self.upscale()
+        pygame.display.flip()
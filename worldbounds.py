@@ -0,0 +1,114 @@
+from constants import *
+
+# Policies a CircleShape subclass can pick for leaving the screen
+BOUNDS_KILL = "kill"          # remove once a whole tick was spent past the margin
+BOUNDS_WRAP = "wrap"          # reappear on the opposite edge
+BOUNDS_LIFETIME = "lifetime"  # remove after a fixed number of seconds
+
+
+# Per-class world bounds component. Subclasses of CircleShape opt in by setting
+# a `bounds` class attribute; CircleShape.apply_bounds then calls apply() once
+# per update.
+class WorldBounds:
+    def __init__(self, policy, margin=0, lifetime=None):
+        if policy == BOUNDS_LIFETIME and lifetime is None:
+            raise ValueError("lifetime policy needs a lifetime")
+        self.policy = policy
+        self.margin = margin
+        self.lifetime = lifetime
+        self.removed = 0
+        self.wrapped = 0
+
+        self.left = -margin
+        self.top = -margin
+        self.right = SCREEN_WIDTH + margin
+        self.bottom = SCREEN_HEIGHT + margin
+
+    def is_outside(self, shape):
+        return self.outside(shape.position, shape.radius)
+
+    def outside(self, position, radius):
+        x = position.x
+        y = position.y
+        return (
+            x + radius < self.left
+            or x - radius > self.right
+            or y + radius < self.top
+            or y - radius > self.bottom
+        )
+
+    def apply(self, shape):
+        if self.policy == BOUNDS_KILL:
+            # Not on the tick the shape crosses the margin, so swept collisions
+            # still see the part of its move that was inside
+            if self.is_outside(shape) and self.outside(shape.previous_position, shape.radius):
+                shape.kill()
+                self.removed += 1
+        elif self.policy == BOUNDS_WRAP:
+            self.wrap(shape)
+        elif self.policy == BOUNDS_LIFETIME:
+            if shape.age >= self.lifetime:
+                shape.kill()
+                self.removed += 1
+
+    def wrap(self, shape):
+        # Only jump once the shape is entirely off screen so it never pops
+        position = shape.position
+        radius = shape.radius
+        width = self.right - self.left + 2 * radius
+        height = self.bottom - self.top + 2 * radius
+        wrapped = False
+
+        if position.x + radius < self.left:
+            position.x += width
+            wrapped = True
+        elif position.x - radius > self.right:
+            position.x -= width
+            wrapped = True
+        if position.y + radius < self.top:
+            position.y += height
+            wrapped = True
+        elif position.y - radius > self.bottom:
+            position.y -= height
+            wrapped = True
+
+        if wrapped:
+            self.wrapped += 1
+            # Assigned back rather than updated in place, since a shape in an
+            # EntityStore hands out copies of its position
+            shape.position = position
+            # Move the interpolation start along so the jump isn't drawn as a streak
+            shape.previous_position = position.copy()
+
+
+# Tracks how many entities are alive in each sprite group so long sessions can
+# confirm the population stays flat instead of growing without bound
+class PopulationCounter:
+    def __init__(self, groups, log_interval=POPULATION_LOG_INTERVAL):
+        self.groups = groups
+        self.log_interval = log_interval
+        self.current = {name: 0 for name in groups}
+        self.peak = {name: 0 for name in groups}
+        self.elapsed = 0.0
+        self.log_timer = 0.0
+
+    def sample(self, dt=0.0):
+        # Returns a summary line whenever log_interval seconds have passed
+        for name, group in self.groups.items():
+            count = len(group)
+            self.current[name] = count
+            if count > self.peak[name]:
+                self.peak[name] = count
+
+        self.elapsed += dt
+        self.log_timer += dt
+        if self.log_interval and self.log_timer >= self.log_interval:
+            self.log_timer = 0.0
+            return self.summary()
+        return None
+
+    def summary(self):
+        counts = " ".join(
+            f"{name}={self.current[name]} (peak {self.peak[name]})" for name in self.groups
+        )
+        return f"[{self.elapsed:7.1f}s] {counts}"